@@ -1,11 +1,25 @@
 package main
 
 import (
+	"go/ast"
 	"go/parser"
 	"go/token"
 	"strings"
 )
 
+// netHttpMethods are the methods a net/http handler can receive that are also supported by the OpenAPI 3 specification
+var netHttpMethods = []string{"get", "post", "put", "patch", "delete", "head", "options", "trace"}
+
+// compactOpenapiSpec is the minimal information needed to generate an OpenAPI spec from static analysis. The verbose
+// spec repeats the same responses object for every method of every path, so the Python side expands it instead of
+// having it marshalled to JSON and sent over the FFI boundary.
+type compactOpenapiSpec struct {
+	Source string `json:"source"`
+	Title  string `json:"title"`
+	// A map of paths to the methods discovered for them, e.g. {"/hello": ["get", "post"]}
+	Paths map[string][]string `json:"paths"`
+}
+
 func filterImportsToSupportedFrameworks(imports map[string]string) map[string]string {
 	supportedFrameworks := map[string]struct{}{
 		"net/http": {},
@@ -22,13 +36,7 @@ func filterImportsToSupportedFrameworks(imports map[string]string) map[string]st
 	return importedSupportedFrameworks
 }
 
-func analyse(filePath string, fileContents string) (map[string]string, map[string]interface{}, error) {
-	fileSet := token.NewFileSet()
-	parsedFile, err := parser.ParseFile(fileSet, filePath, fileContents, parser.SkipObjectResolution)
-	if err != nil {
-		return map[string]string{}, map[string]interface{}{}, err
-	}
-
+func getImports(parsedFile *ast.File) map[string]string {
 	// A map of imports' paths to their package names. E.g.
 	// import foo "net/http" -> {"net/http": "foo"}
 	// import "net/http" -> {"net/http" -> "http"}
@@ -43,44 +51,74 @@ func analyse(filePath string, fileContents string) (map[string]string, map[strin
 			imports[importPath] = importPathParts[len(importPathParts)-1]
 		}
 	}
+	return imports
+}
 
-	importedSupportedFrameworks := filterImportsToSupportedFrameworks(imports)
-	openapiSpecs := map[string]interface{}{}
+func analyseCompact(fileSet *token.FileSet, filePath string, fileContents string) (
+	map[string]string, []compactOpenapiSpec, error,
+) {
+	parsedFile, err := parser.ParseFile(fileSet, filePath, fileContents, parser.SkipObjectResolution)
+	if err != nil {
+		return map[string]string{}, []compactOpenapiSpec{}, err
+	}
+
+	importedSupportedFrameworks := filterImportsToSupportedFrameworks(getImports(parsedFile))
+	openapiSpecs := []compactOpenapiSpec{}
 
 	// Static analysis for files importing net/http
 	if packageIdentifier, ok := importedSupportedFrameworks["net/http"]; ok {
-		netHttpPathsSlice := analyseNetHTTP(parsedFile, packageIdentifier)
-
-		netHttpPathsMap := map[string]map[string]map[string]map[string]map[string]string{}
-		for _, path := range netHttpPathsSlice {
-			responses := map[string]map[string]map[string]string{
-				"responses": {
-					"default": {
-						"description": "Discovered via static analysis",
-					},
-				},
-			}
-			netHttpPathsMap[path] = map[string]map[string]map[string]map[string]string{
-				"get":     responses,
-				"post":    responses,
-				"put":     responses,
-				"patch":   responses,
-				"delete":  responses,
-				"head":    responses,
-				"options": responses,
-				"trace":   responses,
-			}
+		netHttpPaths := map[string][]string{}
+		for _, path := range analyseNetHTTP(parsedFile, packageIdentifier) {
+			netHttpPaths[path] = netHttpMethods
 		}
 
 		// Only make an appspec if there's at least one path detected
-		if len(netHttpPathsMap) > 0 {
-			openapiSpecs["static-analysis:net/http:"+filePath] = map[string]interface{}{
-				"openapi": "3.0.0",
-				"info":    map[string]string{"title": "Static Analysis - Golang net/http"},
-				"paths":   netHttpPathsMap,
-			}
+		if len(netHttpPaths) > 0 {
+			openapiSpecs = append(openapiSpecs, compactOpenapiSpec{
+				Source: "static-analysis:net/http:" + filePath,
+				Title:  "Static Analysis - Golang net/http",
+				Paths:  netHttpPaths,
+			})
+		}
+	}
+
+	return importedSupportedFrameworks, openapiSpecs, nil
+}
+
+func expandCompactOpenapiSpec(compactSpec compactOpenapiSpec) map[string]interface{} {
+	responses := map[string]map[string]map[string]string{
+		"responses": {
+			"default": {
+				"description": "Discovered via static analysis",
+			},
+		},
+	}
+
+	paths := map[string]map[string]map[string]map[string]map[string]string{}
+	for path, methods := range compactSpec.Paths {
+		paths[path] = map[string]map[string]map[string]map[string]string{}
+		for _, method := range methods {
+			paths[path][method] = responses
 		}
 	}
 
+	return map[string]interface{}{
+		"openapi": "3.0.0",
+		"info":    map[string]string{"title": compactSpec.Title},
+		"paths":   paths,
+	}
+}
+
+func analyse(filePath string, fileContents string) (map[string]string, map[string]interface{}, error) {
+	importedSupportedFrameworks, compactSpecs, err := analyseCompact(token.NewFileSet(), filePath, fileContents)
+	if err != nil {
+		return importedSupportedFrameworks, map[string]interface{}{}, err
+	}
+
+	openapiSpecs := map[string]interface{}{}
+	for _, compactSpec := range compactSpecs {
+		openapiSpecs[compactSpec.Source] = expandCompactOpenapiSpec(compactSpec)
+	}
+
 	return importedSupportedFrameworks, openapiSpecs, nil
 }
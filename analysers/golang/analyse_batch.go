@@ -0,0 +1,74 @@
+package main
+
+import (
+	"go/token"
+	"runtime"
+	"sync"
+)
+
+type batchFile struct {
+	FilePath     string `json:"file_path"`
+	FileContents string `json:"file_contents"`
+}
+
+type batchResult struct {
+	FilePath             string               `json:"file_path"`
+	FrameworksIdentified []string             `json:"frameworks_identified"`
+	OpenapiSpecs         []compactOpenapiSpec `json:"openapi_specs"`
+	Error                string               `json:"error,omitempty"`
+}
+
+func analyseBatchFile(fileSet *token.FileSet, file batchFile) batchResult {
+	importedSupportedFrameworks, openapiSpecs, err := analyseCompact(fileSet, file.FilePath, file.FileContents)
+	if err != nil {
+		return batchResult{
+			FilePath:             file.FilePath,
+			FrameworksIdentified: []string{},
+			OpenapiSpecs:         []compactOpenapiSpec{},
+			Error:                err.Error(),
+		}
+	}
+
+	frameworksIdentified := make([]string, 0, len(importedSupportedFrameworks))
+	for importPath := range importedSupportedFrameworks {
+		frameworksIdentified = append(frameworksIdentified, importPath)
+	}
+
+	return batchResult{
+		FilePath:             file.FilePath,
+		FrameworksIdentified: frameworksIdentified,
+		OpenapiSpecs:         openapiSpecs,
+	}
+}
+
+// analyseBatch analyses files across a pool of goroutines, one per CPU. The results are in the same order as the files.
+func analyseBatch(files []batchFile) []batchResult {
+	results := make([]batchResult, len(files))
+
+	workerCount := runtime.NumCPU()
+	if workerCount > len(files) {
+		workerCount = len(files)
+	}
+
+	fileIndexes := make(chan int)
+	waitGroup := sync.WaitGroup{}
+	for i := 0; i < workerCount; i++ {
+		waitGroup.Add(1)
+		go func() {
+			defer waitGroup.Done()
+			// Each worker gets its own FileSet so they don't contend on its lock.
+			fileSet := token.NewFileSet()
+			for fileIndex := range fileIndexes {
+				results[fileIndex] = analyseBatchFile(fileSet, files[fileIndex])
+			}
+		}()
+	}
+
+	for fileIndex := range files {
+		fileIndexes <- fileIndex
+	}
+	close(fileIndexes)
+	waitGroup.Wait()
+
+	return results
+}
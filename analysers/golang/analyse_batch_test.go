@@ -0,0 +1,68 @@
+package main
+
+import (
+	"testing"
+
+	"github.com/stretchr/testify/assert"
+)
+
+func TestAnalyseBatch(t *testing.T) {
+	files := []batchFile{
+		{
+			FilePath: "net_http_hello_world.go",
+			FileContents: `package main
+
+import "net/http"
+
+func main() {
+	http.HandleFunc("/hello", hello)
+	http.ListenAndServe(":8080", nil)
+}`,
+		},
+		{
+			FilePath: "no_frameworks.go",
+			FileContents: `package main
+
+import "fmt"
+
+func main() {
+	fmt.Println("Hello, world!")
+}`,
+		},
+		{
+			FilePath:     "malformed.go",
+			FileContents: `{"Oh no": "This isn't a .go file, it's just JSON!"}`,
+		},
+	}
+
+	results := analyseBatch(files)
+
+	assert.Equal(t, []batchResult{
+		{
+			FilePath:             "net_http_hello_world.go",
+			FrameworksIdentified: []string{"net/http"},
+			OpenapiSpecs: []compactOpenapiSpec{
+				{
+					Source: "static-analysis:net/http:net_http_hello_world.go",
+					Title:  "Static Analysis - Golang net/http",
+					Paths:  map[string][]string{"/hello": netHttpMethods},
+				},
+			},
+		},
+		{
+			FilePath:             "no_frameworks.go",
+			FrameworksIdentified: []string{},
+			OpenapiSpecs:         []compactOpenapiSpec{},
+		},
+		{
+			FilePath:             "malformed.go",
+			FrameworksIdentified: []string{},
+			OpenapiSpecs:         []compactOpenapiSpec{},
+			Error:                "malformed.go:1:1: expected 'package', found '{'",
+		},
+	}, results)
+}
+
+func TestAnalyseBatchEmpty(t *testing.T) {
+	assert.Equal(t, []batchResult{}, analyseBatch([]batchFile{}))
+}
@@ -0,0 +1,233 @@
+package main
+
+import (
+	"archive/tar"
+	"bufio"
+	"compress/gzip"
+	"go/parser"
+	"go/token"
+	"io"
+	"io/fs"
+	"os"
+	"path/filepath"
+	"runtime"
+	"sort"
+	"strings"
+	"sync"
+)
+
+// A FileSet keeps the line table of every file added to it, so the workers swap theirs out after this many files to
+// stop a long walk from holding on to every file it has ever parsed.
+const maxFilesPerFileSet = 1000
+
+type walkedFile struct {
+	filePath string
+	// readContents is called by the worker analysing the file, so directory walks read files in parallel
+	readContents func() (string, error)
+}
+
+type walkError struct {
+	FilePath string `json:"file_path"`
+	Error    string `json:"error"`
+}
+
+type walkResult struct {
+	FrameworksIdentified []string             `json:"frameworks_identified"`
+	OpenapiSpecs         []compactOpenapiSpec `json:"openapi_specs"`
+	FilesAnalysed        int                  `json:"files_analysed"`
+	FilesSkipped         int                  `json:"files_skipped"`
+	Errors               []walkError          `json:"errors"`
+}
+
+// analyseWalkedFile does an imports-only parse of the file first, and only fully parses and analyses it if it imports
+// a supported framework. The bool returned is false if the file was skipped.
+func analyseWalkedFile(fileSet *token.FileSet, file walkedFile) (batchResult, bool) {
+	fileContents, err := file.readContents()
+	if err != nil {
+		return batchResult{FilePath: file.filePath, Error: err.Error()}, true
+	}
+
+	parsedImports, err := parser.ParseFile(fileSet, file.filePath, fileContents, parser.ImportsOnly)
+	if err != nil {
+		return batchResult{FilePath: file.filePath, Error: err.Error()}, true
+	}
+	if len(filterImportsToSupportedFrameworks(getImports(parsedImports))) == 0 {
+		return batchResult{}, false
+	}
+
+	return analyseBatchFile(fileSet, batchFile{FilePath: file.filePath, FileContents: fileContents}), true
+}
+
+// analyseWalkedFiles analyses the files sent down the channel across a pool of goroutines, one per CPU, and aggregates
+// their results.
+func analyseWalkedFiles(files <-chan walkedFile) walkResult {
+	type workerResult struct {
+		result   batchResult
+		analysed bool
+	}
+	workerResults := make(chan workerResult)
+
+	waitGroup := sync.WaitGroup{}
+	for i := 0; i < runtime.NumCPU(); i++ {
+		waitGroup.Add(1)
+		go func() {
+			defer waitGroup.Done()
+			fileSet, filesInFileSet := token.NewFileSet(), 0
+			for file := range files {
+				if filesInFileSet == maxFilesPerFileSet {
+					fileSet, filesInFileSet = token.NewFileSet(), 0
+				}
+				filesInFileSet++
+				result, analysed := analyseWalkedFile(fileSet, file)
+				workerResults <- workerResult{result, analysed}
+			}
+		}()
+	}
+	go func() {
+		waitGroup.Wait()
+		close(workerResults)
+	}()
+
+	aggregatedResult := walkResult{
+		FrameworksIdentified: []string{},
+		OpenapiSpecs:         []compactOpenapiSpec{},
+		Errors:               []walkError{},
+	}
+	frameworksIdentified := map[string]struct{}{}
+	for workerResult := range workerResults {
+		if !workerResult.analysed {
+			aggregatedResult.FilesSkipped++
+			continue
+		}
+		aggregatedResult.FilesAnalysed++
+		if workerResult.result.Error != "" {
+			aggregatedResult.Errors = append(aggregatedResult.Errors, walkError{
+				FilePath: workerResult.result.FilePath,
+				Error:    workerResult.result.Error,
+			})
+			continue
+		}
+		for _, framework := range workerResult.result.FrameworksIdentified {
+			frameworksIdentified[framework] = struct{}{}
+		}
+		aggregatedResult.OpenapiSpecs = append(aggregatedResult.OpenapiSpecs, workerResult.result.OpenapiSpecs...)
+	}
+
+	for framework := range frameworksIdentified {
+		aggregatedResult.FrameworksIdentified = append(aggregatedResult.FrameworksIdentified, framework)
+	}
+	sort.Strings(aggregatedResult.FrameworksIdentified)
+	sort.Slice(aggregatedResult.OpenapiSpecs, func(i, j int) bool {
+		return aggregatedResult.OpenapiSpecs[i].Source < aggregatedResult.OpenapiSpecs[j].Source
+	})
+	sort.Slice(aggregatedResult.Errors, func(i, j int) bool {
+		return aggregatedResult.Errors[i].FilePath < aggregatedResult.Errors[j].FilePath
+	})
+
+	return aggregatedResult
+}
+
+// analyseDirectory analyses every .go file under rootPath. File paths in the result are relative to rootPath.
+func analyseDirectory(rootPath string) (walkResult, error) {
+	files := make(chan walkedFile)
+	walkErrors := make(chan error, 1)
+
+	go func() {
+		defer close(files)
+		walkErrors <- filepath.WalkDir(rootPath, func(path string, entry fs.DirEntry, err error) error {
+			if err != nil {
+				return err
+			}
+			if entry.IsDir() {
+				if entry.Name() == ".git" {
+					return filepath.SkipDir
+				}
+				return nil
+			}
+			if !entry.Type().IsRegular() || !strings.HasSuffix(path, ".go") {
+				return nil
+			}
+
+			relativePath, err := filepath.Rel(rootPath, path)
+			if err != nil {
+				return err
+			}
+			files <- walkedFile{
+				filePath: filepath.ToSlash(relativePath),
+				readContents: func() (string, error) {
+					fileContents, err := os.ReadFile(path)
+					return string(fileContents), err
+				},
+			}
+			return nil
+		})
+	}()
+
+	result := analyseWalkedFiles(files)
+	if err := <-walkErrors; err != nil {
+		return walkResult{}, err
+	}
+	return result, nil
+}
+
+// analyseArchive analyses every .go file in a tar archive, which may be gzipped. stripComponents leading path
+// components are removed from the file paths, e.g. 1 for GitHub's tarballs which nest everything in a single directory.
+func analyseArchive(archive io.Reader, stripComponents int) (walkResult, error) {
+	bufferedArchive := bufio.NewReader(archive)
+	if magic, err := bufferedArchive.Peek(2); err == nil && magic[0] == 0x1f && magic[1] == 0x8b {
+		gzipReader, err := gzip.NewReader(bufferedArchive)
+		if err != nil {
+			return walkResult{}, err
+		}
+		defer gzipReader.Close()
+		archive = gzipReader
+	} else {
+		archive = bufferedArchive
+	}
+
+	files := make(chan walkedFile)
+	readErrors := make(chan error, 1)
+
+	go func() {
+		defer close(files)
+		tarReader := tar.NewReader(archive)
+		for {
+			header, err := tarReader.Next()
+			if err == io.EOF {
+				readErrors <- nil
+				return
+			}
+			if err != nil {
+				readErrors <- err
+				return
+			}
+			if header.Typeflag != tar.TypeReg || !strings.HasSuffix(header.Name, ".go") {
+				continue
+			}
+
+			filePathParts := strings.Split(strings.TrimPrefix(header.Name, "./"), "/")
+			if len(filePathParts) <= stripComponents {
+				continue
+			}
+
+			// A tar archive can only be read sequentially, so the file has to be read before moving on to the next
+			fileContents, err := io.ReadAll(tarReader)
+			if err != nil {
+				readErrors <- err
+				return
+			}
+			files <- walkedFile{
+				filePath: strings.Join(filePathParts[stripComponents:], "/"),
+				readContents: func() (string, error) {
+					return string(fileContents), nil
+				},
+			}
+		}
+	}()
+
+	result := analyseWalkedFiles(files)
+	if err := <-readErrors; err != nil {
+		return walkResult{}, err
+	}
+	return result, nil
+}
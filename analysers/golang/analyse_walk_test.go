@@ -0,0 +1,110 @@
+package main
+
+import (
+	"archive/tar"
+	"bytes"
+	"compress/gzip"
+	"os"
+	"path/filepath"
+	"testing"
+
+	"github.com/stretchr/testify/assert"
+	"github.com/stretchr/testify/require"
+)
+
+var walkTestFiles = map[string]string{
+	"cmd/server/main.go": `package main
+
+import "net/http"
+
+func main() {
+	http.HandleFunc("/hello", hello)
+	http.ListenAndServe(":8080", nil)
+}`,
+	"internal/no_frameworks.go": `package internal
+
+import "fmt"
+
+func Hello() {
+	fmt.Println("Hello, world!")
+}`,
+	"malformed.go":   `{"Oh no": "This isn't a .go file, it's just JSON!"}`,
+	"not_golang.txt": `import "net/http"`,
+}
+
+var expectedWalkResult = walkResult{
+	FrameworksIdentified: []string{"net/http"},
+	OpenapiSpecs: []compactOpenapiSpec{
+		{
+			Source: "static-analysis:net/http:cmd/server/main.go",
+			Title:  "Static Analysis - Golang net/http",
+			Paths:  map[string][]string{"/hello": netHttpMethods},
+		},
+	},
+	FilesAnalysed: 2,
+	FilesSkipped:  1,
+	Errors: []walkError{
+		{FilePath: "malformed.go", Error: "malformed.go:1:1: expected 'package', found '{'"},
+	},
+}
+
+func TestAnalyseDirectory(t *testing.T) {
+	rootPath := t.TempDir()
+	for filePath, fileContents := range walkTestFiles {
+		require.Nil(t, os.MkdirAll(filepath.Dir(filepath.Join(rootPath, filePath)), 0755))
+		require.Nil(t, os.WriteFile(filepath.Join(rootPath, filePath), []byte(fileContents), 0644))
+	}
+
+	result, err := analyseDirectory(rootPath)
+	require.Nil(t, err)
+	assert.Equal(t, expectedWalkResult, result)
+}
+
+func TestAnalyseDirectoryNotFound(t *testing.T) {
+	_, err := analyseDirectory(filepath.Join(t.TempDir(), "not_found"))
+	assert.NotNil(t, err)
+}
+
+func makeTestArchive(t *testing.T, prefix string, gzipped bool) []byte {
+	archive := bytes.Buffer{}
+	tarWriter := tar.NewWriter(&archive)
+	for filePath, fileContents := range walkTestFiles {
+		require.Nil(t, tarWriter.WriteHeader(&tar.Header{
+			Name:     prefix + filePath,
+			Mode:     0644,
+			Size:     int64(len(fileContents)),
+			Typeflag: tar.TypeReg,
+		}))
+		_, err := tarWriter.Write([]byte(fileContents))
+		require.Nil(t, err)
+	}
+	require.Nil(t, tarWriter.Close())
+
+	if !gzipped {
+		return archive.Bytes()
+	}
+
+	gzippedArchive := bytes.Buffer{}
+	gzipWriter := gzip.NewWriter(&gzippedArchive)
+	_, err := gzipWriter.Write(archive.Bytes())
+	require.Nil(t, err)
+	require.Nil(t, gzipWriter.Close())
+	return gzippedArchive.Bytes()
+}
+
+func TestAnalyseArchive(t *testing.T) {
+	result, err := analyseArchive(bytes.NewReader(makeTestArchive(t, "", false)), 0)
+	require.Nil(t, err)
+	assert.Equal(t, expectedWalkResult, result)
+}
+
+func TestAnalyseArchiveGzippedWithStrippedComponents(t *testing.T) {
+	result, err := analyseArchive(bytes.NewReader(makeTestArchive(t, "owner-repo-abc123/", true)), 1)
+	require.Nil(t, err)
+	assert.Equal(t, expectedWalkResult, result)
+}
+
+func TestAnalyseArchiveMalformed(t *testing.T) {
+	_, err := analyseArchive(bytes.NewReader([]byte("Oh no, this isn't a tar archive!")), 0)
+	assert.NotNil(t, err)
+}
@@ -1,13 +1,23 @@
 package main
 
+/*
+#include <stdlib.h>
+*/
+import "C"
 import (
-	"C"
-)
-import (
+	"bytes"
 	"encoding/json"
-	"fmt"
+	"unsafe"
 )
 
+func errorResponse(err error) *C.char {
+	response_json, _ := json.Marshal(map[string]string{"error": err.Error()})
+	return C.CString(string(response_json))
+}
+
+// AnalyseCGOWrapper analyses a single file. The returned string is allocated with malloc and must be freed by the
+// caller with FreeCString.
+//
 //export AnalyseCGOWrapper
 func AnalyseCGOWrapper(filePathPointer *C.char, fileContentsPointer *C.char) *C.char {
 	filePath := C.GoString(filePathPointer)
@@ -15,18 +25,75 @@ func AnalyseCGOWrapper(filePathPointer *C.char, fileContentsPointer *C.char) *C.
 
 	frameworks_identified, openapi_specs, err := analyse(filePath, fileContents)
 	if err != nil {
-		return C.CString(fmt.Sprintf(`{"error":"%s"}`, err.Error()))
+		return errorResponse(err)
 	}
 
 	response_json, err := json.Marshal(map[string]interface{}{
 		"frameworks_identified": frameworks_identified,
-		"openapi_specs": openapi_specs,
+		"openapi_specs":         openapi_specs,
+	})
+	if err != nil {
+		return errorResponse(err)
+	}
+
+	return C.CString(string(response_json))
+}
+
+// AnalyseBatchCGOWrapper analyses a JSON array of {"file_path": ..., "file_contents": ...} objects in parallel and
+// returns {"results": [...]} with a compact result per file. The returned string is allocated with malloc and must be
+// freed by the caller with FreeCString.
+//
+//export AnalyseBatchCGOWrapper
+func AnalyseBatchCGOWrapper(filesJsonPointer *C.char) *C.char {
+	files := []batchFile{}
+	if err := json.Unmarshal([]byte(C.GoString(filesJsonPointer)), &files); err != nil {
+		return errorResponse(err)
+	}
+
+	response_json, err := json.Marshal(map[string]interface{}{
+		"results": analyseBatch(files),
 	})
 	if err != nil {
-		return C.CString(fmt.Sprintf(`{"error":"%s"}`, err.Error()))
+		return errorResponse(err)
 	}
 
 	return C.CString(string(response_json))
 }
 
-func main() {}
\ No newline at end of file
+func walkResponse(result walkResult, err error) *C.char {
+	if err != nil {
+		return errorResponse(err)
+	}
+
+	response_json, err := json.Marshal(result)
+	if err != nil {
+		return errorResponse(err)
+	}
+
+	return C.CString(string(response_json))
+}
+
+// AnalyseDirectoryCGOWrapper analyses every .go file under a local directory in parallel and returns the aggregated
+// frameworks identified and compact OpenAPI specs. The returned string is allocated with malloc and must be freed by the
+// caller with FreeCString.
+//
+//export AnalyseDirectoryCGOWrapper
+func AnalyseDirectoryCGOWrapper(rootPathPointer *C.char) *C.char {
+	return walkResponse(analyseDirectory(C.GoString(rootPathPointer)))
+}
+
+// AnalyseArchiveCGOWrapper is the same as AnalyseDirectoryCGOWrapper, but for a tar archive (optionally gzipped) held in
+// memory. The archive is read in place, so the caller must keep it alive for the duration of the call.
+//
+//export AnalyseArchiveCGOWrapper
+func AnalyseArchiveCGOWrapper(archivePointer *C.char, archiveLength C.size_t, stripComponents C.int) *C.char {
+	archive := unsafe.Slice((*byte)(unsafe.Pointer(archivePointer)), int(archiveLength))
+	return walkResponse(analyseArchive(bytes.NewReader(archive), int(stripComponents)))
+}
+
+//export FreeCString
+func FreeCString(pointer *C.char) {
+	C.free(unsafe.Pointer(pointer))
+}
+
+func main() {}
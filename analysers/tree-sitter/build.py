@@ -1,3 +1,12 @@
 from tree_sitter import Language
 
-Language.build_library("/dist/languages.so", ["/src/tree-sitter-javascript"])
+# Every grammar registered in src/static_analysis/tree_sitter_parsers.py has to be built into the library
+Language.build_library(
+    "/dist/languages.so",
+    [
+        "/src/tree-sitter-javascript",
+        "/src/tree-sitter-typescript/typescript",
+        "/src/tree-sitter-typescript/tsx",
+        "/src/tree-sitter-python",
+    ],
+)
@@ -0,0 +1,337 @@
+import hashlib
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, CancelledError, Future, ProcessPoolExecutor, TimeoutError, wait
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from typing import Callable
+
+from env import (  # type: ignore
+    ANALYSER_BATCH_SIZE,
+    ANALYSER_WORKER_MAX_TASKS,
+    ANALYSER_WORKER_MEMORY_LIMIT_BYTES,
+    ANALYSER_WORKERS,
+    FILE_ANALYSIS_TIMEOUT_SECONDS,
+)
+from metrics import set_gauge
+from static_analysis import ANALYSER_TYPE, get_language_analysers, get_language_file_extensions
+from utils import TimeLimit, logger
+
+try:
+    import resource
+except ImportError:  # resource is only available on Unix
+    resource = None  # type: ignore
+
+# How long past its time limits a batch of files can take before its worker is presumed stuck, e.g. in native code the
+# time limits can't interrupt, and is killed
+WORKER_TIMEOUT_GRACE_SECONDS = 10
+
+
+@dataclass
+class FileAnalysisResult:
+    file_path: str
+    frameworks_identified: set[str] = field(default_factory=set)
+    openapi_specs: dict[str, dict] = field(default_factory=dict)
+    # How long each analyser took to analyse the file, by its name, in the order they ran
+    analyser_seconds: dict[str, float] = field(default_factory=dict)
+    # When the first analyser started, as a Unix timestamp, and the process the analysers ran in
+    analysis_started_at: float | None = None
+    analysis_pid: int | None = None
+    # Why the file was skipped, if it was, in which case the frameworks identified & OpenAPI specs should be ignored
+    skip_reason: str | None = None
+
+
+def analyse_file(
+    language_analysers: list[ANALYSER_TYPE],
+    file_path: str,
+    get_file_contents: Callable[[], str],
+    timeout_seconds: float = FILE_ANALYSIS_TIMEOUT_SECONDS,
+) -> FileAnalysisResult:
+    """Analyses a file with each of the language analysers, each of which is aborted if it takes longer than the time
+    limit, in which case the file is skipped
+
+    Args:
+        language_analysers (list[ANALYSER_TYPE]): The language analysers to analyse the file with
+        file_path (str): The path of the file
+        get_file_contents (Callable[[], str]): A function returning the contents of the file
+        timeout_seconds (float, optional): The time limit for each analyser. Defaults to FILE_ANALYSIS_TIMEOUT_SECONDS.
+
+    Returns:
+        FileAnalysisResult: The frameworks identified in the file and the OpenAPI specs generated from it
+    """
+    # Timed here rather than recorded in the metrics or traced, as this may be running in a worker process
+    result = FileAnalysisResult(file_path, analysis_started_at=time.time(), analysis_pid=os.getpid())
+
+    for language_analyser in language_analysers:
+        start_time = time.perf_counter()
+        try:
+            with TimeLimit(timeout_seconds) as time_limit:
+                frameworks, openapi_specs_from_analysis = language_analyser(file_path, get_file_contents)
+        except MemoryError:
+            result.analyser_seconds[language_analyser.__name__] = time.perf_counter() - start_time
+            result.skip_reason = f"{language_analyser.__name__} ran out of memory"
+            return result
+        result.analyser_seconds[language_analyser.__name__] = time.perf_counter() - start_time
+
+        if time_limit.exceeded:
+            result.skip_reason = f"{language_analyser.__name__} took over {timeout_seconds}s"
+            return result
+
+        result.frameworks_identified.update(frameworks)
+        result.openapi_specs.update(openapi_specs_from_analysis)
+
+    return result
+
+
+def initialise_worker(memory_limit_bytes: int):
+    # Limiting the address space makes a runaway allocation fail in the worker, rather than the OOM killer picking a
+    # process to kill, which could be the scanner itself
+    if memory_limit_bytes > 0 and resource is not None:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit_bytes, memory_limit_bytes))
+
+
+def analyse_files(
+    languages: list[str], files: list[tuple[str, str]], timeout_seconds: float
+) -> list[FileAnalysisResult]:
+    # Run in the worker processes. The language analysers' native libraries are loaded when the worker imports this
+    # module, so they're only loaded once per worker.
+    language_analysers = get_language_analysers(languages)
+    return [
+        analyse_file(language_analysers, file_path, lambda: file_contents, timeout_seconds)
+        for file_path, file_contents in files
+    ]
+
+
+def get_contents_hash(file_contents: str) -> str:
+    return hashlib.sha256(file_contents.encode("utf-8")).hexdigest()
+
+
+class AnalyserPool:
+    """A pool of worker processes to run the language analysers in, so a file which crashes an analyser (e.g. with a
+    segfault in the Golang analysis library or tree-sitter) or makes it allocate too much memory only takes down a
+    worker rather than the whole scan. Broken pools are replaced, and the files which broke them are quarantined.
+    """
+
+    def __init__(
+        self,
+        workers: int = ANALYSER_WORKERS,
+        memory_limit_bytes: int = ANALYSER_WORKER_MEMORY_LIMIT_BYTES,
+        max_tasks_per_worker: int = ANALYSER_WORKER_MAX_TASKS,
+        batch_size: int = ANALYSER_BATCH_SIZE,
+        timeout_seconds: float = FILE_ANALYSIS_TIMEOUT_SECONDS,
+    ):
+        self.workers = workers
+        self.memory_limit_bytes = memory_limit_bytes
+        self.max_tasks_per_worker = max_tasks_per_worker
+        self.batch_size = batch_size
+        self.timeout_seconds = timeout_seconds
+
+        self.executor: ProcessPoolExecutor | None = None
+        # Incremented every time the executor is replaced, so futures from a broken executor can be told apart
+        self.generation = 0
+
+        # The hashes of the contents of files which broke a worker, so identical files (e.g. vendored into many
+        # repositories) aren't given the chance to break another
+        self.quarantined_contents: set[str] = set()
+
+    def get_executor(self) -> ProcessPoolExecutor:
+        if self.executor is None:
+            executor_options = {}
+            # Workers are replaced after a number of tasks so any memory leaked by the analysers is reclaimed
+            if sys.version_info >= (3, 11) and self.max_tasks_per_worker > 0:
+                executor_options["max_tasks_per_child"] = self.max_tasks_per_worker
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                # The workers are spawned rather than forked, as the scanner's process may have threads (e.g. the Golang
+                # runtime's) which can't be safely forked
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=initialise_worker,
+                initargs=(self.memory_limit_bytes,),
+                **executor_options,
+            )
+        return self.executor
+
+    def get_batch_timeout(self, batch_size: int) -> float:
+        if self.timeout_seconds <= 0:
+            return float("inf")
+        return self.timeout_seconds * batch_size + WORKER_TIMEOUT_GRACE_SECONDS
+
+    def submit(self, languages: list[str], files: list[tuple[str, str]]) -> Future:
+        return self.get_executor().submit(analyse_files, languages, files, self.timeout_seconds)
+
+    def restart(self, generation: int):
+        """Replaces the executor, unless it's already been replaced since the given generation, killing its workers
+
+        Args:
+            generation (int): The generation of the executor which broke or got stuck
+        """
+        if generation != self.generation or self.executor is None:
+            return
+
+        logger.warning("Restarting analyser worker pool")
+        # A stuck worker won't exit when asked to, so the workers are killed. This breaks the futures of the batches
+        # being analysed, which are retried one file at a time by their PooledFileAnalyser, and cancels those of the
+        # batches which hadn't started, which it resubmits to the new executor.
+        for process in list((getattr(self.executor, "_processes", None) or {}).values()):
+            process.kill()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.executor = None
+        self.generation += 1
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+
+
+ANALYSER_POOL: AnalyserPool | None = None
+
+
+def get_analyser_pool() -> AnalyserPool:
+    # The pool is shared by every repository scanned, so workers are reused rather than spawned for each repository
+    global ANALYSER_POOL
+    if ANALYSER_POOL is None:
+        ANALYSER_POOL = AnalyserPool()
+    return ANALYSER_POOL
+
+
+@dataclass
+class PendingBatch:
+    files: list[tuple[str, str]]
+    generation: int
+    deadline: float
+
+
+class PooledFileAnalyser:
+    """Analyses the files of a repository in an AnalyserPool, in batches, to keep the overhead of sending files to the
+    worker processes low. A bounded number of batches are analysed at once, so files aren't fetched faster than they can
+    be analysed.
+    """
+
+    def __init__(
+        self, analyser_pool: AnalyserPool, languages: list[str], add_result: Callable[[FileAnalysisResult], None]
+    ):
+        """
+        Args:
+            analyser_pool (AnalyserPool): The pool to analyse the files in
+            languages (list[str]): The languages of the repository, which determine the analysers used
+            add_result (Callable[[FileAnalysisResult], None]): Called with the result of analysing each file
+        """
+        self.analyser_pool = analyser_pool
+        self.languages = languages
+        self.file_extensions = get_language_file_extensions(languages)
+        self.add_result = add_result
+
+        self.batch: list[tuple[str, str]] = []
+        self.pending_batches: dict[Future, PendingBatch] = {}
+        self.max_pending_batches = 2 * analyser_pool.workers
+
+    def add_file(self, file_path: str, get_file_contents: Callable[[], str]):
+        # Only files the analysers analyse are fetched and sent to the workers
+        if not file_path.endswith(self.file_extensions):
+            self.add_result(FileAnalysisResult(file_path))
+            return
+
+        file_contents = get_file_contents()
+        if get_contents_hash(file_contents) in self.analyser_pool.quarantined_contents:
+            self.add_result(FileAnalysisResult(file_path, skip_reason="quarantined after breaking an analyser worker"))
+            return
+
+        self.batch.append((file_path, file_contents))
+        if len(self.batch) >= self.analyser_pool.batch_size:
+            self.submit_batch()
+
+    def submit_files(self, files: list[tuple[str, str]]):
+        future = self.analyser_pool.submit(self.languages, files)
+        self.pending_batches[future] = PendingBatch(
+            files,
+            self.analyser_pool.generation,
+            time.monotonic() + self.analyser_pool.get_batch_timeout(len(files)),
+        )
+
+    def submit_batch(self):
+        if len(self.batch) == 0:
+            return
+
+        self.submit_files(self.batch)
+        self.batch = []
+        set_gauge("analyser_batches_pending", len(self.pending_batches))
+
+        while len(self.pending_batches) > self.max_pending_batches:
+            self.collect_results()
+
+    def collect_results(self):
+        """Waits for at least one pending batch to complete, or for the earliest deadline of the pending batches, then
+        adds the results of every batch which has completed
+        """
+        # Batches which hadn't started when the pool was restarted are cancelled, but an executor which has been shut
+        # down may never notify wait() of it, so they're resubmitted before waiting
+        for future, pending_batch in list(self.pending_batches.items()):
+            if future.cancelled():
+                del self.pending_batches[future]
+                self.submit_files(pending_batch.files)
+
+        earliest_deadline = min(pending_batch.deadline for pending_batch in self.pending_batches.values())
+        completed_futures, _ = wait(
+            self.pending_batches,
+            timeout=max(0, earliest_deadline - time.monotonic()) if earliest_deadline != float("inf") else None,
+            return_when=FIRST_COMPLETED,
+        )
+
+        if len(completed_futures) == 0:
+            # A batch is past its deadline, so its worker is stuck. Restarting the pool breaks all of its pending
+            # batches, which are then collected & retried one file at a time.
+            stuck_batch = min(self.pending_batches.values(), key=lambda pending_batch: pending_batch.deadline)
+            self.analyser_pool.restart(stuck_batch.generation)
+            return
+
+        for future in completed_futures:
+            self.collect_batch_results(future, self.pending_batches.pop(future))
+        set_gauge("analyser_batches_pending", len(self.pending_batches))
+
+    def collect_batch_results(self, future: Future, pending_batch: PendingBatch):
+        try:
+            results = future.result()
+        except CancelledError:
+            # The batch hadn't started when the pool was restarted, so it's resubmitted to the new executor
+            self.submit_files(pending_batch.files)
+            return
+        except BrokenProcessPool:
+            # One of the files in the batch, or in another batch in the same pool, broke a worker. Every file in the
+            # batch is retried in isolation to find out which.
+            self.analyser_pool.restart(pending_batch.generation)
+            for file_path, file_contents in pending_batch.files:
+                self.add_result(self.analyse_file_in_isolation(file_path, file_contents))
+            return
+        except Exception as exception:
+            logger.critical(f"Failed to analyse {len(pending_batch.files)} file(s), exception raised: {exception}")
+            for file_path, _ in pending_batch.files:
+                self.add_result(FileAnalysisResult(file_path, skip_reason=f"analysis failed: {exception}"))
+            return
+
+        for result in results:
+            self.add_result(result)
+
+    def analyse_file_in_isolation(self, file_path: str, file_contents: str) -> FileAnalysisResult:
+        generation = self.analyser_pool.generation
+        future = self.analyser_pool.submit(self.languages, [(file_path, file_contents)])
+        batch_timeout = self.analyser_pool.get_batch_timeout(1)
+
+        try:
+            return future.result(timeout=batch_timeout if batch_timeout != float("inf") else None)[0]
+        except (BrokenProcessPool, TimeoutError) as exception:
+            self.analyser_pool.restart(generation)
+            self.analyser_pool.quarantined_contents.add(get_contents_hash(file_contents))
+            reason = "broke an analyser worker"
+            if isinstance(exception, TimeoutError):
+                reason = "got an analyser worker stuck"
+            logger.critical(f"Quarantining {file_path}, it {reason}")
+            return FileAnalysisResult(file_path, skip_reason=f"quarantined after it {reason}")
+
+    def finish(self):
+        """Analyses any files still in the current batch, and waits for all of the pending batches to complete"""
+        self.submit_batch()
+        while len(self.pending_batches) > 0:
+            self.collect_results()
@@ -3,12 +3,16 @@ from dataclasses import dataclass, field
 
 from github.Repository import Repository as GithubRepository
 
+from ignore_paths import DEFAULT_IGNORE_PATHS
+
 
 @dataclass
 class AccountConfig(ABC):
     skip_public_repositories: bool = False
     skip_archived_repositories: bool = False
     skip_forks: bool = False
+    # Globs or regexes (prefixed with "regex:") of paths not to scan in this account's repositories. See ignore_paths.py
+    ignore_paths: list[str] = field(default_factory=list)
 
     def skip_repo(self, repository: GithubRepository) -> bool:
         if self.skip_public_repositories and repository.visibility == "public":
@@ -53,11 +57,26 @@ class OrgConfig(UserConfig):
         return False
 
 
+@dataclass
+class OutputConfig:
+    # Where discovered OpenAPI specs are sent: "firetail", "ndjson" or "null". See sinks.py
+    sink: str = "firetail"
+    # The NDJSON file, or directory of NDJSON files, the "ndjson" sink writes to
+    path: str | None = None
+
+
 @dataclass
 class Config:
     organisations: dict[str, OrgConfig | None] | list[str] | None = field(default_factory=dict[str, OrgConfig | None])
     users: dict[str, UserConfig | None] | list[str] | None = field(default_factory=dict[str, UserConfig | None])
     repositories: dict[str, str] | None = field(default_factory=dict)
+    # Globs or regexes (prefixed with "regex:") of paths not to scan in any repository. See ignore_paths.py
+    ignore_paths: list[str] = field(default_factory=list)
+    # Whether to also ignore the paths in ignore_paths.DEFAULT_IGNORE_PATHS, e.g. node_modules
+    use_default_ignore_paths: bool = True
+    # Globs or regexes (prefixed with "regex:") of paths not to scan in specific repositories, by their full name
+    repository_ignore_paths: dict[str, list[str]] = field(default_factory=dict)
+    output: OutputConfig = field(default_factory=OutputConfig)
 
     def __post_init__(self):
         if type(self.organisations) == dict:
@@ -75,3 +94,18 @@ class Config:
 
     def skip_repo(self, repository: GithubRepository) -> bool:
         return self.repositories.get(repository.full_name) == "exclude"
+
+    def get_ignore_paths(self, repository: GithubRepository) -> tuple[str, ...]:
+        ignore_paths = list(DEFAULT_IGNORE_PATHS) if self.use_default_ignore_paths else []
+        ignore_paths.extend(self.ignore_paths)
+
+        # Repositories aren't tracked by the account they were found through, so the account config is looked up by
+        # the repository's owner
+        owner = repository.owner.login if repository.owner is not None else None
+        account_config = (self.organisations or {}).get(owner) or (self.users or {}).get(owner)  # type: ignore
+        if account_config is not None:
+            ignore_paths.extend(account_config.ignore_paths)
+
+        ignore_paths.extend(self.repository_ignore_paths.get(repository.full_name, []))
+
+        return tuple(ignore_paths)
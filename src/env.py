@@ -5,3 +5,101 @@ LOGGING_LEVEL = os.getenv("LOGGING_LEVEL", "INFO")
 FIRETAIL_API_URL = os.getenv("FIRETAIL_API_URL", "https://api.saas.eu-west-1.prod.firetail.app")
 FIRETAIL_APP_TOKEN = os.getenv("FIRETAIL_APP_TOKEN")
 GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
+
+# If true, discovered OpenAPI specs are only validated against the JSON schema for their version, which is faster
+OPENAPI_STRUCTURE_ONLY_VALIDATION = os.getenv("OPENAPI_STRUCTURE_ONLY_VALIDATION", "false").lower() == "true"
+
+# How many resolved OpenAPI specs' validation results are cached by their canonical hash, so identical specs found in
+# several places, in one repository or across many, are only validated once. 0 disables the cache.
+OPENAPI_VALIDATION_CACHE_SIZE = int(os.getenv("OPENAPI_VALIDATION_CACHE_SIZE", "1024"))
+
+# About the most directories that can be waiting to be walked while scanning a repository. When a directory has more
+# subdirectories than fit, it's listed again for the rest once the ones which fit have been walked.
+MAX_PENDING_DIRECTORIES = int(os.getenv("MAX_PENDING_DIRECTORIES", "10000"))
+
+# Files larger than this are skipped without being fetched. GitHub's contents API doesn't return the contents of files
+# over 1MB anyway.
+MAX_FILE_SIZE_BYTES = int(os.getenv("MAX_FILE_SIZE_BYTES", "1000000"))
+
+# How long validating a file as an OpenAPI spec, or analysing it with each language analyser, can take before it's
+# aborted and the file is skipped. 0 disables the limit.
+FILE_ANALYSIS_TIMEOUT_SECONDS = float(os.getenv("FILE_ANALYSIS_TIMEOUT_SECONDS", "30"))
+
+# If true, source files which look generated or minified aren't parsed by the language analysers
+SKIP_GENERATED_AND_MINIFIED_FILES = os.getenv("SKIP_GENERATED_AND_MINIFIED_FILES", "true").lower() == "true"
+
+# How many worker processes to run the language analysers in. 0 runs them in the scanner's process instead. Worker
+# processes need shared memory, which AWS Lambda doesn't provide, so this can only be used with the local handler.
+ANALYSER_WORKERS = int(os.getenv("ANALYSER_WORKERS", "0"))
+
+# The most memory each analyser worker process can allocate, in bytes. 0 disables the limit.
+ANALYSER_WORKER_MEMORY_LIMIT_BYTES = int(os.getenv("ANALYSER_WORKER_MEMORY_LIMIT_BYTES", str(2 * 1024**3)))
+
+# How many batches of files each analyser worker process analyses before it's replaced with a fresh one
+ANALYSER_WORKER_MAX_TASKS = int(os.getenv("ANALYSER_WORKER_MAX_TASKS", "100"))
+
+# How many files are sent to an analyser worker process at a time
+ANALYSER_BATCH_SIZE = int(os.getenv("ANALYSER_BATCH_SIZE", "16"))
+
+# How many OpenAPI specs are uploaded to FireTail at once
+FIRETAIL_UPLOAD_CONCURRENCY = int(os.getenv("FIRETAIL_UPLOAD_CONCURRENCY", "8"))
+
+# How many times a request to FireTail is retried after a connection error, timeout, 429 or 5xx response
+FIRETAIL_MAX_RETRIES = int(os.getenv("FIRETAIL_MAX_RETRIES", "4"))
+
+# The backoff before the first retry of a request to FireTail, which doubles with each retry, up to the max backoff. A
+# random amount of up to the backoff is waited, so concurrent uploads which fail together don't retry together.
+FIRETAIL_RETRY_BACKOFF_SECONDS = float(os.getenv("FIRETAIL_RETRY_BACKOFF_SECONDS", "0.5"))
+FIRETAIL_MAX_RETRY_BACKOFF_SECONDS = float(os.getenv("FIRETAIL_MAX_RETRY_BACKOFF_SECONDS", "30"))
+
+# How long a request to FireTail can take before it's retried
+FIRETAIL_REQUEST_TIMEOUT_SECONDS = float(os.getenv("FIRETAIL_REQUEST_TIMEOUT_SECONDS", "30"))
+
+# Where the hashes of the OpenAPI specs last uploaded to FireTail are recorded, so unchanged specs aren't uploaded
+# again. An empty path disables the record. On AWS Lambda, /tmp persists between invocations of a warm instance.
+UPLOAD_STATE_PATH = os.getenv("UPLOAD_STATE_PATH", "/tmp/github-api-discovery/upload-state.json")
+
+# How long after it was last uploaded an unchanged spec is uploaded again anyway, in case it's been lost from FireTail
+UPLOAD_STATE_TTL_SECONDS = float(os.getenv("UPLOAD_STATE_TTL_SECONDS", str(7 * 24 * 60 * 60)))
+
+# If true, specs at least DELTA_UPLOAD_MIN_BYTES large are kept alongside the upload state, and the next time they
+# change only a JSON Patch against the last version FireTail accepted is uploaded, falling back to a full upload if
+# FireTail doesn't support patches
+DELTA_UPLOADS = os.getenv("DELTA_UPLOADS", "false").lower() == "true"
+DELTA_UPLOAD_MIN_BYTES = int(os.getenv("DELTA_UPLOAD_MIN_BYTES", "1000000"))
+
+# How many discovered OpenAPI specs can be waiting to be uploaded to FireTail, or uploading, at once. Once this many
+# are, scanning pauses until one has been uploaded.
+MAX_SPEC_UPLOADS_IN_FLIGHT = int(os.getenv("MAX_SPEC_UPLOADS_IN_FLIGHT", "16"))
+
+# Where discovered OpenAPI specs are sent: "firetail", "ndjson" to write them to OUTPUT_PATH, or "null" to discard them,
+# e.g. to benchmark scanning. Overrides the output sink in config.yml. Defaults to "firetail" if neither is set.
+OUTPUT_SINK = os.getenv("OUTPUT_SINK")
+
+# The NDJSON file the "ndjson" output sink writes specs to or, if it's a directory, the directory it writes an NDJSON
+# file for each repository to. Overrides the output path in config.yml.
+OUTPUT_PATH = os.getenv("OUTPUT_PATH")
+
+# If set, the local handler writes a JSON report of the scan's per-stage timings, counters and slowest files here
+SCAN_REPORT_PATH = os.getenv("SCAN_REPORT_PATH")
+
+# How many of the slowest files are listed in the scan report
+SCAN_REPORT_SLOWEST_FILES = int(os.getenv("SCAN_REPORT_SLOWEST_FILES", "20"))
+
+# If set, the metrics of the scan in progress are served in the Prometheus text format on this port at /metrics
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+
+# If set, the metrics of the scan in progress are written to this file in the Prometheus text format every
+# METRICS_TEXTFILE_INTERVAL_SECONDS, e.g. for node_exporter's textfile collector
+METRICS_TEXTFILE_PATH = os.getenv("METRICS_TEXTFILE_PATH")
+METRICS_TEXTFILE_INTERVAL_SECONDS = float(os.getenv("METRICS_TEXTFILE_INTERVAL_SECONDS", "15"))
+
+# If set, the scan is traced, with spans for each repository, directory listing, file, analyser and upload, and the
+# trace is written to this file as Chrome trace events, which can be viewed in chrome://tracing, Perfetto or speedscope
+TRACE_PATH = os.getenv("TRACE_PATH")
+
+# The fraction of repositories whose scans are traced, so tracing long scans stays cheap
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "1"))
+
+# The most spans a trace can have. Any more are dropped.
+TRACE_MAX_EVENTS = int(os.getenv("TRACE_MAX_EVENTS", "1000000"))
@@ -0,0 +1,298 @@
+import datetime
+import email.utils
+import gzip
+import json
+import random
+import time
+from dataclasses import dataclass
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from env import (  # type: ignore
+    FIRETAIL_MAX_RETRIES,
+    FIRETAIL_MAX_RETRY_BACKOFF_SECONDS,
+    FIRETAIL_REQUEST_TIMEOUT_SECONDS,
+    FIRETAIL_RETRY_BACKOFF_SECONDS,
+    FIRETAIL_UPLOAD_CONCURRENCY,
+)
+from openapi.json_patch import get_json_patch
+from utils import logger
+
+# Responses to requests which may succeed if they're retried
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# FireTail responds 201 to a new or updated spec, and 304 to a spec it already has
+SPEC_UPLOADED_STATUS_CODES = {201, 304}
+
+# Responses to a patch meaning FireTail doesn't support patches, in which case specs are only uploaded in full from then
+# on. A 415 only means FireTail doesn't support gzipped requests. Any other rejected patch, e.g. because FireTail's
+# version of the spec isn't the one the patch is against, is uploaded in full instead.
+DELTA_UPLOADS_UNSUPPORTED_STATUS_CODES = {404, 405, 501}
+GZIP_UNSUPPORTED_STATUS_CODE = 415
+
+
+@dataclass
+class SpecUploadResult:
+    source: str
+    succeeded: bool
+    status_code: int | None = None
+    # How many requests were made, including retries
+    attempts: int = 0
+    # The body of the last response, or the exception raised making the last request
+    error: str | None = None
+    # Whether the spec was uploaded as a patch against the last version FireTail accepted
+    delta: bool = False
+
+
+def get_retry_after_seconds(response: requests.Response) -> float | None:
+    # Retry-After can be a number of seconds or an HTTP date
+    retry_after = response.headers.get("Retry-After")
+    if retry_after is None:
+        return None
+
+    try:
+        return max(0, float(retry_after))
+    except ValueError:
+        pass
+
+    try:
+        retry_at = email.utils.parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=datetime.timezone.utc)
+    return max(0, (retry_at - datetime.datetime.now(datetime.timezone.utc)).total_seconds())
+
+
+class FiretailClient:
+    """A client for the FireTail API's discovery endpoints, which reuses its connections through a pooled session and
+    retries requests which fail with a connection error, timeout, 429 or 5xx response. Specs can be uploaded from up to
+    upload_concurrency threads at once.
+    """
+
+    def __init__(
+        self,
+        firetail_api_url: str,
+        firetail_app_token: str,
+        upload_concurrency: int = FIRETAIL_UPLOAD_CONCURRENCY,
+        max_retries: int = FIRETAIL_MAX_RETRIES,
+        retry_backoff_seconds: float = FIRETAIL_RETRY_BACKOFF_SECONDS,
+        max_retry_backoff_seconds: float = FIRETAIL_MAX_RETRY_BACKOFF_SECONDS,
+        request_timeout_seconds: float = FIRETAIL_REQUEST_TIMEOUT_SECONDS,
+    ):
+        self.firetail_api_url = firetail_api_url
+        self.upload_concurrency = max(1, upload_concurrency)
+        self.max_retries = max_retries
+        self.retry_backoff_seconds = retry_backoff_seconds
+        self.max_retry_backoff_seconds = max_retry_backoff_seconds
+        self.request_timeout_seconds = request_timeout_seconds
+
+        self.session = requests.Session()
+        self.session.headers.update({"x-ft-app-key": firetail_app_token, "Content-Type": "application/json"})
+        # One connection is kept alive for each concurrent upload, so they don't each pay for a TLS handshake
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.upload_concurrency)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        # Assumed until FireTail responds otherwise, after which they're not attempted again by this client
+        self.supports_delta_uploads = True
+        self.supports_gzip = True
+
+    def get_retry_backoff_seconds(self, retry: int) -> float:
+        return random.uniform(0, min(self.max_retry_backoff_seconds, self.retry_backoff_seconds * 2**retry))
+
+    def request(
+        self, method: str, path: str, data: str | bytes, headers: dict[str, str] | None = None
+    ) -> tuple[requests.Response | None, int, str | None]:
+        """Makes a request to the FireTail API, retrying it if it fails with a connection error, timeout, 429 or 5xx
+        response
+
+        Args:
+            method (str): The method of the request, e.g. "POST"
+            path (str): The path of the endpoint, e.g. "/discovery/api-repository"
+            data (str | bytes): The JSON body of the request, which may be compressed
+            headers (dict[str, str] | None, optional): Headers to add to the session's. Defaults to None.
+
+        Returns:
+            tuple[requests.Response | None, int, str | None]: The last response, or None if the last request raised an
+            exception; how many requests were made; and the exception raised, if one was. Requests which raise any
+            exception other than a connection error or timeout, e.g. for an invalid URL, aren't retried.
+        """
+        attempts = 0
+        while True:
+            attempts += 1
+            response, error = None, None
+            try:
+                response = self.session.request(
+                    method,
+                    f"{self.firetail_api_url}{path}",
+                    data=data,
+                    headers=headers,
+                    timeout=self.request_timeout_seconds,
+                )
+            except (requests.ConnectionError, requests.Timeout) as exception:
+                error = str(exception)
+            except requests.RequestException as exception:
+                return None, attempts, str(exception)
+
+            is_retryable = response is None or response.status_code in RETRYABLE_STATUS_CODES
+            if not is_retryable or attempts > self.max_retries:
+                return response, attempts, error
+
+            backoff_seconds = self.get_retry_backoff_seconds(attempts - 1)
+            retry_after_seconds = get_retry_after_seconds(response) if response is not None else None
+            if retry_after_seconds is not None:
+                # Retrying sooner than FireTail asked would only be rejected again, and waiting longer than the max
+                # backoff would hold up the scan, so the request is given up on instead
+                if retry_after_seconds > self.max_retry_backoff_seconds:
+                    return response, attempts, error
+                backoff_seconds = max(backoff_seconds, retry_after_seconds)
+
+            logger.warning(
+                f"Request to {path} failed ({response.status_code if response is not None else error}), retrying in"
+                f" {round(backoff_seconds, ndigits=3)} second(s)..."
+            )
+            time.sleep(backoff_seconds)
+
+    def create_api_repository(self, full_name: str, repository_id: int) -> str | None:
+        """Creates an API for a repository in FireTail, or gets it if it already exists
+
+        Args:
+            full_name (str): The full name of the repository
+            repository_id (int): The GitHub ID of the repository
+
+        Returns:
+            str | None: The UUID of the API, or None if it couldn't be created
+        """
+        response, _, error = self.request(
+            "POST", "/discovery/api-repository", json.dumps({"full_name": full_name, "id": f"github:{repository_id}"})
+        )
+        if response is None or response.status_code != 200:
+            logger.critical(
+                f"{full_name}: Failed to create API in SaaS, response:"
+                f" {response.text if response is not None else error}"
+            )
+            return None
+
+        try:
+            api_uuid = response.json()["api"]["UUID"]
+        except (KeyError, TypeError, ValueError):
+            logger.critical(f"{full_name}: Failed to create API in SaaS, malformed response: {response.text}")
+            return None
+
+        logger.info(f"{full_name}: Successfully created/updated API in Firetail SaaS, response: {response.text}")
+        return api_uuid
+
+    def upload_api_spec_delta(
+        self,
+        api_uuid: str,
+        source: str,
+        openapi_spec: dict,
+        base_spec_hash: str,
+        base_spec: dict,
+        sources: list[str] | None = None,
+    ) -> SpecUploadResult | None:
+        """Uploads a spec as a JSON Patch against the last version of it FireTail accepted, gzipped if FireTail supports
+        it
+
+        Args:
+            api_uuid (str): The UUID of the API to upload the spec to
+            source (str): The source of the spec
+            openapi_spec (dict): The spec
+            base_spec_hash (str): The canonical hash of the last version of the spec FireTail accepted
+            base_spec (dict): The last version of the spec FireTail accepted
+            sources (list[str] | None, optional): Every source the spec was discovered at, if there's more than one.
+            Defaults to None.
+
+        Returns:
+            SpecUploadResult | None: The result of the accepted patch, or None if the spec should be uploaded in full
+            instead, as the patch wasn't accepted
+        """
+        patch_json = json.dumps(
+            {
+                "source": source,
+                **({"sources": sources} if sources else {}),
+                "base_hash": base_spec_hash,
+                "patch": get_json_patch(base_spec, openapi_spec),
+            },
+            default=str,
+        )
+
+        while True:
+            if self.supports_gzip:
+                response, attempts, error = self.request(
+                    "PATCH",
+                    f"/discovery/api-repository/{api_uuid}/appspec",
+                    gzip.compress(patch_json.encode("utf-8")),
+                    {"Content-Type": "application/json-patch+json", "Content-Encoding": "gzip"},
+                )
+            else:
+                response, attempts, error = self.request(
+                    "PATCH",
+                    f"/discovery/api-repository/{api_uuid}/appspec",
+                    patch_json,
+                    {"Content-Type": "application/json-patch+json"},
+                )
+
+            if response is not None and response.status_code == GZIP_UNSUPPORTED_STATUS_CODE and self.supports_gzip:
+                logger.info("FireTail doesn't support gzipped requests, sending patches uncompressed from now on")
+                self.supports_gzip = False
+                continue
+            break
+
+        if response is not None and response.status_code in SPEC_UPLOADED_STATUS_CODES:
+            return SpecUploadResult(source, True, response.status_code, attempts, delta=True)
+
+        # A 415 to an uncompressed patch means FireTail doesn't support patches at all
+        unsupported_status_codes = DELTA_UPLOADS_UNSUPPORTED_STATUS_CODES | {GZIP_UNSUPPORTED_STATUS_CODE}
+        if response is not None and response.status_code in unsupported_status_codes:
+            logger.info(f"FireTail doesn't support patches ({response.status_code}), uploading in full from now on")
+            self.supports_delta_uploads = False
+        else:
+            logger.info(
+                f"Patch of {source} wasn't accepted ({response.status_code if response is not None else error}),"
+                " uploading it in full"
+            )
+        return None
+
+    def upload_api_spec(
+        self,
+        api_uuid: str,
+        source: str,
+        openapi_spec: dict,
+        base_spec: tuple[str, dict] | None = None,
+        sources: list[str] | None = None,
+    ) -> SpecUploadResult:
+        """Uploads a spec to an API in FireTail, as a patch if the last version of it FireTail accepted is given and
+        FireTail supports patches, or otherwise in full
+
+        Args:
+            api_uuid (str): The UUID of the API to upload the spec to
+            source (str): The source of the spec
+            openapi_spec (dict): The spec
+            base_spec (tuple[str, dict] | None, optional): The canonical hash of the last version of the spec FireTail
+            accepted, and that version. Defaults to None.
+            sources (list[str] | None, optional): Every source the spec was discovered at, if identical copies of it
+            were discovered elsewhere in the repository, so it's only uploaded once. Defaults to None.
+
+        Returns:
+            SpecUploadResult: Whether the spec was uploaded
+        """
+        if base_spec is not None and self.supports_delta_uploads:
+            spec_upload_result = self.upload_api_spec_delta(api_uuid, source, openapi_spec, *base_spec, sources)
+            if spec_upload_result is not None:
+                return spec_upload_result
+
+        response, attempts, error = self.request(
+            "POST",
+            f"/discovery/api-repository/{api_uuid}/appspec",
+            json.dumps(
+                {"source": source, **({"sources": sources} if sources else {}), "appspec": openapi_spec}, default=str
+            ),
+        )
+        if response is None:
+            return SpecUploadResult(source, False, attempts=attempts, error=error)
+        if response.status_code not in SPEC_UPLOADED_STATUS_CODES:
+            return SpecUploadResult(source, False, response.status_code, attempts, response.text)
+        return SpecUploadResult(source, True, response.status_code, attempts)
@@ -0,0 +1,128 @@
+import logging
+import re
+
+from metrics import get_metrics, increment, record_github_request, set_gauge
+from utils import logger
+
+# PyGithub logs every request it makes, with its response's status and headers, to this logger at the debug level
+GITHUB_REQUESTER_LOGGER_NAME = "github.Requester"
+
+# The prefix of the API's paths on GitHub Enterprise Server, e.g. /api/v3/repos/...
+GITHUB_ENTERPRISE_PATH_PREFIX = re.compile(r"^/api/v\d+(?=/)")
+
+# The outcome requests rejected by a rate limit are counted as. Any other request is counted by its status, e.g. "200".
+OUTCOME_RATE_LIMITED = "rate_limited"
+
+
+def get_endpoint(url: str) -> tuple[str, str | None]:
+    """Gets the type of endpoint a request was made to, and the repository it was about if any, from its URL. Owners,
+    repositories and paths are left out of the type, so there are only a few types, e.g. /repos/{owner}/{repo}/contents/
+    src/app.py is "repos/contents", /orgs/{org}/repos is "orgs/repos" and /rate_limit is "rate_limit".
+
+    Args:
+        url (str): The path and query the request was made to, as PyGithub logs it
+
+    Returns:
+        tuple[str, str | None]: The type of endpoint, and the full name of the repository or None
+    """
+    path = GITHUB_ENTERPRISE_PATH_PREFIX.sub("", url.split("?", 1)[0])
+    parts = [part for part in path.split("/") if part != ""]
+
+    match parts:
+        case ["repos", owner, repository]:
+            return "repos", f"{owner}/{repository}"
+        case ["repos", owner, repository, resource, *_]:
+            return f"repos/{resource}", f"{owner}/{repository}"
+        case ["orgs" | "users" as scope, _]:
+            return scope, None
+        case ["orgs" | "users" as scope, _, resource, *_]:
+            return f"{scope}/{resource}", None
+        case [resource, subresource, *_] if not subresource.isdigit():
+            return f"{resource}/{subresource}", None
+        case [resource, *_]:
+            return resource, None
+
+    return "root", None
+
+
+def get_outcome(status: int, response_headers: dict) -> str:
+    # GitHub responds to requests over its primary or secondary rate limits with a 403 or 429, saying no requests
+    # remain or when to retry
+    if status in {403, 429} and (
+        response_headers.get("x-ratelimit-remaining") == "0" or "retry-after" in response_headers
+    ):
+        return OUTCOME_RATE_LIMITED
+    return str(status)
+
+
+class GithubRequestRecorder(logging.Handler):
+    """Records the metrics of every request PyGithub makes from the debug log records its requester emits for them, so
+    every request is accounted for by its endpoint, repository and outcome, and the rate limit remaining can be read
+    from the response headers without another request to GitHub's rate limit API
+    """
+
+    def emit(self, record: logging.LogRecord):
+        # The record's args are the request's verb, scheme, hostname, URL, headers and body, then the response's status,
+        # headers and body
+        if not isinstance(record.args, tuple) or len(record.args) != 9:
+            return
+        _, _, _, url, _, _, status, response_headers, _ = record.args
+        if not isinstance(status, int):
+            return
+        if not isinstance(response_headers, dict):
+            response_headers = {}
+
+        increment("github_requests")
+        endpoint, repository = get_endpoint(str(url))
+
+        rate_limit_remaining = None
+        rate_limit = None
+        # Only the core rate limit's headers are recorded. The search API has its own, and the rate limit API's requests
+        # don't count towards any.
+        if response_headers.get("x-ratelimit-resource", "core") == "core" and endpoint != "rate_limit":
+            try:
+                rate_limit_remaining = int(response_headers["x-ratelimit-remaining"])
+                rate_limit = int(response_headers["x-ratelimit-limit"])
+            except (KeyError, ValueError):
+                pass
+        if rate_limit_remaining is not None:
+            set_gauge("github_rate_limit_remaining", rate_limit_remaining)
+        if rate_limit is not None:
+            set_gauge("github_rate_limit", rate_limit)
+
+        record_github_request(endpoint, repository, get_outcome(status, response_headers))
+
+
+GITHUB_REQUEST_RECORDER = GithubRequestRecorder()
+
+
+def install_github_request_recorder():
+    github_requester_logger = logging.getLogger(GITHUB_REQUESTER_LOGGER_NAME)
+    if GITHUB_REQUEST_RECORDER in github_requester_logger.handlers:
+        return
+    github_requester_logger.addHandler(GITHUB_REQUEST_RECORDER)
+    github_requester_logger.setLevel(logging.DEBUG)
+    # The debug records are only for the recorder, so they mustn't reach any handlers on the root logger, e.g. Lambda's
+    github_requester_logger.propagate = False
+
+
+def log_github_requests_summary():
+    """Logs how many requests the scan made to GitHub, their outcomes, and how much of the rate limit the next scan is
+    predicted to use"""
+    github_requests_report = get_metrics().get_report()["github_requests"]
+    budget = github_requests_report["next_scan_budget"]
+    outcomes = ", ".join(f"{outcome}: {count}" for outcome, count in github_requests_report["by_outcome"].items())
+    heaviest_repositories = ", ".join(
+        f"{repository} ({repository_requests['requests']})"
+        for repository, repository_requests in list(github_requests_report["by_repository"].items())[:5]
+    )
+    logger.info(
+        f"Made {github_requests_report['requests']} request(s) to GitHub ({outcomes or 'none'}). "
+        f"Most requests made for: {heaviest_repositories or 'no repositories'}"
+    )
+    if budget["rate_limit"]:
+        logger.info(
+            f"The next scan is predicted to make {budget['predicted_requests']} request(s) to GitHub, "
+            f"{round(budget['predicted_rate_limit_hours'] * 100, ndigits=1)}% of the hourly rate limit of "
+            f"{budget['rate_limit']}. {budget['rate_limit_remaining']} request(s) remain this hour."
+        )
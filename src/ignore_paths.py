@@ -0,0 +1,98 @@
+import re
+from functools import cache
+
+from utils import logger
+
+# Directories which are almost always vendored dependencies, build output, VCS metadata or test fixtures. Scanning them
+# is slow, as for JS monorepos they can be most of the tree, and only ever discovers APIs the repository doesn't serve.
+DEFAULT_IGNORE_PATHS = [
+    ".git",
+    ".hg",
+    ".svn",
+    "node_modules",
+    "bower_components",
+    "vendor",
+    "dist",
+    "build",
+    "__pycache__",
+    ".venv",
+    "venv",
+    ".tox",
+    "fixtures",
+    "__fixtures__",
+    "testdata",
+]
+
+# Ignore paths starting with this prefix are regular expressions, the rest are globs
+REGEX_IGNORE_PATH_PREFIX = "regex:"
+
+
+def glob_to_regex(glob: str) -> str:
+    """Translates an ignore path glob to a regular expression matching the paths it ignores, in the style of a
+    .gitignore: "*" and "?" don't match "/", "**" does, a glob without a "/" matches a file or directory of that name
+    anywhere in the repository, and a glob matching a directory also matches everything in it.
+
+    Args:
+        glob (str): The glob, e.g. "node_modules", "docs/**/examples" or "*.min.js"
+
+    Returns:
+        str: The equivalent regular expression, for use with re.search
+    """
+    # A trailing "/" only means the glob is for a directory, and a leading "/" anchors the glob to the root of the
+    # repository, which any glob containing a "/" already is
+    stripped_glob = glob.strip("/")
+    prefix = "^" if "/" in glob.rstrip("/") else "(?:^|/)"
+
+    regex_parts = []
+    i = 0
+    while i < len(stripped_glob):
+        if stripped_glob.startswith("**/", i):
+            regex_parts.append("(?:.*/)?")
+            i += 3
+        elif stripped_glob.startswith("**", i):
+            regex_parts.append(".*")
+            i += 2
+        elif stripped_glob[i] == "*":
+            regex_parts.append("[^/]*")
+            i += 1
+        elif stripped_glob[i] == "?":
+            regex_parts.append("[^/]")
+            i += 1
+        else:
+            regex_parts.append(re.escape(stripped_glob[i]))
+            i += 1
+
+    return prefix + "".join(regex_parts) + "(?:/|$)"
+
+
+@cache
+def compile_ignore_paths(ignore_paths: tuple[str, ...]) -> re.Pattern | None:
+    """Compiles ignore path globs and regular expressions into a single regular expression, so each path is checked
+    against all of them in one search. Compiled ignore paths are cached, so repositories with the same ignore paths
+    share them.
+
+    Args:
+        ignore_paths (tuple[str, ...]): Globs (see glob_to_regex) and regular expressions prefixed with "regex:", which
+        are searched for anywhere in a path. Invalid regular expressions are logged and skipped.
+
+    Returns:
+        re.Pattern | None: The compiled ignore paths, or None if there are none
+    """
+    regexes = []
+    for ignore_path in ignore_paths:
+        if not ignore_path.startswith(REGEX_IGNORE_PATH_PREFIX):
+            regexes.append(glob_to_regex(ignore_path))
+            continue
+
+        regex = ignore_path.removeprefix(REGEX_IGNORE_PATH_PREFIX)
+        try:
+            re.compile(f"(?:{regex})")
+        except re.error as exception:
+            logger.warning(f"Skipping invalid ignore path {ignore_path}, exception raised: {exception}")
+            continue
+        regexes.append(regex)
+
+    if len(regexes) == 0:
+        return None
+
+    return re.compile("|".join(f"(?:{regex})" for regex in regexes))
@@ -1,5 +1,9 @@
 import time
+from github_requests import log_github_requests_summary
+from metrics import get_metrics
+from prometheus import metrics_exporters
 from scanning import scan
+from tracing import tracing
 from utils import logger
 
 
@@ -7,8 +11,10 @@ def handler(event, context):
     logger.info(f"Invoked by event {event} in context {context}")
 
     start_time = time.time()
-    repositories_scanned, openapi_specs_discovered = scan()
+    with metrics_exporters(), tracing():
+        repositories_scanned, openapi_specs_discovered = scan()
     scan_duration = time.time() - start_time
+    log_github_requests_summary()
 
     logger.info(
         f"Scanned {repositories_scanned} repositories. "
@@ -21,4 +27,5 @@ def handler(event, context):
         "repositories_scanned": list(repositories_scanned),
         "openapi_specs_discovered": openapi_specs_discovered,
         "scan_duration": scan_duration,
+        "report": get_metrics().get_report(),
     }
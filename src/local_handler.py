@@ -1,12 +1,33 @@
+import json
 import time
+from env import SCAN_REPORT_PATH
+from github_requests import log_github_requests_summary
+from metrics import get_metrics
+from prometheus import metrics_exporters
 from scanning import scan
+from tracing import tracing
+from upload_state import write_file_atomically
 from utils import logger
 
 
+def write_scan_report(path: str):
+    try:
+        write_file_atomically(path, json.dumps(get_metrics().get_report(), indent=2))
+    except OSError as exception:
+        logger.warning(f"Failed to write scan report to {path}, exception raised: {exception}")
+        return
+    logger.info(f"Wrote scan report to {path}")
+
+
 def handler():
     start_time = time.time()
-    repositories_scanned, openapi_specs_discovered = scan()
+    with metrics_exporters(), tracing():
+        repositories_scanned, openapi_specs_discovered = scan()
     scan_duration = time.time() - start_time
+    log_github_requests_summary()
+
+    if SCAN_REPORT_PATH:
+        write_scan_report(SCAN_REPORT_PATH)
 
     if len(repositories_scanned) == 0:
         logger.warning(
@@ -22,4 +43,6 @@ def handler():
     )
 
 
-handler()
+# The guard stops analyser worker processes, which are spawned and so import this module, from running a scan too
+if __name__ == "__main__":
+    handler()
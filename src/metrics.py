@@ -0,0 +1,283 @@
+import bisect
+import heapq
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Iterator
+
+from env import SCAN_REPORT_SLOWEST_FILES  # type: ignore
+
+# The upper bounds of the buckets durations are counted in, in seconds. The last bucket is unbounded.
+DURATION_BUCKETS_SECONDS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300)
+
+# The full name of the repository being scanned, which metrics recorded without a repository are attributed to. It's a
+# context variable rather than a global so metrics recorded in other threads, e.g. by uploads, aren't misattributed.
+CURRENT_REPOSITORY: ContextVar[str | None] = ContextVar("CURRENT_REPOSITORY", default=None)
+
+# The endpoint GitHub's rate limit is checked with, whose requests don't count towards the rate limit
+RATE_LIMIT_ENDPOINT = "rate_limit"
+
+
+@dataclass
+class Histogram:
+    count: int = 0
+    total: float = 0.0
+    min: float | None = None
+    max: float | None = None
+    # How many values were in each of DURATION_BUCKETS_SECONDS, with the values larger than all of them last
+    bucket_counts: list[int] = field(default_factory=lambda: [0] * (len(DURATION_BUCKETS_SECONDS) + 1))
+
+    def observe(self, value: float):
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        self.bucket_counts[bisect.bisect_left(DURATION_BUCKETS_SECONDS, value)] += 1
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "total": self.total,
+            "mean": self.total / self.count if self.count > 0 else None,
+            "min": self.min,
+            "max": self.max,
+            "buckets": {
+                **{str(bound): count for bound, count in zip(DURATION_BUCKETS_SECONDS, self.bucket_counts)},
+                "+Inf": self.bucket_counts[-1],
+            },
+        }
+
+
+@dataclass
+class RepositoryMetrics:
+    # The total seconds spent in each stage of scanning the repository, including by each analyser
+    stage_seconds: defaultdict[str, float] = field(default_factory=lambda: defaultdict(float))
+    counters: Counter[str] = field(default_factory=Counter)
+
+
+class ScanMetrics:
+    """The timings and counts of everything done during a scan: a histogram of the durations of each stage of the
+    pipeline (listing directories, fetching files, parsing and validating specs, waiting for the rate limit, uploading)
+    and of each analyser, the total time spent in each stage by each repository, counters, and the slowest files.
+
+    Recording a metric only takes a lock and a few arithmetic operations, so it's cheap enough to do for every file.
+    Metrics can be recorded from any thread.
+    """
+
+    def __init__(self, slowest_files_count: int = SCAN_REPORT_SLOWEST_FILES):
+        self.slowest_files_count = slowest_files_count
+        self.started_at = time.time()
+        self.lock = threading.Lock()
+
+        self.stages: dict[str, Histogram] = {}
+        self.analysers: dict[str, Histogram] = {}
+        self.counters: Counter[str] = Counter()
+        # The current value of things which go up and down, e.g. queue depths
+        self.gauges: dict[str, float] = {}
+        self.repositories: dict[str, RepositoryMetrics] = {}
+        # A min heap of the slowest files' (seconds, repository, path, stage), so the fastest of them is replaced first
+        self.slowest_files: list[tuple[float, str, str, str]] = []
+        # How many requests were made to GitHub by (endpoint, repository, outcome). Requests which aren't about any
+        # repository, e.g. listing an organisation's repositories, have a repository of None.
+        self.github_requests: Counter[tuple[str, str | None, str]] = Counter()
+
+    def get_repository_metrics(self, repository: str | None) -> RepositoryMetrics | None:
+        # Called with the lock held
+        repository = repository if repository is not None else CURRENT_REPOSITORY.get()
+        if repository is None:
+            return None
+        if repository not in self.repositories:
+            self.repositories[repository] = RepositoryMetrics()
+        return self.repositories[repository]
+
+    def observe_stage(self, stage: str, seconds: float, repository: str | None = None):
+        with self.lock:
+            if stage not in self.stages:
+                self.stages[stage] = Histogram()
+            self.stages[stage].observe(seconds)
+            if (repository_metrics := self.get_repository_metrics(repository)) is not None:
+                repository_metrics.stage_seconds[stage] += seconds
+
+    def observe_analyser(self, analyser: str, seconds: float, repository: str | None = None):
+        with self.lock:
+            if analyser not in self.analysers:
+                self.analysers[analyser] = Histogram()
+            self.analysers[analyser].observe(seconds)
+            if (repository_metrics := self.get_repository_metrics(repository)) is not None:
+                repository_metrics.stage_seconds[analyser] += seconds
+
+    def increment(self, counter: str, amount: int = 1, repository: str | None = None):
+        with self.lock:
+            self.counters[counter] += amount
+            if (repository_metrics := self.get_repository_metrics(repository)) is not None:
+                repository_metrics.counters[counter] += amount
+
+    def set_gauge(self, gauge: str, value: float):
+        # A single dict assignment is atomic, so this doesn't need the lock
+        self.gauges[gauge] = value
+
+    def observe_file(self, file_path: str, stage: str, seconds: float, repository: str | None = None):
+        if self.slowest_files_count <= 0:
+            return
+        with self.lock:
+            repository = repository if repository is not None else CURRENT_REPOSITORY.get()
+            slow_file = (seconds, repository or "", file_path, stage)
+            if len(self.slowest_files) < self.slowest_files_count:
+                heapq.heappush(self.slowest_files, slow_file)
+            elif seconds > self.slowest_files[0][0]:
+                heapq.heapreplace(self.slowest_files, slow_file)
+
+    def record_github_request(self, endpoint: str, repository: str | None, outcome: str):
+        with self.lock:
+            repository = repository if repository is not None else CURRENT_REPOSITORY.get()
+            self.github_requests[(endpoint, repository, outcome)] += 1
+
+    def get_github_requests_report(self) -> dict:
+        """Gets a report of the requests made to GitHub, and a prediction of how much of the rate limit the next scan
+        will use, assuming it makes the same requests as this one. Called with the lock held.
+
+        Returns:
+            dict: The number of requests made, by outcome, by endpoint and by repository, with the repositories which
+            made the most first, and the prediction of the next scan's usage of the rate limit
+        """
+        by_outcome: Counter[str] = Counter()
+        by_endpoint: dict[str, Counter[str]] = {}
+        by_repository: dict[str, dict[str, Counter[str]]] = {}
+        for (endpoint, repository, outcome), count in self.github_requests.items():
+            by_outcome[outcome] += count
+            by_endpoint.setdefault(endpoint, Counter())[outcome] += count
+            if repository is not None:
+                repository_requests = by_repository.setdefault(
+                    repository, {"by_endpoint": Counter(), "by_outcome": Counter()}
+                )
+                repository_requests["by_endpoint"][endpoint] += count
+                repository_requests["by_outcome"][outcome] += count
+
+        # Requests which were rate limited will have to be made again, so they're included in the prediction, but
+        # checking the rate limit doesn't count towards it
+        predicted_requests = sum(
+            count for (endpoint, _, _), count in self.github_requests.items() if endpoint != RATE_LIMIT_ENDPOINT
+        )
+        rate_limit = self.gauges.get("github_rate_limit")
+        rate_limit_remaining = self.gauges.get("github_rate_limit_remaining")
+
+        return {
+            "requests": sum(by_outcome.values()),
+            "by_outcome": dict(sorted(by_outcome.items())),
+            "by_endpoint": {
+                endpoint: {"requests": sum(outcomes.values()), "by_outcome": dict(sorted(outcomes.items()))}
+                for endpoint, outcomes in sorted(by_endpoint.items())
+            },
+            "by_repository": {
+                repository: {
+                    "requests": sum(repository_requests["by_outcome"].values()),
+                    "by_endpoint": dict(sorted(repository_requests["by_endpoint"].items())),
+                    "by_outcome": dict(sorted(repository_requests["by_outcome"].items())),
+                }
+                for repository, repository_requests in sorted(
+                    by_repository.items(), key=lambda item: (-sum(item[1]["by_outcome"].values()), item[0])
+                )
+            },
+            "next_scan_budget": {
+                "predicted_requests": predicted_requests,
+                "predicted_requests_per_repository": (
+                    predicted_requests / len(by_repository) if len(by_repository) > 0 else None
+                ),
+                "rate_limit": rate_limit,
+                "rate_limit_remaining": rate_limit_remaining,
+                # The rate limit is per hour, so a scan which needs more than it has to wait for it to reset
+                "predicted_rate_limit_hours": predicted_requests / rate_limit if rate_limit else None,
+                "fits_in_rate_limit_remaining": (
+                    predicted_requests <= rate_limit_remaining if rate_limit_remaining is not None else None
+                ),
+            },
+        }
+
+    def get_report(self) -> dict:
+        """Gets a JSON serialisable report of the metrics recorded so far
+
+        Returns:
+            dict: The scan's duration, the histogram of each stage and analyser, the counters, the seconds spent in each
+            stage and the counters of each repository, the slowest files, slowest first, and the requests made to GitHub
+        """
+        with self.lock:
+            return {
+                "scan_seconds": time.time() - self.started_at,
+                "stages": {stage: histogram.to_dict() for stage, histogram in sorted(self.stages.items())},
+                "analysers": {analyser: histogram.to_dict() for analyser, histogram in sorted(self.analysers.items())},
+                "counters": dict(sorted(self.counters.items())),
+                "gauges": dict(sorted(self.gauges.items())),
+                "repositories": {
+                    repository: {
+                        "stage_seconds": dict(sorted(repository_metrics.stage_seconds.items())),
+                        "counters": dict(sorted(repository_metrics.counters.items())),
+                    }
+                    for repository, repository_metrics in sorted(self.repositories.items())
+                },
+                "slowest_files": [
+                    {"repository": repository, "path": file_path, "stage": stage, "seconds": seconds}
+                    for seconds, repository, file_path, stage in sorted(self.slowest_files, reverse=True)
+                ],
+                "github_requests": self.get_github_requests_report(),
+            }
+
+
+# The metrics of the scan in progress, which are replaced at the start of each scan, as a warm Lambda runs many
+SCAN_METRICS = ScanMetrics()
+
+
+def reset_metrics() -> ScanMetrics:
+    global SCAN_METRICS
+    SCAN_METRICS = ScanMetrics()
+    return SCAN_METRICS
+
+
+def get_metrics() -> ScanMetrics:
+    return SCAN_METRICS
+
+
+@contextmanager
+def repository_scope(repository: str) -> Iterator[None]:
+    """Attributes the metrics recorded in its body to a repository, unless they're recorded with another one"""
+    token = CURRENT_REPOSITORY.set(repository)
+    try:
+        yield
+    finally:
+        CURRENT_REPOSITORY.reset(token)
+
+
+@contextmanager
+def time_stage(stage: str, repository: str | None = None) -> Iterator[None]:
+    """Records how long its body took as a stage of the scan, whether or not it raises"""
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        SCAN_METRICS.observe_stage(stage, time.perf_counter() - start_time, repository)
+
+
+def observe_stage(stage: str, seconds: float, repository: str | None = None):
+    SCAN_METRICS.observe_stage(stage, seconds, repository)
+
+
+def observe_analyser(analyser: str, seconds: float, repository: str | None = None):
+    SCAN_METRICS.observe_analyser(analyser, seconds, repository)
+
+
+def observe_file(file_path: str, stage: str, seconds: float, repository: str | None = None):
+    SCAN_METRICS.observe_file(file_path, stage, seconds, repository)
+
+
+def increment(counter: str, amount: int = 1, repository: str | None = None):
+    SCAN_METRICS.increment(counter, amount, repository)
+
+
+def set_gauge(gauge: str, value: float):
+    SCAN_METRICS.set_gauge(gauge, value)
+
+
+def record_github_request(endpoint: str, repository: str | None, outcome: str):
+    SCAN_METRICS.record_github_request(endpoint, repository, outcome)
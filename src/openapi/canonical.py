@@ -0,0 +1,62 @@
+import hashlib
+import json
+from typing import Iterable, Mapping
+
+# How many hex characters of the hash of their paths the versions of specs generated by static analysis are
+STATIC_ANALYSIS_VERSION_LENGTH = 12
+
+
+def stringify_keys(value):
+    """Converts the keys of every object in a value to strings, as JSON would, e.g. the keys of responses objects parsed
+    from YAML are often ints, which can't be sorted alongside strings like "default"
+    """
+    if type(value) == dict:
+        return {str(key): stringify_keys(child) for key, child in value.items()}
+    if type(value) == list:
+        return [stringify_keys(child) for child in value]
+    return value
+
+
+def get_canonical_json(value) -> str:
+    """Serialises a value to JSON which is the same for equal values, whatever order their keys were inserted in
+
+    Args:
+        value: The value to serialise, e.g. an OpenAPI spec. Values JSON can't represent are serialised with str, the
+        same as when specs are uploaded.
+
+    Returns:
+        str: The canonical JSON
+    """
+    try:
+        return json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    except TypeError:
+        # Raised when an object's keys are a mix of types which can't be sorted together
+        return json.dumps(stringify_keys(value), sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def get_canonical_hash(value) -> str:
+    return hashlib.sha256(get_canonical_json(value).encode("utf-8")).hexdigest()
+
+
+def get_static_analysis_paths(paths: Mapping[str, Iterable[str]]) -> dict[str, dict]:
+    """Builds the paths object of a spec generated by static analysis, ordered by path then method, as the methods are
+    often collected in sets, whose iteration order changes between runs
+
+    Args:
+        paths (Mapping[str, Iterable[str]]): The methods of each path
+
+    Returns:
+        dict[str, dict]: An OpenAPI paths object with a default response for each method
+    """
+    return {
+        path: {
+            method: {"responses": {"default": {"description": "Discovered via static analysis"}}}
+            for method in sorted(paths[path])
+        }
+        for path in sorted(paths)
+    }
+
+
+def get_static_analysis_version(paths: dict[str, dict]) -> str:
+    # Derived from the paths rather than when the spec was generated, so the spec is the same until the API changes
+    return get_canonical_hash(paths)[:STATIC_ANALYSIS_VERSION_LENGTH]
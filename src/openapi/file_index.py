@@ -0,0 +1,85 @@
+import posixpath
+from typing import Any, Callable
+
+# Files in the repository are given URLs under this root so prance can resolve relative references between them, e.g.
+# "paths/notes.yaml" -> "file:///__repository__/paths/notes.yaml". Nothing is ever read from it on disk.
+REPOSITORY_ROOT_URL_PATH = "/__repository__/"
+REPOSITORY_ROOT_URL = f"file://{REPOSITORY_ROOT_URL_PATH}"
+
+# The extensions of the files a spec can reference, which are the only files added to the index
+REFERENCEABLE_FILE_EXTENSIONS = (".json", ".yaml", ".yml")
+
+
+class RepositoryFileIndex:
+    """An index of the files in a repository, used to resolve references between the files of multi-file OpenAPI specs
+    from contents already fetched during the scan. Each file's contents are fetched at most once, and each file is
+    parsed at most once (see openapi.validation.RepositoryReferenceCache), no matter how many references point at it.
+    """
+
+    def __init__(self, fetch_file_contents: Callable[[str], str | None] | None = None):
+        """
+        Args:
+            fetch_file_contents (Callable[[str], str | None] | None, optional): Fetches the contents of a file that
+            hasn't been added to the index, e.g. one in a directory the scan hasn't reached yet, returning None if it
+            doesn't exist. Defaults to None, in which case only files added to the index can be referenced.
+        """
+        self.fetch_file_contents = fetch_file_contents
+
+        # The functions given to add_file, which are only called the first time each file's contents are needed
+        self.file_contents_getters: dict[str, Callable[[], str]] = {}
+
+        # The contents of each file that has been needed so far, or None if it doesn't exist
+        self.file_contents: dict[str, str | None] = {}
+
+        # The parsed contents of each file referenced so far, or the exception raised parsing it
+        self.parsed_files: dict[str, Any] = {}
+
+    def add_file(self, file_path: str, get_file_contents: Callable[[], str]) -> Callable[[], str]:
+        """Adds a file to the index, if it's a JSON or YAML file. The index holds on to the contents of the files added
+        to it until the repository's scan finishes, so any other file, e.g. source code, is left out of it.
+
+        Args:
+            file_path (str): The path of the file in the repository
+            get_file_contents (Callable[[], str]): A function returning the contents of the file
+
+        Returns:
+            Callable[[], str]: A function returning the contents of the file, which should be used instead of the one
+            given so the contents are only fetched once, or not at all if they've already been fetched to resolve a
+            reference
+        """
+        if not file_path.endswith(REFERENCEABLE_FILE_EXTENSIONS):
+            return get_file_contents
+
+        self.file_contents_getters.setdefault(file_path, get_file_contents)
+        return lambda: self.get_file_contents(file_path) or ""
+
+    def get_file_contents(self, file_path: str) -> str | None:
+        if file_path not in self.file_contents:
+            get_file_contents = self.file_contents_getters.get(file_path)
+            if get_file_contents is not None:
+                self.file_contents[file_path] = get_file_contents()
+            elif self.fetch_file_contents is not None:
+                self.file_contents[file_path] = self.fetch_file_contents(file_path)
+            else:
+                self.file_contents[file_path] = None
+        return self.file_contents[file_path]
+
+    @staticmethod
+    def get_file_url(file_path: str) -> str:
+        return REPOSITORY_ROOT_URL + file_path.lstrip("/")
+
+    @staticmethod
+    def get_file_path(url_path: str) -> str | None:
+        """Gets the path of a file in the repository from the path of its URL
+
+        Args:
+            url_path (str): The path of the file's URL, e.g. "/__repository__/paths/../paths/notes.yaml"
+
+        Returns:
+            str | None: The normalised path of the file in the repository, e.g. "paths/notes.yaml", or None if the URL
+            is outside of the repository
+        """
+        normalised_url_path = posixpath.normpath(url_path)
+        if not normalised_url_path.startswith(REPOSITORY_ROOT_URL_PATH):
+            return None
+        return normalised_url_path.removeprefix(REPOSITORY_ROOT_URL_PATH)
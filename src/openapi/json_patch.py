@@ -0,0 +1,91 @@
+import copy
+
+
+def escape_json_pointer_token(token: str | int) -> str:
+    return str(token).replace("~", "~0").replace("/", "~1")
+
+
+def unescape_json_pointer_token(token: str) -> str:
+    return token.replace("~1", "/").replace("~0", "~")
+
+
+def get_json_patch(source, target) -> list[dict]:
+    """Computes a JSON Patch (RFC 6902) which transforms one JSON document into another, in time linear in the size of
+    the documents. Objects are diffed key by key, and arrays index by index, with elements added or removed at the end
+    if their lengths differ, so no attempt is made to find the smallest patch for an array which had elements inserted
+    or removed from its middle. The documents are walked with an explicit stack, so deep documents can't hit the
+    recursion limit.
+
+    Args:
+        source: The document to patch, e.g. the last version of a spec to be uploaded
+        target: The document the patch should transform it into
+
+    Returns:
+        list[dict]: The operations of the patch, which only use "add", "remove" and "replace"
+    """
+    patch: list[dict] = []
+    values_to_diff = [("", source, target)]
+
+    while len(values_to_diff) > 0:
+        path, source_value, target_value = values_to_diff.pop()
+
+        if type(source_value) == dict and type(target_value) == dict:
+            for key in source_value:
+                if key not in target_value:
+                    patch.append({"op": "remove", "path": f"{path}/{escape_json_pointer_token(key)}"})
+            for key, target_child in target_value.items():
+                child_path = f"{path}/{escape_json_pointer_token(key)}"
+                if key not in source_value:
+                    patch.append({"op": "add", "path": child_path, "value": target_child})
+                else:
+                    values_to_diff.append((child_path, source_value[key], target_child))
+
+        elif type(source_value) == list and type(target_value) == list:
+            common_length = min(len(source_value), len(target_value))
+            # Elements are removed from the end first, so the indexes of the elements before them don't change
+            for index in reversed(range(common_length, len(source_value))):
+                patch.append({"op": "remove", "path": f"{path}/{index}"})
+            for index in range(common_length, len(target_value)):
+                patch.append({"op": "add", "path": f"{path}/{index}", "value": target_value[index]})
+            for index in range(common_length):
+                values_to_diff.append((f"{path}/{index}", source_value[index], target_value[index]))
+
+        # Booleans are compared by type too, as True == 1 in Python but not in JSON
+        elif type(source_value) != type(target_value) or source_value != target_value:
+            patch.append({"op": "replace", "path": path, "value": target_value})
+
+    return patch
+
+
+def apply_json_patch(document, patch: list[dict]):
+    """Applies a JSON Patch made of "add", "remove" and "replace" operations, as made by get_json_patch
+
+    Args:
+        document: The document to patch, which isn't modified
+        patch (list[dict]): The operations to apply
+
+    Returns:
+        The patched document
+    """
+    document = copy.deepcopy(document)
+
+    for operation in patch:
+        if operation["path"] == "":
+            document = copy.deepcopy(operation["value"])
+            continue
+
+        *parent_tokens, last_token = [unescape_json_pointer_token(token) for token in operation["path"].split("/")[1:]]
+        parent = document
+        for token in parent_tokens:
+            parent = parent[int(token)] if type(parent) == list else parent[token]
+
+        key: str | int = int(last_token) if type(parent) == list else last_token
+        match operation["op"]:
+            case "add" if type(parent) == list:
+                parent.insert(key, copy.deepcopy(operation["value"]))  # type: ignore
+            case "add" | "replace":
+                parent[key] = copy.deepcopy(operation["value"])
+            case "remove":
+                del parent[key]
+
+    return document
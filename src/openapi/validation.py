@@ -1,42 +1,356 @@
 import json
-from typing import Callable
+import re
+from collections import OrderedDict
+from typing import Any, Callable
+from urllib.parse import unquote, urlparse
 
-import prance  # type: ignore
 import yaml
-from prance.util.resolver import RESOLVE_INTERNAL  # type: ignore
+from jsonschema.protocols import Validator  # type: ignore
+from jsonschema.validators import Draft4Validator  # type: ignore
+from openapi_spec_validator.schemas import schema_v2, schema_v30
+from openapi_spec_validator.validation import (
+    openapi_v2_spec_validator,
+    openapi_v30_spec_validator,
+    openapi_v31_spec_validator,
+)
+from openapi_spec_validator.validation.validators import SpecValidator
+from packaging.version import parse as parse_version
+from prance.util.resolver import RESOLVE_FILES, RESOLVE_INTERNAL, RefResolver  # type: ignore
+from prance.util.url import ResolutionError  # type: ignore
 
+from env import OPENAPI_VALIDATION_CACHE_SIZE  # type: ignore
+from metrics import increment, time_stage
+from openapi.canonical import get_canonical_hash
+from openapi.file_index import RepositoryFileIndex
+from tracing import set_span_attribute
 
-def resolve_and_validate_openapi_spec(file_contents: str) -> dict | None:
-    parser = prance.ResolvingParser(
-        spec_string=file_contents,
-        resolve_types=RESOLVE_INTERNAL,
-        backend="openapi-spec-validator",
-        lazy=True,
-    )
+# libyaml's C loader is several times faster than PyYAML's pure Python loader, so use it if PyYAML was built with it
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+# Specs are resolved from memory so they don't need a real URL, but prance's RefResolver needs one to identify internal
+# references by. This is the same placeholder prance uses when given a spec string.
+OPENAPI_SPEC_URL = "file:///__placeholder_url__.yaml"
+
+# The validators used to fully validate each (major, minor) version of Swagger/OpenAPI. openapi-spec-validator only
+# constructs these once, on first use, so they're shared by every spec validated in the process.
+OPENAPI_SPEC_VALIDATORS: dict[tuple[int, int], SpecValidator] = {
+    (2, 0): openapi_v2_spec_validator,
+    (3, 0): openapi_v30_spec_validator,
+    (3, 1): openapi_v31_spec_validator,
+}
+
+# The JSON schemas of the Swagger/OpenAPI versions whose structure-only validators have their internal references
+# inlined. OpenAPI 3.1's schema is a draft 2020-12 schema, where a $ref can have siblings and $dynamicRefs are used, so
+# its structure-only validator is just the schema validator openapi-spec-validator uses.
+OPENAPI_DRAFT4_JSON_SCHEMAS = {
+    (2, 0): schema_v2,
+    (3, 0): schema_v30,
+}
+
+# The structure-only validators for each (major, minor) version of Swagger/OpenAPI. See get_structure_validator.
+OPENAPI_STRUCTURE_VALIDATORS: dict[tuple[int, int], Validator] = {}
+
+# Whether each resolved spec validated in this process was valid, by its canonical hash, Swagger/OpenAPI version and
+# whether only its structure was validated, least recently used first. Shared by every repository scanned, so copies of
+# the same spec, whether in one repository or many, are only validated once.
+VALIDATION_RESULTS: OrderedDict[tuple[str, tuple[int, int], bool], bool] = OrderedDict()
+
+# How many characters at the start of a file are checked for an openapi/swagger key before the rest of it is searched
+OPENAPI_SPEC_HEAD_LENGTH = 4096
+
+# An "openapi" or "swagger" key with a string value, as found in JSON (and YAML written in flow style, like JSON)
+JSON_OPENAPI_VERSION_KEY_PATTERN = re.compile(r'"(?:openapi|swagger)"\s*:\s*"')
+
+# An openapi or swagger key at the very start of a line, which in a block style YAML document means it's a top level key
+YAML_OPENAPI_VERSION_KEY_PATTERN = re.compile(r"^[\"']?(?:openapi|swagger)[\"']?[ \t]*:", re.MULTILINE)
+
+
+def get_openapi_version(openapi_spec: dict) -> tuple[int, int] | None:
+    openapi_version = openapi_spec.get("openapi", openapi_spec.get("swagger"))
+    if not isinstance(openapi_version, str):
+        return None
     try:
-        parser.parse()
+        parsed_openapi_version = parse_version(openapi_version)
     except:  # noqa: E722
-        # In the future, maybe we can provide some proper details here.
         return None
-    return parser.specification
+    openapi_version_key = (parsed_openapi_version.major, parsed_openapi_version.minor)
+    if openapi_version_key not in OPENAPI_SPEC_VALIDATORS:
+        return None
+    return openapi_version_key
+
+
+def dereference_json_schema(json_schema: dict) -> dict:
+    """Inlines all of the internal references in a draft 4 JSON schema, e.g. {"$ref": "#/definitions/Info"} is replaced
+    with the Info definition itself. Recursive definitions become cycles in the returned schema. External references,
+    e.g. to the JSON schema metaschema, are left as they are.
+
+    jsonschema looks up every $ref it meets each time it validates an instance, which is most of the cost of validating
+    an OpenAPI spec against its schema; the dereferenced schema validates the same instances without any lookups.
+
+    Args:
+        json_schema (dict): The JSON schema to dereference. It isn't modified.
+
+    Returns:
+        dict: A dereferenced copy of the JSON schema
+    """
+    dereferenced_definitions: dict[str, dict] = {}
+
+    def resolve_pointer(pointer: str):
+        node = json_schema
+        for part in pointer.lstrip("#/").split("/"):
+            node = node[part.replace("~1", "/").replace("~0", "~")]
+        return node
 
+    def dereference(node):
+        if type(node) == list:
+            return [dereference(item) for item in node]
 
-def parse_resolve_and_validate_openapi_spec(file_path: str, get_file_contents: Callable[[], str]) -> dict | None:
-    # First check it's a valid JSON/YAML file before passing it over to Prance
+        if type(node) != dict:
+            return node
+
+        reference = node.get("$ref")
+        # "$ref" can also be the name of a property, in which case its value is a schema, not a reference
+        if type(reference) != str or not reference.startswith("#"):
+            return {key: dereference(value) for key, value in node.items()}
+
+        # In draft 4, a $ref's siblings are ignored, so the node can be swapped for the definition it refers to. The
+        # definition's placeholder is added before dereferencing it so that recursive references resolve to it.
+        if reference not in dereferenced_definitions:
+            dereferenced_definitions[reference] = {}
+            dereferenced_definitions[reference].update(dereference(resolve_pointer(reference)))
+        return dereferenced_definitions[reference]
+
+    return dereference(json_schema)
+
+
+def get_structure_validator(openapi_version: tuple[int, int]) -> Validator:
+    if openapi_version not in OPENAPI_STRUCTURE_VALIDATORS:
+        if openapi_version in OPENAPI_DRAFT4_JSON_SCHEMAS:
+            OPENAPI_STRUCTURE_VALIDATORS[openapi_version] = Draft4Validator(
+                dereference_json_schema(dict(OPENAPI_DRAFT4_JSON_SCHEMAS[openapi_version]))
+            )
+        else:
+            OPENAPI_STRUCTURE_VALIDATORS[openapi_version] = OPENAPI_SPEC_VALIDATORS[openapi_version].schema_validator
+    return OPENAPI_STRUCTURE_VALIDATORS[openapi_version]
+
+
+def is_valid_openapi_spec(openapi_spec: dict, openapi_version: tuple[int, int], structure_only: bool = False) -> bool:
+    """Validates a resolved OpenAPI spec using the validators for its version, which are only constructed once per
+    process.
+
+    Args:
+        openapi_spec (dict): The resolved OpenAPI spec
+        openapi_version (tuple[int, int]): The (major, minor) version of the spec, from get_openapi_version
+        structure_only (bool, optional): If True, the spec is only validated against the JSON schema for its version.
+        This skips openapi-spec-validator's semantic checks (e.g. duplicate operation IDs, undeclared path parameters,
+        invalid default values), which are slower than the JSON schema validation. Defaults to False.
+
+    Returns:
+        bool: Whether the spec is valid
+    """
+    if OPENAPI_VALIDATION_CACHE_SIZE <= 0:
+        return validate_openapi_spec(openapi_spec, openapi_version, structure_only)
+
+    # Hashing a spec is much cheaper than validating it
+    validation_key = (get_canonical_hash(openapi_spec), openapi_version, structure_only)
+    if validation_key in VALIDATION_RESULTS:
+        VALIDATION_RESULTS.move_to_end(validation_key)
+        increment("validation_cache_hits")
+        set_span_attribute("validation_cache_hit", True)
+        return VALIDATION_RESULTS[validation_key]
+    increment("validation_cache_misses")
+    set_span_attribute("validation_cache_hit", False)
+
+    is_valid = validate_openapi_spec(openapi_spec, openapi_version, structure_only)
+    VALIDATION_RESULTS[validation_key] = is_valid
+    if len(VALIDATION_RESULTS) > OPENAPI_VALIDATION_CACHE_SIZE:
+        VALIDATION_RESULTS.popitem(last=False)
+    return is_valid
+
+
+def validate_openapi_spec(openapi_spec: dict, openapi_version: tuple[int, int], structure_only: bool) -> bool:
+    if structure_only:
+        validator = get_structure_validator(openapi_version)
+    else:
+        validator = OPENAPI_SPEC_VALIDATORS[openapi_version]
+    return next(validator.iter_errors(openapi_spec), None) is None
+
+
+def parse_json_or_yaml(file_path: str, file_contents: str) -> Any:
     if file_path.endswith(".json"):
-        try:
-            file_contents = json.loads(get_file_contents())
-        except:  # noqa: E722
-            return None
+        return json.loads(file_contents)
+    return yaml.load(file_contents, Loader=YAML_LOADER)
+
+
+class RepositoryReferenceCache(dict):
+    """A reference cache for prance's RefResolver which loads the files of a repository from a RepositoryFileIndex.
 
-    elif file_path.endswith((".yaml", ".yml")):
-        try:
-            file_contents = yaml.safe_load(get_file_contents())
-        except:  # noqa: E722
+    prance looks up every file it dereferences in its reference cache before reading it from disk or over HTTP, so
+    serving the repository's files from the cache means they're never read from anywhere else. References to anything
+    outside of the repository raise a ResolutionError instead of being read from the local filesystem.
+    """
+
+    def __init__(self, file_index: RepositoryFileIndex):
+        super().__init__()
+        self.file_index = file_index
+
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+
+        # prance's reference cache keys are the URL of the file without its fragment, and whether it's in strict mode
+        url, _ = key
+        file_path = RepositoryFileIndex.get_file_path(unquote(urlparse(url).path))
+        if file_path is None:
+            raise ResolutionError(f"Cannot resolve reference to {url}, it's outside of the repository")
+
+        # Parsed files are stored on the index rather than in this cache so they're shared by every spec in the
+        # repository. prance deep copies anything it takes from them, so they're never modified.
+        if file_path not in self.file_index.parsed_files:
+            file_contents = self.file_index.get_file_contents(file_path)
+            try:
+                if file_contents is None:
+                    raise ResolutionError(f"Cannot resolve reference to {file_path}, it doesn't exist")
+                self.file_index.parsed_files[file_path] = parse_json_or_yaml(file_path, file_contents)
+            except Exception as exception:
+                self.file_index.parsed_files[file_path] = exception
+
+        parsed_file = self.file_index.parsed_files[file_path]
+        if isinstance(parsed_file, Exception):
+            raise ResolutionError(f"Cannot resolve reference to {file_path}: {parsed_file}")
+        return parsed_file
+
+
+def resolve_openapi_spec(
+    openapi_spec: dict, file_path: str | None = None, file_index: RepositoryFileIndex | None = None
+) -> dict:
+    """Resolves the references in an OpenAPI spec in place
+
+    Args:
+        openapi_spec (dict): The parsed OpenAPI spec
+        file_path (str | None, optional): The path of the spec in its repository. Defaults to None.
+        file_index (RepositoryFileIndex | None, optional): The index of the files in the spec's repository. If it and
+        file_path are given, references to other files in the repository are resolved too. Otherwise, only internal
+        references are. Defaults to None.
+
+    Returns:
+        dict: The resolved spec
+    """
+    reference_cache: dict
+    if file_path is not None and file_index is not None:
+        reference_cache = RepositoryReferenceCache(file_index)
+        resolver = RefResolver(
+            {},
+            RepositoryFileIndex.get_file_url(file_path),
+            reference_cache=reference_cache,
+            resolve_types=RESOLVE_INTERNAL | RESOLVE_FILES,
+        )
+    else:
+        reference_cache = {}
+        resolver = RefResolver({}, OPENAPI_SPEC_URL, reference_cache=reference_cache, resolve_types=RESOLVE_INTERNAL)
+    # RefResolver deep copies the spec it's given, which is wasted effort as the spec was parsed just for this. Giving
+    # it an empty spec and swapping the real one in afterwards has it resolve the spec in place instead.
+    resolver.specs = reference_cache[resolver._url_key] = openapi_spec
+    resolver.resolve_references()
+    return resolver.specs
+
+
+def resolve_and_validate_openapi_spec(
+    openapi_spec: dict,
+    structure_only: bool = False,
+    file_path: str | None = None,
+    file_index: RepositoryFileIndex | None = None,
+) -> dict | None:
+    """Resolves the references of an already parsed OpenAPI spec in place, then validates it. This does the
+    same as prance's ResolvingParser with the openapi-spec-validator backend, without making prance parse the spec from
+    a string all over again.
+
+    Args:
+        openapi_spec (dict): The parsed OpenAPI spec. It may be modified.
+        structure_only (bool, optional): Whether to only validate the structure of the spec. See is_valid_openapi_spec.
+        Defaults to False.
+        file_path (str | None, optional): The path of the spec in its repository. See resolve_openapi_spec. Defaults
+        to None.
+        file_index (RepositoryFileIndex | None, optional): The index of the files in the spec's repository. See
+        resolve_openapi_spec. Defaults to None.
+
+    Returns:
+        dict | None: The resolved spec, or None if it isn't a valid OpenAPI spec
+    """
+    if not isinstance(openapi_spec, dict):
+        return None
+
+    openapi_version = get_openapi_version(openapi_spec)
+    if openapi_version is None:
+        return None
+
+    try:
+        resolved_openapi_spec = resolve_openapi_spec(openapi_spec, file_path, file_index)
+        if not is_valid_openapi_spec(resolved_openapi_spec, openapi_version, structure_only):
             return None
+    except:  # noqa: E722
+        # In the future, maybe we can provide some proper details here.
+        return None
+
+    return resolved_openapi_spec
+
 
+def is_openapi_spec_candidate(file_path: str, file_contents: str) -> bool:
+    """Cheaply checks whether a JSON/YAML file could be an OpenAPI spec, so the vast majority of JSON/YAML files which
+    aren't (package-lock.json, k8s manifests, CI configs, translations etc.) can be rejected without parsing them.
+
+    Args:
+        file_path (str): The path of the file, ending in .json, .yaml or .yml
+        file_contents (str): The contents of the file
+
+    Returns:
+        bool: False if the file can't be an OpenAPI spec, True if it might be
+    """
+    file_head = file_contents[:OPENAPI_SPEC_HEAD_LENGTH].lstrip("\ufeff \t\r\n")
+
+    if file_path.endswith(".json"):
+        # An OpenAPI spec has to be a JSON object
+        if not file_head.startswith("{"):
+            return False
+        patterns = [JSON_OPENAPI_VERSION_KEY_PATTERN]
     else:
+        # An OpenAPI spec has to be a mapping; anything starting as a sequence or a scalar can't be one
+        if file_head.startswith(("-", "[")) and not file_head.startswith("---"):
+            return False
+        patterns = [YAML_OPENAPI_VERSION_KEY_PATTERN, JSON_OPENAPI_VERSION_KEY_PATTERN]
+
+    # The openapi/swagger key is usually one of the first in a spec, so check the head of the file first
+    if any(pattern.search(file_head) for pattern in patterns):
+        return True
+
+    # Some specs put the key at the end, e.g. if they've been dumped with sorted keys, so fall back to searching the
+    # whole file. This is still much cheaper than parsing it.
+    return any(pattern.search(file_contents) for pattern in patterns)
+
+
+def parse_resolve_and_validate_openapi_spec(
+    file_path: str,
+    get_file_contents: Callable[[], str],
+    structure_only: bool = False,
+    file_index: RepositoryFileIndex | None = None,
+) -> dict | None:
+    if not file_path.endswith((".json", ".yaml", ".yml")):
+        return None
+
+    file_contents = get_file_contents()
+    if not is_openapi_spec_candidate(file_path, file_contents):
+        return None
+    increment("openapi_candidates")
+
+    # Then check it's a valid JSON/YAML file before resolving & validating it
+    try:
+        with time_stage("parse_openapi"):
+            openapi_spec = parse_json_or_yaml(file_path, file_contents)
+    except:  # noqa: E722
         return None
 
-    # If it was a valid JSON/YAML file, we can give it to Prance to load
-    return resolve_and_validate_openapi_spec(yaml.dump(file_contents))
+    with time_stage("validate_openapi"):
+        resolved_openapi_spec = resolve_and_validate_openapi_spec(openapi_spec, structure_only, file_path, file_index)
+    if resolved_openapi_spec is not None:
+        increment("openapi_specs_valid")
+    return resolved_openapi_spec
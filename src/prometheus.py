@@ -0,0 +1,179 @@
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator
+
+from env import METRICS_PORT, METRICS_TEXTFILE_INTERVAL_SECONDS, METRICS_TEXTFILE_PATH  # type: ignore
+from metrics import ScanMetrics, get_metrics
+from upload_state import write_file_atomically
+from utils import logger
+
+# The prefix of the name of every metric exposed
+METRIC_NAME_PREFIX = "github_api_discovery"
+
+# The version of the Prometheus text format the metrics are exposed in, which OpenMetrics scrapers accept too
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render_histograms(lines: list[str], metric_name: str, label_name: str, histograms: dict[str, dict]):
+    if len(histograms) == 0:
+        return
+    lines.append(f"# TYPE {metric_name} histogram")
+    for label_value, histogram in histograms.items():
+        label = f'{label_name}="{escape_label_value(label_value)}"'
+        # Prometheus' buckets are cumulative, whereas the report's count each value in only one bucket
+        cumulative_count = 0
+        for bound, count in histogram["buckets"].items():
+            cumulative_count += count
+            lines.append(f'{metric_name}_bucket{{{label},le="{bound}"}} {cumulative_count}')
+        lines.append(f"{metric_name}_sum{{{label}}} {format_value(histogram['total'])}")
+        lines.append(f"{metric_name}_count{{{label}}} {histogram['count']}")
+
+
+def render_metrics(scan_metrics: ScanMetrics) -> str:
+    """Renders a scan's metrics in the Prometheus text format. Metrics aren't labelled by repository, so the number of
+    series stays bounded however many repositories are scanned.
+
+    Args:
+        scan_metrics (ScanMetrics): The metrics to render
+
+    Returns:
+        str: The metrics in the Prometheus text format
+    """
+    scan_report = scan_metrics.get_report()
+    lines: list[str] = []
+
+    lines.append(f"# TYPE {METRIC_NAME_PREFIX}_scan_seconds gauge")
+    lines.append(f"{METRIC_NAME_PREFIX}_scan_seconds {format_value(scan_report['scan_seconds'])}")
+
+    for counter, value in scan_report["counters"].items():
+        lines.append(f"# TYPE {METRIC_NAME_PREFIX}_{counter}_total counter")
+        lines.append(f"{METRIC_NAME_PREFIX}_{counter}_total {value}")
+
+    # Rates and ratios are derived here, when the metrics are scraped, rather than maintained as they're recorded
+    counters = scan_report["counters"]
+    derived_gauges = dict(scan_report["gauges"])
+    if scan_report["scan_seconds"] > 0:
+        derived_gauges["files_per_second"] = counters.get("files_fetched", 0) / scan_report["scan_seconds"]
+    validation_cache_hits = counters.get("validation_cache_hits", 0)
+    validation_cache_lookups = validation_cache_hits + counters.get("validation_cache_misses", 0)
+    if validation_cache_lookups > 0:
+        derived_gauges["validation_cache_hit_ratio"] = validation_cache_hits / validation_cache_lookups
+
+    for gauge, value in sorted(derived_gauges.items()):
+        lines.append(f"# TYPE {METRIC_NAME_PREFIX}_{gauge} gauge")
+        lines.append(f"{METRIC_NAME_PREFIX}_{gauge} {format_value(value)}")
+
+    # GitHub's requests are labelled by endpoint and outcome, but not repository, of which there are only a few of each
+    github_requests_by_endpoint = scan_report["github_requests"]["by_endpoint"]
+    if len(github_requests_by_endpoint) > 0:
+        lines.append(f"# TYPE {METRIC_NAME_PREFIX}_github_api_requests_total counter")
+        for endpoint, endpoint_requests in github_requests_by_endpoint.items():
+            for outcome, value in endpoint_requests["by_outcome"].items():
+                labels = f'endpoint="{escape_label_value(endpoint)}",outcome="{escape_label_value(outcome)}"'
+                lines.append(f"{METRIC_NAME_PREFIX}_github_api_requests_total{{{labels}}} {value}")
+    lines.append(f"# TYPE {METRIC_NAME_PREFIX}_github_api_predicted_requests gauge")
+    lines.append(
+        f"{METRIC_NAME_PREFIX}_github_api_predicted_requests "
+        f"{scan_report['github_requests']['next_scan_budget']['predicted_requests']}"
+    )
+
+    render_histograms(lines, f"{METRIC_NAME_PREFIX}_stage_duration_seconds", "stage", scan_report["stages"])
+    render_histograms(lines, f"{METRIC_NAME_PREFIX}_analyser_duration_seconds", "analyser", scan_report["analysers"])
+
+    return "\n".join(lines) + "\n"
+
+
+class MetricsRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_metrics(get_metrics()).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", PROMETHEUS_CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes would otherwise be logged to stderr every few seconds
+        pass
+
+
+class MetricsTextfileWriter:
+    """Periodically writes the metrics of the scan in progress to a file, e.g. for node_exporter's textfile collector"""
+
+    def __init__(self, path: str, interval_seconds: float):
+        self.path = path
+        self.interval_seconds = interval_seconds
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def write(self):
+        try:
+            write_file_atomically(self.path, render_metrics(get_metrics()))
+        except OSError as exception:
+            logger.warning(f"Failed to write metrics to {self.path}, exception raised: {exception}")
+
+    def run(self):
+        while not self.stopped.wait(self.interval_seconds):
+            self.write()
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        # The metrics are written one last time, so the file has the final metrics of the scan
+        self.stopped.set()
+        self.thread.join()
+        self.write()
+
+
+@contextmanager
+def metrics_exporters(
+    port: int = METRICS_PORT,
+    textfile_path: str | None = METRICS_TEXTFILE_PATH,
+    textfile_interval_seconds: float = METRICS_TEXTFILE_INTERVAL_SECONDS,
+) -> Iterator[None]:
+    """Exposes the metrics of the scans run in its body on an HTTP endpoint and/or in a file, if either is configured
+
+    Args:
+        port (int, optional): The port to serve the metrics on at /metrics. Defaults to METRICS_PORT, or if 0 they
+        aren't served.
+        textfile_path (str | None, optional): The file to write the metrics to. Defaults to METRICS_TEXTFILE_PATH, or
+        if None or empty they aren't written.
+        textfile_interval_seconds (float, optional): How often the file is written. Defaults to
+        METRICS_TEXTFILE_INTERVAL_SECONDS.
+    """
+    metrics_server = None
+    if port > 0:
+        try:
+            metrics_server = ThreadingHTTPServer(("", port), MetricsRequestHandler)
+        except OSError as exception:
+            logger.warning(f"Failed to serve metrics on port {port}, exception raised: {exception}")
+        else:
+            threading.Thread(target=metrics_server.serve_forever, daemon=True).start()
+            logger.info(f"Serving metrics on http://localhost:{metrics_server.server_address[1]}/metrics")
+
+    textfile_writer = None
+    if textfile_path:
+        textfile_writer = MetricsTextfileWriter(textfile_path, textfile_interval_seconds)
+        textfile_writer.start()
+
+    try:
+        yield
+    finally:
+        if textfile_writer is not None:
+            textfile_writer.stop()
+        if metrics_server is not None:
+            metrics_server.shutdown()
+            metrics_server.server_close()
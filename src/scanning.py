@@ -1,8 +1,11 @@
 import base64
-import json
+import re
+import time
+from collections import Counter
+from dataclasses import dataclass, field
 from functools import cache
+from typing import Callable, Iterator
 
-import requests
 import yaml
 from dacite import from_dict
 from github import Github as GithubClient
@@ -11,165 +14,413 @@ from github.GithubException import GithubException
 from github.Organization import Organization as GithubOrganisation
 from github.Repository import Repository as GithubRepository
 
-from config import Config, OrgConfig, UserConfig
-from env import FIRETAIL_API_URL, FIRETAIL_APP_TOKEN, GITHUB_TOKEN  # type: ignore
+from analyser_pool import FileAnalysisResult, PooledFileAnalyser, analyse_file, get_analyser_pool
+from config import Config, OrgConfig, OutputConfig, UserConfig
+from env import (  # type: ignore
+    ANALYSER_WORKERS,
+    FIRETAIL_API_URL,
+    FILE_ANALYSIS_TIMEOUT_SECONDS,
+    FIRETAIL_APP_TOKEN,
+    GITHUB_TOKEN,
+    MAX_FILE_SIZE_BYTES,
+    MAX_PENDING_DIRECTORIES,
+    OPENAPI_STRUCTURE_ONLY_VALIDATION,
+    OUTPUT_PATH,
+    OUTPUT_SINK,
+    SKIP_GENERATED_AND_MINIFIED_FILES,
+    UPLOAD_STATE_TTL_SECONDS,
+)
+from github_requests import install_github_request_recorder
+from ignore_paths import compile_ignore_paths
+from metrics import (
+    increment,
+    observe_analyser,
+    observe_file,
+    observe_stage,
+    repository_scope,
+    reset_metrics,
+    set_gauge,
+    time_stage,
+)
+from openapi.file_index import RepositoryFileIndex
 from openapi.validation import parse_resolve_and_validate_openapi_spec
-from static_analysis import ANALYSER_TYPE, get_language_analysers
-from utils import logger, respect_rate_limit
+from static_analysis import ANALYSER_TYPE, get_language_analysers, get_language_file_extensions
+from static_analysis.content_heuristics import classify_file_contents, is_content_heuristics_file
+from sinks import FiretailSink, OutputSink, get_output_sink
+from tracing import add_span, set_span_attribute, span
+from upload_state import UploadStateStore
+from utils import TimeLimit, logger, pause_time_limits, respect_rate_limit
 
 
-def scan_file(
-    file: GithubContentFile, github_client: GithubClient, language_analysers: list[ANALYSER_TYPE]
-) -> tuple[set[str], dict[str, dict]]:
-    file_path = respect_rate_limit(lambda: file.path, github_client)
+def decode_file_contents(encoded_content: str | None) -> str:
+    if encoded_content is None:
+        return ""
+
+    try:
+        return base64.b64decode(encoded_content).decode("utf-8")
+    except:  # noqa: E722
+        return ""
 
-    @cache
-    def get_file_contents():
-        encoded_content = respect_rate_limit(lambda: file.content, github_client)
-        if encoded_content is None:
-            return ""
 
+def get_repository_file_index(repository: GithubRepository, github_client: GithubClient) -> RepositoryFileIndex:
+    # Files referenced by a spec before the scan has reached them are fetched individually. They're fetched while the
+    # spec is being resolved, so fetching them shouldn't count towards the time limit for validating it.
+    @pause_time_limits()
+    def fetch_file_contents(file_path: str) -> str | None:
         try:
-            return base64.b64decode(encoded_content).decode("utf-8")
-        except:  # noqa: E722
-            return ""
+            file = respect_rate_limit(lambda: repository.get_contents(file_path), github_client)
+        except GithubException:
+            return None
+        if isinstance(file, list) or (file.size is not None and file.size > MAX_FILE_SIZE_BYTES):
+            return None
+        return decode_file_contents(respect_rate_limit(lambda: file.content, github_client))
+
+    return RepositoryFileIndex(fetch_file_contents)
+
+
+@dataclass
+class RepositoryScanResults:
+    """The results of scanning a repository, which the results of scanning each of its files are added to as the scan
+    goes, rather than being merged together at the end of each directory
+    """
+
+    frameworks_identified: set[str] = field(default_factory=set)
+    # The specs discovered, unless they're passed to an openapi_spec_handler as they're discovered instead
+    openapi_specs_discovered: dict[str, dict] = field(default_factory=dict)
+    openapi_spec_sources: set[str] = field(default_factory=set)
+    files_scanned: int = 0
+    paths_ignored: int = 0
+    # The paths of files which were skipped, e.g. for being too large, and why
+    files_skipped: dict[str, str] = field(default_factory=dict)
+    # How many files weren't analysed because of how their contents were classified, e.g. {"minified": 3}
+    files_skipped_by_content: Counter[str] = field(default_factory=Counter)
+    # Called with the source of each spec and the spec as it's discovered, e.g. to upload it, so the specs discovered
+    # don't all have to be held in memory until the scan completes
+    openapi_spec_handler: Callable[[str, dict], None] | None = field(default=None, repr=False, compare=False)
+
+    def add_frameworks(self, frameworks: set[str]):
+        self.frameworks_identified.update(frameworks)
+
+    def add_openapi_specs(self, openapi_specs: dict[str, dict]):
+        self.openapi_spec_sources.update(openapi_specs)
+        if self.openapi_spec_handler is None:
+            self.openapi_specs_discovered.update(openapi_specs)
+            return
+        for source, openapi_spec in openapi_specs.items():
+            self.openapi_spec_handler(source, openapi_spec)
+
+    def add_skipped_file(self, file_path: str, reason: str):
+        logger.warning(f"Skipping {file_path}: {reason}")
+        self.files_skipped[file_path] = reason
+        increment("files_skipped")
+
+    def add_file_analysis_result(self, file_analysis_result: FileAnalysisResult):
+        # The analysers ran one after the other, so their spans are laid end to end
+        analyser_started_at = file_analysis_result.analysis_started_at
+        for analyser_name, seconds in file_analysis_result.analyser_seconds.items():
+            observe_analyser(analyser_name, seconds)
+            observe_file(file_analysis_result.file_path, analyser_name, seconds)
+            if analyser_started_at is not None:
+                add_span(
+                    analyser_name,
+                    "analyser",
+                    analyser_started_at,
+                    seconds,
+                    file_analysis_result.analysis_pid,
+                    path=file_analysis_result.file_path,
+                    skip_reason=file_analysis_result.skip_reason,
+                )
+                analyser_started_at += seconds
 
-    openapi_specs_discovered: dict[str, dict] = {}
-    frameworks_identified: set[str] = set()
+        if file_analysis_result.skip_reason is not None:
+            self.add_skipped_file(file_analysis_result.file_path, file_analysis_result.skip_reason)
+            return
+        self.add_frameworks(file_analysis_result.frameworks_identified)
+        self.add_openapi_specs(file_analysis_result.openapi_specs)
+        self.files_scanned += 1
+        increment("files_analysed")
 
-    valid_openapi_spec = parse_resolve_and_validate_openapi_spec(file.path, get_file_contents)
 
-    if valid_openapi_spec is not None:
-        openapi_specs_discovered[file_path] = valid_openapi_spec
+def scan_file(
+    file: GithubContentFile,
+    github_client: GithubClient,
+    language_analysers: list[ANALYSER_TYPE],
+    scan_results: RepositoryScanResults,
+    file_index: RepositoryFileIndex | None = None,
+    pooled_file_analyser: PooledFileAnalyser | None = None,
+    language_file_extensions: tuple[str, ...] = (),
+) -> None:
+    file_path = respect_rate_limit(lambda: file.path, github_client)
 
-    for language_analyser in language_analysers:
-        frameworks, openapi_spec_from_analysis = language_analyser(file_path, get_file_contents)
-        frameworks_identified.update(frameworks)
-        openapi_specs_discovered = {**openapi_specs_discovered, **openapi_spec_from_analysis}
+    # The size is included in the directory listing, so this doesn't need the file to be fetched
+    file_size = respect_rate_limit(lambda: file.size, github_client)
+    if file_size is not None and file_size > MAX_FILE_SIZE_BYTES:
+        scan_results.add_skipped_file(file_path, f"{file_size} bytes is larger than {MAX_FILE_SIZE_BYTES} bytes")
+        return
 
-    return frameworks_identified, openapi_specs_discovered
+    @cache
+    def fetch_file_contents() -> str:
+        # The contents are fetched lazily, during the first analysis that needs them, so fetching them shouldn't count
+        # towards that analysis' time limit
+        with pause_time_limits(), time_stage("fetch_file"):
+            file_contents = decode_file_contents(respect_rate_limit(lambda: file.content, github_client))
+        file_bytes = len(file_contents.encode("utf-8"))
+        increment("files_fetched")
+        increment("bytes_fetched", file_bytes)
+        set_span_attribute("bytes_fetched", file_bytes)
+        return file_contents
+
+    get_file_contents: Callable[[], str] = fetch_file_contents
+    if file_index is not None:
+        get_file_contents = file_index.add_file(file_path, fetch_file_contents)
+
+    with TimeLimit(FILE_ANALYSIS_TIMEOUT_SECONDS) as time_limit:
+        valid_openapi_spec = parse_resolve_and_validate_openapi_spec(
+            file.path, get_file_contents, OPENAPI_STRUCTURE_ONLY_VALIDATION, file_index
+        )
+    if time_limit.exceeded:
+        scan_results.add_skipped_file(file_path, f"OpenAPI validation took over {FILE_ANALYSIS_TIMEOUT_SECONDS}s")
+        return
 
+    if valid_openapi_spec is not None:
+        scan_results.add_openapi_specs({file_path: valid_openapi_spec})
+
+    # Generated and minified files are classified from their first few KB, which is much cheaper than parsing them. Only
+    # files one of the repository's analysers will analyse are classified, as the rest are never fetched.
+    if (
+        SKIP_GENERATED_AND_MINIFIED_FILES
+        and file_path.endswith(language_file_extensions)
+        and is_content_heuristics_file(file_path)
+    ):
+        file_contents = get_file_contents()
+        with time_stage("classify_contents"):
+            content_classification = classify_file_contents(file_contents)
+        if content_classification is not None:
+            logger.debug(f"Not analysing {file_path}, its contents look {content_classification}")
+            scan_results.files_skipped_by_content[content_classification] += 1
+            increment(f"files_skipped_as_{content_classification}")
+            return
+
+    # The results of analysing the file in a worker process are added to the scan results once they're ready
+    if pooled_file_analyser is not None:
+        pooled_file_analyser.add_file(file_path, get_file_contents)
+        return
+
+    scan_results.add_file_analysis_result(
+        analyse_file(language_analysers, file_path, get_file_contents, FILE_ANALYSIS_TIMEOUT_SECONDS)
+    )
 
-def scan_repository_contents_recursive(
+
+def walk_repository_files(
     repository: GithubRepository,
     github_client: GithubClient,
-    language_analysers,
-    path: str = "",
-) -> tuple[set[str], dict[str, dict]]:
-    frameworks_identified: set[str] = set()
-    openapi_specs_discovered: dict[str, dict] = {}
-
-    repository_contents = respect_rate_limit(lambda: repository.get_contents(path), github_client)
-    if not isinstance(repository_contents, list):
-        repository_contents = [repository_contents]
-    logger.info(f"{repository.full_name}: Scanning {len(repository_contents)} file(s) in /{path}")
-
-    for file in repository_contents:
-        if file.type == "dir":
-            new_frameworks_identified, new_openapi_specs_discovered = scan_repository_contents_recursive(
-                repository, github_client, language_analysers, path=file.path
+    should_descend: Callable[[str], bool] | None = None,
+) -> Iterator[GithubContentFile]:
+    """Walks the files of a repository depth first, listing one directory at a time
+
+    The directories still to be walked are kept on an explicit stack of their paths rather than by recursing, so deep
+    trees can't hit the recursion limit. Only one directory listing is held at a time, and the stack is capped at about
+    MAX_PENDING_DIRECTORIES so a pathologically wide tree can't exhaust memory. When a directory has more subdirectories
+    than fit, the rest are deferred rather than skipped: the directory is listed again once the subdirectories which did
+    fit have been walked, and its remaining subdirectories are added to the stack then.
+
+    Args:
+        repository (GithubRepository): The repository to walk
+        github_client (GithubClient): The client to respect the rate limit of
+        should_descend (Callable[[str], bool] | None, optional): Called with the path of each directory before it's
+        added to the stack. If it returns False, the directory is never listed, nor are any of its subdirectories.
+        Defaults to None, in which case every directory is walked.
+
+    Yields:
+        Iterator[GithubContentFile]: The files of the repository
+    """
+    # The path of each directory to walk, and the index of the first entry of its listing to walk. Directories with an
+    # index above 0 are being listed again for their deferred subdirectories, and their files have already been walked.
+    directories_to_walk: list[tuple[str, int]] = [("", 0)]
+
+    while len(directories_to_walk) > 0:
+        path, first_entry_index = directories_to_walk.pop()
+
+        with time_stage("list_directory"), span("list_directory", path=f"/{path}") as list_directory_span:
+            repository_contents = respect_rate_limit(lambda: repository.get_contents(path), github_client)
+            if not isinstance(repository_contents, list):
+                repository_contents = [repository_contents]
+            list_directory_span.set_attribute("entries", len(repository_contents))
+        increment("directories_listed")
+        if first_entry_index == 0:
+            logger.info(f"{repository.full_name}: Scanning {len(repository_contents)} file(s) in /{path}")
+
+        # One slot is kept for the directory itself, in case some of its subdirectories have to be deferred. At least
+        # one subdirectory is always added, so the walk always progresses, even if it takes the stack over the cap.
+        subdirectories_available = max(MAX_PENDING_DIRECTORIES - len(directories_to_walk), 2) - 1
+        subdirectories: list[str] = []
+        deferred_entry_index = None
+        for entry_index, file in enumerate(repository_contents):
+            if file.type != "dir":
+                if first_entry_index == 0:
+                    yield file
+            elif entry_index < first_entry_index or deferred_entry_index is not None:
+                continue
+            elif len(subdirectories) >= subdirectories_available:
+                deferred_entry_index = entry_index
+            elif should_descend is None or should_descend(file.path):
+                subdirectories.append(file.path)
+
+        # Release the listing before the next one is fetched
+        del repository_contents
+
+        if deferred_entry_index is not None:
+            logger.info(
+                f"{repository.full_name}: Too many directories pending, deferring the rest of the subdirectories of"
+                f" /{path} until {len(subdirectories)} of them have been walked"
             )
-        else:
+            increment("directories_deferred")
+            directories_to_walk.append((path, deferred_entry_index))
+
+        # Reversed so the subdirectories are popped, and walked, in the order they were listed
+        directories_to_walk.extend((subdirectory, 0) for subdirectory in reversed(subdirectories))
+        set_gauge("directories_pending", len(directories_to_walk))
+
+
+def scan_repository_tree(
+    repository: GithubRepository,
+    github_client: GithubClient,
+    language_analysers: list[ANALYSER_TYPE],
+    scan_results: RepositoryScanResults,
+    file_index: RepositoryFileIndex | None = None,
+    ignore_paths: re.Pattern | None = None,
+    pooled_file_analyser: PooledFileAnalyser | None = None,
+    language_file_extensions: tuple[str, ...] = (),
+) -> None:
+    def is_ignored(path: str) -> bool:
+        if ignore_paths is None or ignore_paths.search(path) is None:
+            return False
+        scan_results.paths_ignored += 1
+        return True
+
+    # Ignored directories are pruned before they're listed, so nothing in them is ever walked or fetched
+    for file in walk_repository_files(repository, github_client, should_descend=lambda path: not is_ignored(path)):
+        if is_ignored(file.path):
+            continue
+
+        # Includes the time spent analysing the file, unless it's analysed in a worker process
+        start_time = time.perf_counter()
+        with span("scan_file", path=file.path) as scan_file_span:
+            if scan_file_span.sampled:
+                scan_file_span.set_attribute("size", respect_rate_limit(lambda: file.size, github_client))
+                scan_file_span.set_attribute("sha", respect_rate_limit(lambda: file.sha, github_client))
             try:
-                new_frameworks_identified, new_openapi_specs_discovered = scan_file(
-                    file, github_client, language_analysers
+                scan_file(
+                    file,
+                    github_client,
+                    language_analysers,
+                    scan_results,
+                    file_index,
+                    pooled_file_analyser,
+                    language_file_extensions,
                 )
             except GithubException as exception:
                 logger.warning(
                     f"Failed to scan file {file.path} from {repository.full_name}, exception raised: {exception}"
                 )
-                continue
-
-        frameworks_identified.update(new_frameworks_identified)
-        openapi_specs_discovered = {**openapi_specs_discovered, **new_openapi_specs_discovered}
-
-    return frameworks_identified, openapi_specs_discovered
+        scan_file_seconds = time.perf_counter() - start_time
+        observe_stage("scan_file", scan_file_seconds)
+        observe_file(file.path, "scan_file", scan_file_seconds)
 
 
 def scan_repository_contents(
-    github_client: GithubClient, repository: GithubRepository
-) -> tuple[set[str], dict[str, dict]]:
+    github_client: GithubClient,
+    repository: GithubRepository,
+    ignore_paths: tuple[str, ...] = (),
+    openapi_spec_handler: Callable[[str, dict], None] | None = None,
+) -> RepositoryScanResults:
     repository_languages = list(respect_rate_limit(lambda: repository.get_languages(), github_client).keys())
     logger.info(f"{repository.full_name}: Language(s) detected: {', '.join(repository_languages)}")
 
     language_analysers = get_language_analysers(repository_languages)
     logger.info(f"{repository.full_name}: Got {len(language_analysers)} language analyser(s)")
 
-    return scan_repository_contents_recursive(repository, github_client, language_analysers)
+    file_index = get_repository_file_index(repository, github_client)
+
+    scan_results = RepositoryScanResults(openapi_spec_handler=openapi_spec_handler)
+
+    pooled_file_analyser = None
+    if ANALYSER_WORKERS > 0 and len(language_analysers) > 0:
+        pooled_file_analyser = PooledFileAnalyser(
+            get_analyser_pool(), repository_languages, scan_results.add_file_analysis_result
+        )
+
+    scan_repository_tree(
+        repository,
+        github_client,
+        language_analysers,
+        scan_results,
+        file_index,
+        compile_ignore_paths(ignore_paths),
+        pooled_file_analyser,
+        get_language_file_extensions(repository_languages),
+    )
+
+    if pooled_file_analyser is not None:
+        pooled_file_analyser.finish()
+
+    return scan_results
 
 
 def scan_repository(
-    github_client: GithubClient, repo: GithubRepository, firetail_app_token: str, firetail_api_url: str
+    github_client: GithubClient,
+    repo: GithubRepository,
+    firetail_app_token: str,
+    firetail_api_url: str,
+    config: Config | None = None,
+    output_sink: OutputSink | None = None,
 ) -> int:
     logger.info(f"{repo.full_name}: Scanning {repo.html_url}")
 
+    if output_sink is None:
+        output_sink = FiretailSink(
+            firetail_api_url, firetail_app_token, UploadStateStore(None, UPLOAD_STATE_TTL_SECONDS)
+        )
+
+    # Specs are sent to the output sink as they're discovered. Those already sent are finished even if the scan fails.
+    repository_output = output_sink.open_repository(repo.full_name, repo.id)
     try:
-        frameworks_identified, openapi_specs_discovered = scan_repository_contents(github_client, repo)
+        ignore_paths = (config if config is not None else Config()).get_ignore_paths(repo)
+        with (
+            repository_scope(repo.full_name),
+            time_stage("scan_repository"),
+            span("scan_repository", repository=repo.full_name) as scan_repository_span,
+        ):
+            scan_results = scan_repository_contents(
+                github_client, repo, ignore_paths, repository_output.add_openapi_spec
+            )
+            scan_repository_span.set_attribute("files_scanned", scan_results.files_scanned)
+            scan_repository_span.set_attribute("openapi_specs", len(scan_results.openapi_spec_sources))
 
     except GithubException as exception:
         logger.warning(f"{repo.full_name}: Failed to scan, exception raised: {exception}")
         return 0
 
-    logger.info(f"{repo.full_name}: {len(frameworks_identified)} frameworks identified.")
-
-    if len(openapi_specs_discovered) == 0:
-        logger.info(f"{repo.full_name}: Scan complete. No APIs discovered.")
-        return 0
+    finally:
+        with repository_scope(repo.full_name), time_stage("finish_repository_output"):
+            repository_output.finish()
 
     logger.info(
-        f"{repo.full_name}: Scan complete. {len(openapi_specs_discovered)} OpenAPI API(s) discovered or"
-        " generated from static analysis."
+        f"{repo.full_name}: {scan_results.files_scanned} file(s) scanned, {len(scan_results.files_skipped)} file(s)"
+        f" skipped, {scan_results.files_skipped_by_content.total()} file(s) not analysed as they look generated or"
+        f" minified {dict(scan_results.files_skipped_by_content)}, {scan_results.paths_ignored} path(s) ignored,"
+        f" {len(scan_results.frameworks_identified)} frameworks identified."
     )
-    create_api_response = requests.post(
-        f"{firetail_api_url}/discovery/api-repository",
-        headers={
-            "x-ft-app-key": firetail_app_token,
-            "Content-Type": "application/json",
-        },
-        json={
-            "full_name": repo.full_name,
-            "id": f"github:{repo.id}",
-        },
-    )
-    if create_api_response.status_code != 200:
-        logger.critical(f"{repo.full_name}: Failed to create API in SaaS, response: {create_api_response.text}")
+
+    if len(scan_results.openapi_spec_sources) == 0:
+        logger.info(f"{repo.full_name}: Scan complete. No APIs discovered.")
         return 0
 
     logger.info(
-        f"{repo.full_name}: Successfully created/updated API in Firetail SaaS, response:" f" {create_api_response.text}"
+        f"{repo.full_name}: Scan complete. {len(scan_results.openapi_spec_sources)} OpenAPI API(s) discovered or"
+        " generated from static analysis."
     )
-
-    api_uuid = create_api_response.json()["api"]["UUID"]
-
-    for source, openapi_spec in openapi_specs_discovered.items():
-        upload_api_spec_response = requests.post(
-            f"{firetail_api_url}/discovery/api-repository/{api_uuid}/appspec",
-            headers={
-                "x-ft-app-key": firetail_app_token,
-                "Content-Type": "application/json",
-            },
-            data=json.dumps(
-                {
-                    "source": source,
-                    "appspec": openapi_spec,
-                },
-                default=str,
-            ),
-        )
-
-        if upload_api_spec_response.status_code not in [201, 304]:
-            logger.critical(
-                f"{repo.full_name}: Failed to upload OpenAPI spec {source} to SaaS, response:"
-                f" {upload_api_spec_response.text}"
-            )
-            continue
-
-        logger.info(
-            f"{repo.full_name}: Successfully created/updated {source} API spec in Firetail SaaS, response:"
-            f" {upload_api_spec_response.text}"
-        )
-
-    return len(openapi_specs_discovered)
+    return len(scan_results.openapi_spec_sources)
 
 
 def scan_repositories(
@@ -177,6 +428,8 @@ def scan_repositories(
     firetail_app_token: str,
     firetail_api_url: str,
     repositories_to_scan: set[GithubRepository],
+    config: Config | None = None,
+    output_sink: OutputSink | None = None,
 ) -> int:
     logger.info(
         f"Attempting to scan {len(repositories_to_scan)} "
@@ -184,9 +437,18 @@ def scan_repositories(
         + ", ".join([repo.full_name for repo in repositories_to_scan])
     )
 
+    # The same sink, and so the same FireTail client and its connections, is used for every repository
+    if output_sink is None:
+        output_sink = FiretailSink(firetail_api_url, firetail_app_token)
+
     specs_discovered = 0
-    for repo in repositories_to_scan:
-        specs_discovered += scan_repository(github_client, repo, firetail_app_token, firetail_api_url)
+    try:
+        for repo in repositories_to_scan:
+            specs_discovered += scan_repository(
+                github_client, repo, firetail_app_token, firetail_api_url, config, output_sink
+            )
+    finally:
+        output_sink.close()
 
     return specs_discovered
 
@@ -298,15 +560,13 @@ def get_repos_to_scan_without_config(github_client: GithubClient) -> set[GithubR
 
 
 def scan() -> tuple[set[str], int]:
-    required_env_vars = {
-        "GITHUB_TOKEN": GITHUB_TOKEN,
-        "FIRETAIL_APP_TOKEN": FIRETAIL_APP_TOKEN,
-        "FIRETAIL_API_URL": FIRETAIL_API_URL,
-    }
-    for env_var_name, env_var_value in required_env_vars.items():
-        if env_var_value in {None, ""}:
-            logger.critical(f"{env_var_name} not set in environment. Cannot scan.")
-            return set(), 0
+    # A warm Lambda runs many scans, each of which gets its own report
+    reset_metrics()
+    install_github_request_recorder()
+
+    if GITHUB_TOKEN in {None, ""}:
+        logger.critical("GITHUB_TOKEN not set in environment. Cannot scan.")
+        return set(), 0
 
     config_dict = None
     try:
@@ -318,18 +578,44 @@ def scan() -> tuple[set[str], int]:
     except yaml.YAMLError as yaml_exception:
         logger.warning(f"Failed to load config.yml, exception: {yaml_exception}")
 
+    config = None
+    if config_dict is not None:
+        config = from_dict(Config, config_dict)
+
+    # The FireTail env vars are only required if specs are being uploaded to FireTail. The environment takes precedence
+    # over the config file, so a sink can be chosen for a one-off scan without editing it
+    output_config = config.output if config is not None else OutputConfig()
+    output_sink = get_output_sink(
+        OUTPUT_SINK if OUTPUT_SINK else output_config.sink,
+        FIRETAIL_API_URL,
+        FIRETAIL_APP_TOKEN,
+        OUTPUT_PATH if OUTPUT_PATH else output_config.path,
+    )
+    if output_sink is None:
+        logger.critical("Cannot scan without an output sink.")
+        return set(), 0
+
     github_client = GithubClient(GITHUB_TOKEN)
 
-    if config_dict is not None:
-        repositories_to_scan = get_repos_to_scan_with_config(github_client, from_dict(Config, config_dict))
-    else:
-        repositories_to_scan = get_repos_to_scan_without_config(github_client)
+    with time_stage("enumerate_repositories"):
+        if config is not None:
+            repositories_to_scan = get_repos_to_scan_with_config(github_client, config)
+        else:
+            repositories_to_scan = get_repos_to_scan_without_config(github_client)
 
     if len(repositories_to_scan) == 0:
         logger.info("Could not find any repositories to scan. Check your config file and token's permissions.")
+        output_sink.close()
         return set(), 0
 
     return (
         {respect_rate_limit(lambda: repository.full_name, github_client) for repository in repositories_to_scan},
-        scan_repositories(github_client, FIRETAIL_APP_TOKEN, FIRETAIL_API_URL, repositories_to_scan),  # type: ignore
+        scan_repositories(
+            github_client,
+            FIRETAIL_APP_TOKEN,  # type: ignore
+            FIRETAIL_API_URL,  # type: ignore
+            repositories_to_scan,
+            config,
+            output_sink,
+        ),
     )
@@ -0,0 +1,454 @@
+import json
+import os
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import TextIO
+
+from env import (  # type: ignore
+    DELTA_UPLOAD_MIN_BYTES,
+    DELTA_UPLOADS,
+    MAX_SPEC_UPLOADS_IN_FLIGHT,
+    UPLOAD_STATE_PATH,
+    UPLOAD_STATE_TTL_SECONDS,
+)
+from firetail import FiretailClient, SpecUploadResult
+from metrics import increment, set_gauge, time_stage
+from openapi.canonical import get_canonical_hash
+from tracing import Span, get_current_span, span
+from upload_state import UploadStateStore
+from utils import logger
+
+# How much of the output of the NDJSON sink is buffered before it's written
+NDJSON_BUFFER_SIZE_BYTES = 1024 * 1024
+
+
+class RepositoryOutput(ABC):
+    """Where the OpenAPI specs discovered in a single repository are sent, as they're discovered"""
+
+    @abstractmethod
+    def add_openapi_spec(self, source: str, openapi_spec: dict):
+        pass
+
+    def finish(self):
+        """Called once the repository has been scanned, or its scan has failed, to finish sending its specs"""
+        pass
+
+
+class OutputSink(ABC):
+    """Where the OpenAPI specs discovered by a scan are sent"""
+
+    @abstractmethod
+    def open_repository(self, repository_full_name: str, repository_id: int) -> RepositoryOutput:
+        pass
+
+    def close(self):
+        """Called once every repository has been scanned"""
+        pass
+
+
+@dataclass
+class PendingSpecUpload:
+    source: str
+    spec_hash: str
+    openapi_spec: dict
+    # Every source the spec has been discovered at, starting with source. Identical copies discovered while the spec is
+    # uploading are added to it, and recorded as uploaded too once it has been.
+    sources: list[str] = field(default_factory=list)
+    # How many of the sources were sent with the upload. Any added after it was sent are sent with a follow-up upload.
+    sources_sent: int = 0
+    # Whether this upload only attaches sources added after the spec's last upload was sent
+    follow_up: bool = False
+    # The span the spec was discovered in, which its upload's span is a child of, as it's uploaded in another thread
+    trace_parent: Span | None = None
+
+
+class RepositorySpecUploader(RepositoryOutput):
+    """Uploads the OpenAPI specs discovered in a repository to FireTail as soon as they're discovered, rather than once
+    the whole repository has been scanned, so specs aren't all held in memory together and those discovered before a
+    scan fails still reach FireTail. Specs which haven't changed since they were last uploaded are skipped, and the
+    repository's API is only created or updated when the first spec which needs uploading is discovered.
+
+    Identical specs discovered at several sources, e.g. docs/openapi.yaml and a copy of it under examples/, are only
+    uploaded once, by their canonical hash. The sources of the copies discovered before the upload is sent are included
+    in it; copies discovered after that are attached to it with a follow-up upload once it's complete.
+    """
+
+    def __init__(
+        self,
+        repository_full_name: str,
+        repository_id: int,
+        firetail_client: FiretailClient,
+        upload_state: UploadStateStore,
+        max_uploads_in_flight: int = MAX_SPEC_UPLOADS_IN_FLIGHT,
+        delta_uploads: bool = DELTA_UPLOADS,
+    ):
+        """
+        Args:
+            repository_full_name (str): The full name of the repository the specs are discovered in
+            repository_id (int): The GitHub ID of the repository
+            firetail_client (FiretailClient): The client to upload the specs with
+            upload_state (UploadStateStore): The record of the specs last uploaded, which is updated as uploads complete
+            max_uploads_in_flight (int, optional): How many specs can be waiting to be uploaded or uploading at once.
+            Discovering another blocks the scan until one has been uploaded. Defaults to MAX_SPEC_UPLOADS_IN_FLIGHT.
+            delta_uploads (bool, optional): Whether to upload specs as patches against the last version FireTail
+            accepted, where it's been kept. Defaults to DELTA_UPLOADS.
+        """
+        self.repository_full_name = repository_full_name
+        self.repository_id = repository_id
+        self.firetail_client = firetail_client
+        self.upload_state = upload_state
+        self.max_uploads_in_flight = max(1, max_uploads_in_flight)
+        self.delta_uploads = delta_uploads
+
+        # The API is created when the first spec which needs uploading is discovered. If it fails to be created, specs
+        # aren't uploaded for the rest of the scan.
+        self.api_uuid: str | None = None
+        self.api_creation_failed = False
+
+        self.executor: ThreadPoolExecutor | None = None
+        self.pending_uploads: dict[Future, PendingSpecUpload] = {}
+
+        # The sources of each spec uploaded, or being uploaded, by its canonical hash, and the hashes of those which
+        # have been uploaded successfully. The specs themselves aren't kept.
+        self.spec_sources: dict[str, list[str]] = {}
+        self.uploaded_spec_hashes: set[str] = set()
+        # Held while the sources of a spec are read to be uploaded, or added to
+        self.spec_sources_lock = threading.Lock()
+
+        self.specs_unchanged = 0
+        self.specs_duplicated = 0
+        self.specs_not_uploaded = 0
+        self.spec_upload_results: list[SpecUploadResult] = []
+
+    def add_openapi_spec(self, source: str, openapi_spec: dict):
+        spec_hash = get_canonical_hash(openapi_spec)
+        if self.upload_state.is_unchanged(self.repository_full_name, source, spec_hash):
+            self.specs_unchanged += 1
+            increment("specs_unchanged", repository=self.repository_full_name)
+            return
+
+        if spec_hash in self.spec_sources:
+            self.add_duplicate_openapi_spec(source, spec_hash, openapi_spec)
+            return
+
+        if not self.create_api():
+            self.specs_not_uploaded += 1
+            return
+
+        while len(self.pending_uploads) >= self.max_uploads_in_flight:
+            self.collect_upload_results(return_when=FIRST_COMPLETED)
+
+        pending_upload = PendingSpecUpload(source, spec_hash, openapi_spec, [source], trace_parent=get_current_span())
+        self.spec_sources[spec_hash] = pending_upload.sources
+        self.submit_upload(pending_upload)
+
+    def add_duplicate_openapi_spec(self, source: str, spec_hash: str, openapi_spec: dict):
+        self.specs_duplicated += 1
+        increment("specs_duplicated", repository=self.repository_full_name)
+        sources = self.spec_sources[spec_hash]
+        with self.spec_sources_lock:
+            sources.append(source)
+        logger.info(f"{self.repository_full_name}: {source} is identical to {sources[0]}, only uploading it once")
+
+        # If the spec is still uploading, the source is sent either with it or with a follow-up once it's complete. If
+        # it failed to upload, the source isn't sent, nor recorded, so the next scan tries again.
+        if spec_hash not in self.uploaded_spec_hashes or any(
+            pending_upload.spec_hash == spec_hash for pending_upload in self.pending_uploads.values()
+        ):
+            return
+        # The copy is identical, so it's sent in place of the spec, which isn't kept once it's been uploaded
+        self.submit_upload(
+            PendingSpecUpload(
+                sources[0], spec_hash, openapi_spec, sources, trace_parent=get_current_span(), follow_up=True
+            )
+        )
+
+    def submit_upload(self, pending_upload: PendingSpecUpload):
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=self.firetail_client.upload_concurrency)
+        self.pending_uploads[self.executor.submit(self.upload_api_spec, pending_upload)] = pending_upload
+        set_gauge("spec_uploads_in_flight", len(self.pending_uploads))
+
+    def create_api(self) -> bool:
+        if self.api_uuid is not None or self.api_creation_failed:
+            return self.api_uuid is not None
+
+        self.api_uuid = self.firetail_client.create_api_repository(self.repository_full_name, self.repository_id)
+        if self.api_uuid is None:
+            self.api_creation_failed = True
+            return False
+
+        # If the API has a different UUID to the one recorded then it's been recreated, and the record is reset. Specs
+        # already skipped as unchanged can't be uploaded to it until the next scan, as they aren't kept in memory.
+        recorded_api_uuid = self.upload_state.get_api_uuid(self.repository_full_name)
+        if recorded_api_uuid is not None and recorded_api_uuid != self.api_uuid and self.specs_unchanged > 0:
+            logger.warning(
+                f"{self.repository_full_name}: API was recreated, {self.specs_unchanged} unchanged OpenAPI spec(s)"
+                " already skipped will be uploaded to it on the next scan."
+            )
+        self.upload_state.set_api_uuid(self.repository_full_name, self.api_uuid)
+        return True
+
+    def upload_api_spec(self, pending_upload: PendingSpecUpload) -> SpecUploadResult:
+        # Run by the executor's threads, so the last version of the spec FireTail accepted is only loaded while it's
+        # being uploaded
+        base_spec = None
+        if self.delta_uploads:
+            base_spec = self.upload_state.get_last_uploaded_spec(self.repository_full_name, pending_upload.source)
+            # A spec being uploaded again only because its upload state expired is uploaded in full, not as an empty
+            # patch. A follow-up only attaches sources to the spec, so an empty patch is all it needs.
+            if base_spec is not None and base_spec[0] == pending_upload.spec_hash and not pending_upload.follow_up:
+                base_spec = None
+
+        with self.spec_sources_lock:
+            sources = list(pending_upload.sources)
+            pending_upload.sources_sent = len(sources)
+
+        # Timed in the executor's thread, so the repository is given rather than taken from the scan's context
+        with (
+            time_stage("upload_spec", repository=self.repository_full_name),
+            span(
+                "upload_spec",
+                "upload",
+                pending_upload.trace_parent,
+                repository=self.repository_full_name,
+                source=pending_upload.source,
+                hash=pending_upload.spec_hash,
+                follow_up=pending_upload.follow_up,
+            ) as upload_span,
+        ):
+            spec_upload_result = self.firetail_client.upload_api_spec(
+                self.api_uuid,  # type: ignore
+                pending_upload.source,
+                pending_upload.openapi_spec,
+                base_spec,
+                sources if len(sources) > 1 else None,
+            )
+            upload_span.set_attribute("status_code", spec_upload_result.status_code)
+            upload_span.set_attribute("attempts", spec_upload_result.attempts)
+            upload_span.set_attribute("delta", spec_upload_result.delta)
+            upload_span.set_attribute("sources", len(sources))
+        return spec_upload_result
+
+    def collect_upload_results(self, return_when: str):
+        completed_futures, _ = wait(self.pending_uploads, return_when=return_when)
+
+        set_gauge("spec_uploads_in_flight", len(self.pending_uploads) - len(completed_futures))
+        for future in completed_futures:
+            pending_upload = self.pending_uploads.pop(future)
+            try:
+                spec_upload_result = future.result()
+            except Exception as exception:
+                # Only this spec's upload failed, so the rest of the scan carries on
+                spec_upload_result = SpecUploadResult(pending_upload.source, False, error=repr(exception))
+            # A follow-up doesn't upload another spec, so it's counted apart from the spec's upload
+            if pending_upload.follow_up:
+                increment(
+                    "spec_follow_ups_uploaded" if spec_upload_result.succeeded else "spec_follow_up_failures",
+                    repository=self.repository_full_name,
+                )
+            else:
+                self.spec_upload_results.append(spec_upload_result)
+                increment(
+                    "specs_uploaded" if spec_upload_result.succeeded else "spec_upload_failures",
+                    repository=self.repository_full_name,
+                )
+            if not spec_upload_result.succeeded:
+                logger.critical(
+                    f"{self.repository_full_name}: Failed to upload OpenAPI spec {spec_upload_result.source} to SaaS"
+                    f" after {spec_upload_result.attempts} attempt(s), response: {spec_upload_result.error}"
+                )
+                continue
+
+            logger.info(
+                f"{self.repository_full_name}: Successfully created/updated {spec_upload_result.source} API spec in"
+                f" Firetail SaaS{' with a patch' if spec_upload_result.delta else ''}, response:"
+                f" {spec_upload_result.status_code}"
+            )
+            if not pending_upload.follow_up:
+                self.upload_state.record_upload(
+                    self.repository_full_name,
+                    pending_upload.source,
+                    pending_upload.spec_hash,
+                    pending_upload.openapi_spec,
+                )
+            # Only the sources which were sent are recorded, so none are recorded without FireTail having them
+            sources_sent = pending_upload.sources[: pending_upload.sources_sent]
+            for duplicate_source in sources_sent[1:]:
+                self.upload_state.record_upload(self.repository_full_name, duplicate_source, pending_upload.spec_hash)
+            self.uploaded_spec_hashes.add(pending_upload.spec_hash)
+
+            # Identical copies discovered after the upload was sent are attached to the spec with a follow-up upload
+            if len(pending_upload.sources) > pending_upload.sources_sent:
+                self.submit_upload(
+                    PendingSpecUpload(
+                        pending_upload.source,
+                        pending_upload.spec_hash,
+                        pending_upload.openapi_spec,
+                        pending_upload.sources,
+                        trace_parent=pending_upload.trace_parent,
+                        follow_up=True,
+                    )
+                )
+
+    def finish(self):
+        """Waits for every pending upload to complete, then saves the upload state. Whether each spec which needed
+        uploading was uploaded is then in spec_upload_results.
+        """
+        # Collecting the uploads' results can submit follow-up uploads, which are waited for too
+        while len(self.pending_uploads) > 0:
+            self.collect_upload_results(return_when=ALL_COMPLETED)
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+        uploaded_specs = len([result for result in self.spec_upload_results if result.succeeded])
+        logger.info(
+            f"{self.repository_full_name}: {uploaded_specs} OpenAPI spec(s) uploaded,"
+            f" {len(self.spec_upload_results) - uploaded_specs + self.specs_not_uploaded} failed to upload,"
+            f" {self.specs_unchanged} unchanged since last uploaded, {self.specs_duplicated} identical to another."
+        )
+
+        self.upload_state.save()
+
+
+class FiretailSink(OutputSink):
+    """Uploads specs to the FireTail API, reusing the same client, and so its connections, for every repository"""
+
+    def __init__(self, firetail_api_url: str, firetail_app_token: str, upload_state: UploadStateStore | None = None):
+        self.firetail_client = FiretailClient(firetail_api_url, firetail_app_token)
+        self.upload_state = (
+            upload_state
+            if upload_state is not None
+            else UploadStateStore(
+                UPLOAD_STATE_PATH, UPLOAD_STATE_TTL_SECONDS, DELTA_UPLOAD_MIN_BYTES if DELTA_UPLOADS else None
+            )
+        )
+
+    def open_repository(self, repository_full_name: str, repository_id: int) -> RepositoryOutput:
+        return RepositorySpecUploader(repository_full_name, repository_id, self.firetail_client, self.upload_state)
+
+
+class NdjsonRepositoryOutput(RepositoryOutput):
+    def __init__(self, ndjson_sink: "NdjsonSink", repository_full_name: str, repository_id: int):
+        self.ndjson_sink = ndjson_sink
+        self.repository_full_name = repository_full_name
+        self.repository_id = repository_id
+
+    def add_openapi_spec(self, source: str, openapi_spec: dict):
+        self.ndjson_sink.write_line(
+            self.repository_full_name,
+            json.dumps(
+                {
+                    "repository": self.repository_full_name,
+                    "repository_id": f"github:{self.repository_id}",
+                    "source": source,
+                    "hash": get_canonical_hash(openapi_spec),
+                    "appspec": openapi_spec,
+                },
+                default=str,
+            ),
+        )
+
+    def finish(self):
+        self.ndjson_sink.finish_repository(self.repository_full_name)
+
+
+class NdjsonSink(OutputSink):
+    """Writes each spec as a line of JSON as soon as it's discovered, through a buffer, either to a single file or, if
+    the path is a directory, to a file for each repository named after it
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.is_directory = path.endswith("/") or os.path.isdir(path)
+        self.file: TextIO | None = None
+
+    def get_repository_file_path(self, repository_full_name: str) -> str:
+        return os.path.join(self.path, f"{repository_full_name.replace('/', '__')}.ndjson")
+
+    def write_line(self, repository_full_name: str, line: str):
+        if self.file is None:
+            file_path = self.get_repository_file_path(repository_full_name) if self.is_directory else self.path
+            os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+            # A directory gets a new file for each repository each scan, but a single file is appended to, so the
+            # output of several scans can be collected in it
+            self.file = open(
+                file_path, "w" if self.is_directory else "a", encoding="utf-8", buffering=NDJSON_BUFFER_SIZE_BYTES
+            )
+        self.file.write(line + "\n")
+
+    def finish_repository(self, repository_full_name: str):
+        if self.file is None:
+            return
+        # Each repository's specs are flushed once it's been scanned, so a scan which dies later doesn't lose them
+        self.file.flush()
+        if self.is_directory:
+            self.file.close()
+            self.file = None
+
+    def open_repository(self, repository_full_name: str, repository_id: int) -> RepositoryOutput:
+        return NdjsonRepositoryOutput(self, repository_full_name, repository_id)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class NullRepositoryOutput(RepositoryOutput):
+    def __init__(self, null_sink: "NullSink"):
+        self.null_sink = null_sink
+
+    def add_openapi_spec(self, source: str, openapi_spec: dict):
+        self.null_sink.specs_discarded += 1
+
+
+class NullSink(OutputSink):
+    """Discards every spec, so scans can be benchmarked without waiting on FireTail"""
+
+    def __init__(self):
+        self.specs_discarded = 0
+
+    def open_repository(self, repository_full_name: str, repository_id: int) -> RepositoryOutput:
+        return NullRepositoryOutput(self)
+
+    def close(self):
+        logger.info(f"Discarded {self.specs_discarded} OpenAPI spec(s)")
+
+
+OUTPUT_SINK_NAMES = {"firetail", "ndjson", "null"}
+
+
+def get_output_sink(
+    sink_name: str, firetail_api_url: str | None, firetail_app_token: str | None, output_path: str | None
+) -> OutputSink | None:
+    """Gets an output sink by its name
+
+    Args:
+        sink_name (str): "firetail", "ndjson" or "null"
+        firetail_api_url (str | None): The URL of the FireTail API, which the "firetail" sink requires
+        firetail_app_token (str | None): The token for the FireTail API, which the "firetail" sink requires
+        output_path (str | None): The file or directory to write to, which the "ndjson" sink requires
+
+    Returns:
+        OutputSink | None: The output sink, or None if the name is unknown or the sink is missing what it requires
+    """
+    match sink_name:
+        case "firetail":
+            if firetail_api_url in {None, ""} or firetail_app_token in {None, ""}:
+                logger.critical("The firetail output sink requires FIRETAIL_API_URL and FIRETAIL_APP_TOKEN to be set.")
+                return None
+            return FiretailSink(firetail_api_url, firetail_app_token)  # type: ignore
+        case "ndjson":
+            if output_path in {None, ""}:
+                logger.critical("The ndjson output sink requires an output path to be set.")
+                return None
+            return NdjsonSink(output_path)  # type: ignore
+        case "null":
+            return NullSink()
+
+    logger.critical(f"Unknown output sink {sink_name}, must be one of {', '.join(sorted(OUTPUT_SINK_NAMES))}.")
+    return None
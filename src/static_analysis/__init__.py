@@ -12,6 +12,19 @@ LANGUAGE_ANALYSERS: dict[str, list[ANALYSER_TYPE]] = {
     "JavaScript": [analyse_javascript],
 }
 
+# The extensions of the files each language's analysers analyse. Any other files are ignored by them.
+LANGUAGE_FILE_EXTENSIONS: dict[str, tuple[str, ...]] = {
+    "Python": (".py",),
+    "Go": (".go",),
+    "JavaScript": (".js",),
+}
+
+
+def get_language_file_extensions(languages: list[str]) -> tuple[str, ...]:
+    return tuple(
+        file_extension for language in languages for file_extension in LANGUAGE_FILE_EXTENSIONS.get(language, ())
+    )
+
 
 def get_language_analysers(languages: list[str]) -> list[ANALYSER_TYPE]:
     language_analysers: list[ANALYSER_TYPE] = []
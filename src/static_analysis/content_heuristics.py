@@ -0,0 +1,73 @@
+import math
+import re
+from collections import Counter
+
+# Only files with these extensions are classified. Generated Golang is left alone, as generated servers (e.g. from
+# oapi-codegen) register the routes of real APIs, and the Golang analyser skips files without framework imports anyway.
+CONTENT_HEURISTICS_FILE_EXTENSIONS = (".js", ".cjs", ".mjs", ".py")
+
+# How many characters from the start of a file are classified. The rest of the file is never looked at.
+CONTENT_SAMPLE_LENGTH = 8192
+
+# How many characters from the start of a file are searched for a generated file header
+GENERATED_HEADER_LENGTH = 1024
+
+# Headers written at the top of generated files by tools following the @generated convention, Go's "Code generated by
+# ... DO NOT EDIT." convention, or protoc. Looser phrases, e.g. "auto-generated", are left out, as they're common in
+# hand written comments and a file's routes would be lost if it were misclassified.
+GENERATED_HEADER_PATTERN = re.compile(
+    r"@generated\b|^\W*Code generated .* DO NOT EDIT\b|\bGenerated by the protocol buffer compiler\b",
+    re.MULTILINE,
+)
+
+# Markers of webpack output, which can appear anywhere in the sample
+BUNDLE_MARKER_PATTERN = re.compile(r"webpackBootstrap|__webpack_require__|webpackChunk")
+
+# Samples shorter than this aren't classified as minified, as a short file can't be told apart from a short line
+MINIFIED_MIN_SAMPLE_LENGTH = 1024
+
+# Hand written code averages 30-50 characters per line; minified code is usually a few very long lines
+MINIFIED_AVERAGE_LINE_LENGTH = 250
+MINIFIED_MAX_LINE_LENGTH = 5000
+
+# The Shannon entropy, in bits per character, above which a sample is classified as encoded data. Source code is
+# usually between 4 and 5.5, while base64 is around 6.
+HIGH_ENTROPY_BITS_PER_CHARACTER = 5.8
+
+
+def is_content_heuristics_file(file_path: str) -> bool:
+    return file_path.endswith(CONTENT_HEURISTICS_FILE_EXTENSIONS)
+
+
+def get_entropy(sample: str) -> float:
+    character_counts = Counter(sample)
+    return -sum(count / len(sample) * math.log2(count / len(sample)) for count in character_counts.values())
+
+
+def classify_file_contents(file_contents: str) -> str | None:
+    """Cheaply classifies the contents of a source file as minified, generated or encoded data, which aren't worth
+    parsing as they'll never contain the definition of an API. Only the first CONTENT_SAMPLE_LENGTH characters are
+    looked at.
+
+    Args:
+        file_contents (str): The contents of the file
+
+    Returns:
+        str | None: "generated", "minified" or "high_entropy", or None if the file looks hand written
+    """
+    sample = file_contents[:CONTENT_SAMPLE_LENGTH]
+
+    if GENERATED_HEADER_PATTERN.search(sample, 0, GENERATED_HEADER_LENGTH) or BUNDLE_MARKER_PATTERN.search(sample):
+        return "generated"
+
+    if len(sample) < MINIFIED_MIN_SAMPLE_LENGTH:
+        return None
+
+    line_lengths = [len(line) for line in sample.split("\n")]
+    if len(sample) / len(line_lengths) > MINIFIED_AVERAGE_LINE_LENGTH or max(line_lengths) > MINIFIED_MAX_LINE_LENGTH:
+        return "minified"
+
+    if get_entropy(sample) > HIGH_ENTROPY_BITS_PER_CHARACTER:
+        return "high_entropy"
+
+    return None
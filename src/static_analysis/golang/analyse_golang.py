@@ -5,23 +5,142 @@ from typing import Callable
 from utils import logger
 
 GOLANG_ANALYSIS_LIBRARY = ctypes.cdll.LoadLibrary("/analysers/golang/main.so")
-GOLANG_ANALYSER: Callable[[bytes, bytes], bytes] = GOLANG_ANALYSIS_LIBRARY.AnalyseCGOWrapper
-GOLANG_ANALYSER.argtypes = [ctypes.c_char_p, ctypes.c_char_p]  # type: ignore
-GOLANG_ANALYSER.restype = ctypes.c_void_p  # type: ignore
 
+GOLANG_BATCH_ANALYSER: Callable[[bytes], int] = GOLANG_ANALYSIS_LIBRARY.AnalyseBatchCGOWrapper
+GOLANG_BATCH_ANALYSER.argtypes = [ctypes.c_char_p]  # type: ignore
+GOLANG_BATCH_ANALYSER.restype = ctypes.c_void_p  # type: ignore
+
+GOLANG_DIRECTORY_ANALYSER: Callable[[bytes], int] = GOLANG_ANALYSIS_LIBRARY.AnalyseDirectoryCGOWrapper
+GOLANG_DIRECTORY_ANALYSER.argtypes = [ctypes.c_char_p]  # type: ignore
+GOLANG_DIRECTORY_ANALYSER.restype = ctypes.c_void_p  # type: ignore
+
+GOLANG_ARCHIVE_ANALYSER: Callable[[bytes, int, int], int] = GOLANG_ANALYSIS_LIBRARY.AnalyseArchiveCGOWrapper
+GOLANG_ARCHIVE_ANALYSER.argtypes = [ctypes.c_char_p, ctypes.c_size_t, ctypes.c_int]  # type: ignore
+GOLANG_ARCHIVE_ANALYSER.restype = ctypes.c_void_p  # type: ignore
+
+# Every string returned by the Golang analysis library is allocated with malloc, so it has to be handed back to be freed
+GOLANG_FREE_STRING: Callable[[int], None] = GOLANG_ANALYSIS_LIBRARY.FreeCString
+GOLANG_FREE_STRING.argtypes = [ctypes.c_void_p]  # type: ignore
+GOLANG_FREE_STRING.restype = None  # type: ignore
+
+
+def call_golang_analyser(golang_analyser: Callable[..., int], *args) -> dict:
+    response_json_ptr = golang_analyser(*args)
+    try:
+        return json.loads(ctypes.string_at(response_json_ptr))
+    finally:
+        GOLANG_FREE_STRING(response_json_ptr)
+
+
+def expand_openapi_spec(compact_openapi_spec: dict) -> dict:
+    # The Golang analyser returns just the paths and their methods, so we have to add the responses for each method
+    return {
+        "openapi": "3.0.0",
+        "info": {"title": compact_openapi_spec["title"]},
+        "paths": {
+            path: {
+                method: {"responses": {"default": {"description": "Discovered via static analysis"}}}
+                for method in methods
+            }
+            for path, methods in compact_openapi_spec["paths"].items()
+        },
+    }
 
-def analyse_golang(file_path: str, get_file_contents: Callable[[], str]) -> tuple[set[str], dict[str, dict]]:
-    if not file_path.endswith(".go"):
-        return (set(), {})
 
-    response_json_ptr = GOLANG_ANALYSER(file_path.encode("utf-8"), get_file_contents().encode("utf-8"))
-    loaded_response = json.loads(ctypes.string_at(response_json_ptr))
+def analyse_golang_files(files: dict[str, Callable[[], str]]) -> tuple[set[str], dict[str, dict]]:
+    """Analyses many Golang files in a single call to the Golang analysis library, which analyses them in parallel
+
+    Args:
+        files (dict[str, Callable[[], str]]): A dict of file paths to functions returning their contents
+
+    Returns:
+        tuple[set[str], dict[str, dict]]: The frameworks identified across all of the files, and the OpenAPI specs
+        generated from them
+    """
+    golang_files = [
+        {"file_path": file_path, "file_contents": get_file_contents()}
+        for file_path, get_file_contents in files.items()
+        if file_path.endswith(".go")
+    ]
+    if len(golang_files) == 0:
+        return set(), {}
+
+    loaded_response = call_golang_analyser(GOLANG_BATCH_ANALYSER, json.dumps(golang_files).encode("utf-8"))
 
     if "error" in loaded_response:
-        logger.critical(f"Golang static analysis failed on '{file_path}', error: {loaded_response['error']}")
+        logger.critical(
+            f"Golang static analysis failed on {len(golang_files)} file(s), error: {loaded_response['error']}"
+        )
         return set(), {}
 
-    frameworks_identified = loaded_response["frameworks_identified"]
-    openapi_specs = loaded_response["openapi_specs"]
+    frameworks_identified: set[str] = set()
+    openapi_specs: dict[str, dict] = {}
+
+    for result in loaded_response["results"]:
+        if "error" in result:
+            logger.critical(f"Golang static analysis failed on '{result['file_path']}', error: {result['error']}")
+            continue
+
+        frameworks_identified.update(result["frameworks_identified"])
+        for compact_openapi_spec in result["openapi_specs"]:
+            openapi_specs[compact_openapi_spec["source"]] = expand_openapi_spec(compact_openapi_spec)
+
+    return frameworks_identified, openapi_specs
+
+
+def load_walk_response(loaded_response: dict, walked: str) -> tuple[set[str], dict[str, dict]]:
+    if "error" in loaded_response:
+        logger.critical(f"Golang static analysis failed on {walked}, error: {loaded_response['error']}")
+        return set(), {}
+
+    for error in loaded_response["errors"]:
+        logger.critical(f"Golang static analysis failed on '{error['file_path']}', error: {error['error']}")
+
+    logger.info(
+        f"Golang static analysis of {walked} analysed {loaded_response['files_analysed']} file(s) and skipped "
+        f"{loaded_response['files_skipped']} file(s) not importing a supported framework"
+    )
+
+    return set(loaded_response["frameworks_identified"]), {
+        compact_openapi_spec["source"]: expand_openapi_spec(compact_openapi_spec)
+        for compact_openapi_spec in loaded_response["openapi_specs"]
+    }
+
+
+def analyse_golang_directory(directory_path: str) -> tuple[set[str], dict[str, dict]]:
+    """Walks a local directory and analyses all of the Golang files in it in parallel, without any per-file calls
+    between Python and the Golang analysis library. Files not importing a supported framework are skipped after
+    parsing just their imports.
+
+    Args:
+        directory_path (str): The directory to analyse. File paths in the specs' sources are relative to it.
+
+    Returns:
+        tuple[set[str], dict[str, dict]]: The frameworks identified across all of the files, and the OpenAPI specs
+        generated from them
+    """
+    loaded_response = call_golang_analyser(GOLANG_DIRECTORY_ANALYSER, directory_path.encode("utf-8"))
+    return load_walk_response(loaded_response, f"directory '{directory_path}'")
+
+
+def analyse_golang_archive(archive: bytes, strip_components: int = 0) -> tuple[set[str], dict[str, dict]]:
+    """The same as analyse_golang_directory, but for a tar archive, which may be gzipped
+
+    Args:
+        archive (bytes): The tar archive to analyse
+        strip_components (int, optional): How many leading components to strip from the archive's file paths, e.g. 1
+        for GitHub's tarballs which nest everything in a single directory. Defaults to 0.
+
+    Returns:
+        tuple[set[str], dict[str, dict]]: The frameworks identified across all of the files, and the OpenAPI specs
+        generated from them
+    """
+    loaded_response = call_golang_analyser(GOLANG_ARCHIVE_ANALYSER, archive, len(archive), strip_components)
+    return load_walk_response(loaded_response, f"a {len(archive)} byte archive")
+
+
+def analyse_golang(file_path: str, get_file_contents: Callable[[], str]) -> tuple[set[str], dict[str, dict]]:
+    if not file_path.endswith(".go"):
+        return (set(), {})
 
-    return set(frameworks_identified), openapi_specs
+    return analyse_golang_files({file_path: get_file_contents})
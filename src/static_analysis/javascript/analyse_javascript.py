@@ -1,6 +1,6 @@
 from typing import Callable
 
-from tree_sitter import Language, Parser, Tree
+from tree_sitter import Tree
 
 from static_analysis.javascript.analyse_express import analyse_express
 from static_analysis.javascript.utils import (
@@ -10,11 +10,7 @@ from static_analysis.javascript.utils import (
     is_variable_declarator_or_assignment_expression_calling_func,
     traverse_tree_depth_first,
 )
-
-JS_LANGUAGE = Language("/analysers/tree-sitter/languages.so", "javascript")
-
-JS_PARSER = Parser()
-JS_PARSER.set_language(JS_LANGUAGE)
+from static_analysis.tree_sitter_parsers import parse
 
 
 def get_imports(tree: Tree) -> set[str]:
@@ -64,7 +60,7 @@ def analyse_javascript(file_path: str, get_file_contents: Callable[[], str]) ->
         return (set(), {})
 
     try:
-        parsed_module = JS_PARSER.parse(get_file_contents().encode("utf-8"))
+        parsed_module = parse("javascript", get_file_contents().encode("utf-8"))
     except SyntaxError:
         return (set(), {})
 
@@ -1,117 +1,130 @@
 import ast
 
-from utils import get_datestamp
+from openapi.canonical import get_static_analysis_paths, get_static_analysis_version
+from static_analysis.python.visitor import ModuleVisitor
 
 
-def get_paths(module: ast.Module) -> dict[str, list[str]]:
-    discovered_routes: dict[str, list[str]] = {}
+# The classes whose instances have routes registered on them
+FLASK_APP_CLASSES = {"flask.Flask", "flask.Blueprint"}
 
-    # NOTE: If we created a more advanced visitor here we'd need to deal with some scoping headaches, so just scanning
-    # the top level for now should be fine
+# The decorators used to register routes on apps and blueprints, and the methods they default to
+FLASK_ROUTE_DECORATORS = {
+    "route": ["get"],  # By default, Flask endpoints are GET
+    "get": ["get"],
+    "post": ["post"],
+    "put": ["put"],
+    "patch": ["patch"],
+    "delete": ["delete"],
+}
 
-    # Determine the token the Flask class was imported as, e.g:
-    # import flask -> "flask.Flask"
-    # import flask as f -> "f.Flask"
-    # from flask import Flask -> "Flask"
-    # from flask import Flask as F -> "F"
-    flask_module_token: str | None = None
-    flask_class_token: str | None = None
-    for node in module.body:
-        if type(node) == ast.ImportFrom:
-            if node.module is None or node.module != "flask":
-                continue
-            for name in node.names:
-                if name.name != "Flask":
-                    continue
-                flask_class_token = name.asname or name.name
-                break
-        elif type(node) == ast.Import:
-            for alias in node.names:
-                if alias.name != "flask":
-                    continue
-                flask_module_token = alias.asname or alias.name
-                flask_class_token = "Flask"
-                break
-        if flask_class_token is not None:
-            break
-    if flask_class_token is None:
-        return {}
 
-    # Determine the token the Flask instance was assigned to, e.g:
-    # app = Flask() -> "app"
-    flask_object_token: str | None = None
-    for node in module.body:
-        if type(node) == ast.Assign and type(node.value) == ast.Call:
-            # An ImportFrom, e.g. from flask import Flask or from flask import Flask as F
-            is_import_from = (
-                flask_module_token is None
-                and type(node.value.func) == ast.Name
-                and node.value.func.id == flask_class_token
-            )
-
-            # A regular import, e.g. import flask or import flask as f
-            is_regular_import = (
-                flask_module_token is not None
-                and type(node.value.func) == ast.Attribute
-                and type(node.value.func.value) == ast.Name
-                and node.value.func.value.id == flask_module_token
-                and node.value.func.attr == flask_class_token
-            )
-
-            if (is_import_from or is_regular_import) and (len(node.targets) == 1 and type(node.targets[0]) == ast.Name):
-                flask_object_token = node.targets[0].id
-                break
-    if flask_object_token is None:
+def get_url_prefix(call: ast.Call) -> str | None:
+    for kwarg in call.keywords:
+        if kwarg.arg == "url_prefix" and type(kwarg.value) == ast.Constant and type(kwarg.value.value) == str:
+            return kwarg.value.value
+    return None
+
+
+def join_url_prefix(url_prefix: str, route: str) -> str:
+    # This is how Flask joins a blueprint's url_prefix onto its routes
+    if route == "":
+        return url_prefix
+    return "/".join((url_prefix.rstrip("/"), route.lstrip("/")))
+
+
+def get_paths(module_visitor: ModuleVisitor) -> dict[str, list[str]]:
+    discovered_routes: dict[str, list[str]] = {}
+
+    # Determine the tokens the Flask and Blueprint classes may be called by, e.g:
+    # from flask import Flask as F -> "F"
+    # import flask as f -> "Flask" (from f.Flask)
+    flask_app_class_tokens = {class_name.split(".")[-1] for class_name in FLASK_APP_CLASSES}
+    for token, qualified_name in module_visitor.import_aliases.items():
+        if qualified_name in FLASK_APP_CLASSES:
+            flask_app_class_tokens.add(token)
+
+    # Determine the tokens Flask apps & blueprints were assigned to, and their URL prefixes, e.g:
+    # app = Flask(__name__) -> {"app": ""}
+    # api = Blueprint("api", __name__, url_prefix="/api") -> {"api": "/api"}
+    url_prefixes: dict[str, str] = {}
+    for target, call in module_visitor.call_assignments:
+        # Cheap check on the name being called before resolving what it refers to, as most calls won't be to Flask
+        if type(call.func) == ast.Name:
+            called_name = call.func.id
+        elif type(call.func) == ast.Attribute:
+            called_name = call.func.attr
+        else:
+            continue
+        if called_name not in flask_app_class_tokens:
+            continue
+        if module_visitor.get_qualified_name(call.func) in FLASK_APP_CLASSES:
+            url_prefixes[target] = get_url_prefix(call) or ""
+    if len(url_prefixes) == 0:
         return {}
 
-    # Look for decorators using the `route` method on the flask object
-    for node in module.body:
-        if type(node) != ast.FunctionDef:
+    # A blueprint's URL prefix can be overridden when it's registered, e.g:
+    # app.register_blueprint(api, url_prefix="/v1")
+    for call in module_visitor.statement_calls:
+        if not (
+            type(call.func) == ast.Attribute
+            and call.func.attr == "register_blueprint"
+            and len(call.args) == 1
+            and type(call.args[0]) == ast.Name
+            and call.args[0].id in url_prefixes
+        ):
+            continue
+        url_prefix = get_url_prefix(call)
+        if url_prefix is not None:
+            url_prefixes[call.args[0].id] = url_prefix
+
+    # Look for decorators using the `route` method (or one of its shortcuts, e.g. `get`) on the apps & blueprints
+    for decorator in module_visitor.decorator_calls:
+        if not (
+            type(decorator.func) == ast.Attribute
+            and type(decorator.func.value) == ast.Name
+            and decorator.func.value.id in url_prefixes
+            and decorator.func.attr in FLASK_ROUTE_DECORATORS
+            and len(decorator.args) == 1
+            and type(decorator.args[0]) == ast.Constant
+            and type(decorator.args[0].value) == str
+        ):
             continue
-        for decorator in node.decorator_list:
-            if not (
-                type(decorator) == ast.Call
-                and type(decorator.func) == ast.Attribute
-                and type(decorator.func.value) == ast.Name
-                and decorator.func.value.id == flask_object_token
-                and decorator.func.attr == "route"
-                and len(decorator.args) == 1
-                and type(decorator.args[0]) == ast.Constant
-                and type(decorator.args[0].value) == str
-            ):
-                continue
 
-            discovered_route = decorator.args[0].value
-            discovered_methods = ["get"]  # By default, Flask endpoints are GET
+        discovered_route = join_url_prefix(url_prefixes[decorator.func.value.id], decorator.args[0].value)
+        discovered_methods = FLASK_ROUTE_DECORATORS[decorator.func.attr]
 
-            for kwarg in decorator.keywords:
-                if kwarg.arg != "methods":
-                    continue
-                if type(kwarg.value) != ast.List:
-                    continue
-                discovered_methods = [
-                    element.value.lower()
-                    for element in kwarg.value.elts
-                    if type(element) == ast.Constant and type(element.value) == str
-                ]
-                break
+        for kwarg in decorator.keywords:
+            if kwarg.arg != "methods" or decorator.func.attr != "route":
+                continue
+            methods = kwarg.value
+            if not (type(methods) == ast.List or type(methods) == ast.Tuple):
+                continue
+            discovered_methods = [
+                element.value.lower()
+                for element in methods.elts
+                if type(element) == ast.Constant and type(element.value) == str
+            ]
+            break
 
-            discovered_routes[discovered_route] = discovered_methods
+        # The same route can be registered by more than one function, e.g. one for GET and one for POST
+        discovered_routes[discovered_route] = list(
+            dict.fromkeys(discovered_routes.get(discovered_route, []) + discovered_methods)
+        )
 
     return discovered_routes
 
 
-def analyse_flask(module: ast.Module) -> dict | None:
+def analyse_flask(module_visitor: ModuleVisitor) -> dict | None:
     """Analyses a flask module and returns an openapi spec generated from static analysis, or None
 
     Args:
-        module (ast.Module): The Flask module to analyse
+        module_visitor (ModuleVisitor): A ModuleVisitor which has visited the Flask module to analyse
 
     Returns:
         dict | None: An OpenAPI spec, or None
     """
 
-    paths = get_paths(module=module)
+    paths = get_paths(module_visitor=module_visitor)
 
     # If there's no paths, there's no point creating an appspec
     if len(paths) == 0:
@@ -119,14 +132,9 @@ def analyse_flask(module: ast.Module) -> dict | None:
 
     # This isn't a valid OpenAPI spec as it's missing a version field under the info object, and at least one response
     # definition under each of the methods, but it's good enough for now.
+    openapi_paths = get_static_analysis_paths(paths)
     return {
         "openapi": "3.0.0",
-        "info": {"title": "Static Analysis - Flask", "version": get_datestamp()},
-        "paths": {
-            path: {
-                method: {"responses": {"default": {"description": "Discovered via static analysis"}}}
-                for method in methods
-            }
-            for path, methods in paths.items()
-        },
+        "info": {"title": "Static Analysis - Flask", "version": get_static_analysis_version(openapi_paths)},
+        "paths": openapi_paths,
     }
@@ -1,19 +1,137 @@
 import ast
+import io
+import re
+import tokenize
 from typing import Callable
 
 from static_analysis.python.analyse_flask import analyse_flask
+from static_analysis.python.visitor import ModuleVisitor
 
+FRAMEWORK_MODULES = {"flask", "fastapi", "scarlette", "django", "firetail", "gevent"}
 
-def get_imports(module: ast.Module) -> list[str]:
+# Top level statements which may come before or between a module's imports, e.g. to guard an import with a try/except
+# or an `if TYPE_CHECKING:`. Anything inside their blocks is also skipped over.
+LEADING_COMPOUND_STATEMENTS = {"try", "except", "else", "finally", "if", "elif"}
+
+# An import after a module's leading imports, e.g. in the body of an app factory function, after a semicolon or in the
+# body of a compound statement on the same line. Searching the rest of a file for these after its leading imports is
+# much cheaper than tokenizing it. Matches in strings only cost a full parse.
+LATER_IMPORT_PATTERN = re.compile(r"(?:^|[;:])[ \t]*(?:import|from)[ \t]", re.MULTILINE)
+
+
+def get_imports_from_tokens(tokens: list[tokenize.TokenInfo]) -> list[str]:
     imports: list[str] = []
 
-    # NOTE: we could create a more advanced visitor, but scanning the top level for imports is fine for now.
-    for node in module.body:
-        if isinstance(node, ast.ImportFrom) and node.module is not None:
-            imports.append(node.module)
-        elif isinstance(node, ast.Import):
-            for alias in node.names:
-                imports.append(alias.name)
+    match tokens[0].string:
+        case "import":
+            # e.g. 'import foo.bar as baz, qux' -> ["foo.bar", "qux"]
+            module_name, skip_next_name = "", False
+            for token in tokens[1:]:
+                if token.string == "as":
+                    skip_next_name = True
+                elif token.string == ",":
+                    imports.append(module_name)
+                    module_name = ""
+                elif not skip_next_name:
+                    module_name += token.string
+                else:
+                    skip_next_name = False
+            imports.append(module_name)
+
+        case "from":
+            # e.g. 'from foo.bar import baz' -> ["foo.bar"]. Relative imports, e.g. 'from .foo import bar', are skipped.
+            module_name = ""
+            for token in tokens[1:]:
+                if token.string == "import":
+                    break
+                module_name += token.string
+            if not module_name.startswith("."):
+                imports.append(module_name)
+
+    return imports
+
+
+def get_compound_statement_body(tokens: list[tokenize.TokenInfo]) -> list[tokenize.TokenInfo]:
+    # The tokens after the colon ending a compound statement's header, e.g. 'if TYPE_CHECKING: import foo' -> 'import
+    # foo'. Colons in brackets (e.g. slices and dicts) and lambdas aren't the end of the header.
+    bracket_depth, lambdas = 0, 0
+    for body_index, token in enumerate(tokens, start=1):
+        if token.string in {"(", "[", "{"}:
+            bracket_depth += 1
+        elif token.string in {")", "]", "}"}:
+            bracket_depth -= 1
+        elif bracket_depth == 0 and token.string == "lambda":
+            lambdas += 1
+        elif bracket_depth == 0 and token.string == ":":
+            if lambdas == 0:
+                return tokens[body_index:]
+            lambdas -= 1
+    return []
+
+
+def get_line_offset(file_contents: str, line_number: int) -> int:
+    offset = 0
+    for _ in range(line_number - 1):
+        offset = file_contents.index("\n", offset) + 1
+    return offset
+
+
+def get_leading_imports(file_contents: str) -> set[str] | None:
+    """Gets the modules imported at the start of a Python file by tokenizing it up to its first top level statement
+    which isn't an import, which is much cheaper than parsing the whole file with ast.parse.
+
+    Args:
+        file_contents (str): The contents of the Python file
+
+    Returns:
+        set[str] | None: The modules imported at the start of the file, or None if it couldn't be tokenized or there
+        may be more imports after them, e.g. in an app factory function, in which case it should be parsed
+    """
+    imports: set[str] = set()
+
+    indentation_depth = 0
+    statement: list[tokenize.TokenInfo] = []
+    try:
+        for token in tokenize.generate_tokens(io.StringIO(file_contents).readline):
+            match token.type:
+                case tokenize.INDENT:
+                    indentation_depth += 1
+                case tokenize.DEDENT:
+                    indentation_depth -= 1
+                case tokenize.NL | tokenize.COMMENT:
+                    pass
+                case tokenize.OP if token.string != ";":
+                    statement.append(token)
+                case tokenize.NEWLINE | tokenize.ENDMARKER | tokenize.OP:
+                    # A statement ends at the end of its logical line, or at a semicolon, e.g. 'import os; import flask'
+                    if len(statement) == 0:
+                        continue
+
+                    first_token = statement[0]
+                    if first_token.string in {"import", "from"}:
+                        imports.update(get_imports_from_tokens(statement))
+                    elif (body := get_compound_statement_body(statement)) and body[0].string in {"import", "from"}:
+                        # A compound statement with an import for its body, e.g. 'if TYPE_CHECKING: import foo'
+                        imports.update(get_imports_from_tokens(body))
+                    elif indentation_depth == 0 and not (
+                        # A docstring
+                        first_token.type == tokenize.STRING
+                        or first_token.string in LEADING_COMPOUND_STATEMENTS
+                        # Module metadata, e.g. '__version__ = "1.0.0"'
+                        or (first_token.string.startswith("__") and len(statement) > 1 and statement[1].string == "=")
+                    ):
+                        if LATER_IMPORT_PATTERN.search(
+                            file_contents, get_line_offset(file_contents, first_token.start[0])
+                        ):
+                            return None
+                        return imports
+
+                    statement = []
+                case _:
+                    statement.append(token)
+
+    except (tokenize.TokenError, SyntaxError):
+        return None
 
     return imports
 
@@ -22,21 +140,32 @@ def analyse_python(file_path: str, get_file_contents: Callable[[], str]) -> tupl
     if not file_path.endswith(".py"):
         return (set(), {})
 
+    file_contents = get_file_contents()
+
+    # Most Python files don't import a framework we can analyse, so check their imports with the tokenizer before
+    # paying for a full parse. If tokenizing fails, fall back to parsing the file to find out.
+    leading_imports = get_leading_imports(file_contents)
+    if leading_imports is not None and not any(
+        imported_module.split(".")[0] in FRAMEWORK_MODULES for imported_module in leading_imports
+    ):
+        return (set(), {})
+
     try:
-        parsed_module = ast.parse(get_file_contents())
+        parsed_module = ast.parse(file_contents)
     except SyntaxError:
         return (set(), {})
 
-    imported_modules = get_imports(parsed_module)
-
-    FRAMEWORK_MODULES = {"flask", "fastapi", "scarlette", "django", "firetail" "gevent"}
+    # All of the framework analysers share a single traversal of the module
+    module_visitor = ModuleVisitor()
+    module_visitor.visit(parsed_module)
+    imported_modules = module_visitor.imports
 
     DETECTED_FRAMEWORKS = set(imported_modules).intersection(FRAMEWORK_MODULES)
 
     appspecs: dict = {}
 
     if "flask" in DETECTED_FRAMEWORKS:
-        flask_appspec = analyse_flask(parsed_module)
+        flask_appspec = analyse_flask(module_visitor)
         if flask_appspec is not None:
             appspecs[f"static-analysis:flask:{file_path}"] = flask_appspec
 
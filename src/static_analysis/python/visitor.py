@@ -0,0 +1,138 @@
+import ast
+from typing import Any, Callable
+
+# The visitor method for each type of node, for each subclass of ModuleVisitor. See ModuleVisitor.get_visitor.
+VISITOR_CACHE: dict[tuple[type, type[ast.AST]], Any] = {}
+MISSING_VISITOR = object()
+
+# The fields of each type of node which are lists of statements. See ModuleVisitor.generic_visit.
+STATEMENT_LIST_FIELDS_CACHE: dict[type[ast.AST], tuple[str, ...]] = {}
+
+
+class ModuleVisitor(ast.NodeVisitor):
+    """Gathers the imports, assignments from calls, decorators and method calls of a module in a single traversal, so
+    framework analysers can share one walk of the tree.
+
+    Only statements are visited, including those nested in functions, classes, conditionals etc. (e.g. app factories).
+    Expressions are never descended into, which keeps the traversal cheap. Scoping is ignored: a name bound anywhere in
+    the module is treated the same as a name bound at the top level.
+    """
+
+    # The fields of a statement which can contain more statements
+    STATEMENT_LIST_FIELDS = ("body", "orelse", "finalbody", "handlers", "cases")
+
+    def __init__(self) -> None:
+        # The names of all the modules imported, e.g. `from flask import Flask` -> ["flask"]
+        self.imports: list[str] = []
+
+        # The names bound by imports mapped to the qualified names they refer to, e.g:
+        # import flask -> {"flask": "flask"}
+        # import flask as f -> {"f": "flask"}
+        # from flask import Flask as F -> {"F": "flask.Flask"}
+        self.import_aliases: dict[str, str] = {}
+
+        # Names assigned the result of a call, along with the call, e.g. `app = Flask(__name__)` -> [("app", <Call>)]
+        self.call_assignments: list[tuple[str, ast.Call]] = []
+
+        # Calls used as function decorators, e.g. `@app.route("/")` -> [<Call>]
+        self.decorator_calls: list[ast.Call] = []
+
+        # Calls made as a statement in their own right, e.g. `app.register_blueprint(blueprint)` -> [<Call>]
+        self.statement_calls: list[ast.Call] = []
+
+    @classmethod
+    def get_visitor(cls, node_type: type[ast.AST]) -> Callable[["ModuleVisitor", ast.AST], None] | None:
+        # ast.NodeVisitor.visit looks up the visitor method by name for every node, so they're cached by node type
+        # instead. Statements with no visitor method and no nested statements (e.g. `return`) get None so they can be
+        # skipped without making a call at all.
+        visitor_cache_key = (cls, node_type)
+        if visitor_cache_key not in VISITOR_CACHE:
+            visitor = getattr(cls, f"visit_{node_type.__name__}", None)
+            if visitor is None and any(field in cls.STATEMENT_LIST_FIELDS for field in node_type._fields):
+                visitor = cls.generic_visit
+            VISITOR_CACHE[visitor_cache_key] = visitor
+        return VISITOR_CACHE[visitor_cache_key]
+
+    def visit(self, node: ast.AST):
+        visitor = self.get_visitor(type(node))
+        if visitor is not None:
+            visitor(self, node)
+
+    def generic_visit(self, node: ast.AST):
+        cls = type(self)
+        statement_list_fields = STATEMENT_LIST_FIELDS_CACHE.get(type(node))
+        if statement_list_fields is None:
+            statement_list_fields = tuple(field for field in self.STATEMENT_LIST_FIELDS if field in node._fields)
+            STATEMENT_LIST_FIELDS_CACHE[type(node)] = statement_list_fields
+
+        for field in statement_list_fields:
+            for child in getattr(node, field):
+                # This is the same as self.visit(child), inlined as it's called for every statement in the module
+                visitor = VISITOR_CACHE.get((cls, type(child)), MISSING_VISITOR)
+                if visitor is MISSING_VISITOR:
+                    visitor = self.get_visitor(type(child))
+                if visitor is not None:
+                    visitor(self, child)
+
+    def visit_Import(self, node: ast.Import):
+        for alias in node.names:
+            self.imports.append(alias.name)
+            if alias.asname is not None:
+                self.import_aliases[alias.asname] = alias.name
+            else:
+                # `import foo.bar` binds `foo`
+                top_level_name = alias.name.split(".")[0]
+                self.import_aliases[top_level_name] = top_level_name
+
+    def visit_ImportFrom(self, node: ast.ImportFrom):
+        # Relative imports, e.g. `from . import views`, have no module
+        if node.module is None:
+            return
+        self.imports.append(node.module)
+        for alias in node.names:
+            self.import_aliases[alias.asname or alias.name] = f"{node.module}.{alias.name}"
+
+    def visit_Assign(self, node: ast.Assign):
+        if type(node.value) != ast.Call:
+            return
+        # Chained assignments, e.g. `app = application = Flask(__name__)`, have multiple targets
+        for target in node.targets:
+            if type(target) == ast.Name:
+                self.call_assignments.append((target.id, node.value))
+
+    def visit_AnnAssign(self, node: ast.AnnAssign):
+        if type(node.value) == ast.Call and type(node.target) == ast.Name:
+            self.call_assignments.append((node.target.id, node.value))
+
+    def visit_Expr(self, node: ast.Expr):
+        if type(node.value) == ast.Call:
+            self.statement_calls.append(node.value)
+
+    def visit_FunctionDef(self, node: ast.FunctionDef | ast.AsyncFunctionDef):
+        for decorator in node.decorator_list:
+            if type(decorator) == ast.Call:
+                self.decorator_calls.append(decorator)
+        self.generic_visit(node)
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def get_qualified_name(self, node: ast.expr) -> str | None:
+        """Gets the qualified name an expression refers to, resolving any imported names, e.g. if the module contains
+        `import flask as f` then `f.Flask` -> "flask.Flask". Names which weren't imported are returned as-is.
+
+        Args:
+            node (ast.expr): The expression to get the qualified name of
+
+        Returns:
+            str | None: The qualified name, or None if the expression isn't a (dotted) name
+        """
+        if type(node) == ast.Name:
+            return self.import_aliases.get(node.id, node.id)
+
+        if type(node) == ast.Attribute:
+            qualified_value_name = self.get_qualified_name(node.value)
+            if qualified_value_name is None:
+                return None
+            return f"{qualified_value_name}.{node.attr}"
+
+        return None
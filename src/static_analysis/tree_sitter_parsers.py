@@ -0,0 +1,68 @@
+import threading
+
+from tree_sitter import Language, Parser, Tree
+
+# The shared library the tree-sitter grammars are built into by analysers/tree-sitter/build.py
+TREE_SITTER_LIBRARY_PATH = "/analysers/tree-sitter/languages.so"
+
+# The library each registered grammar is loaded from, by the name of the grammar's language in it
+TREE_SITTER_LANGUAGE_LIBRARIES: dict[str, str] = {}
+
+# Grammars are loaded from their library the first time a parser is needed for them. A Language is immutable once it's
+# loaded, so the same one is shared by every thread's parsers.
+TREE_SITTER_LANGUAGES: dict[str, Language] = {}
+
+# tree-sitter parsers aren't safe to use from several threads at once, so each thread gets its own parser for each
+# language, rather than sharing one behind a lock
+THREAD_LOCAL_PARSERS = threading.local()
+
+
+def register_language(language_name: str, library_path: str = TREE_SITTER_LIBRARY_PATH):
+    """Registers a tree-sitter grammar so parsers can be got for it. The grammar isn't loaded until one is.
+
+    Args:
+        language_name (str): The name of the grammar's language in the library, e.g. "javascript" or "tsx"
+        library_path (str, optional): The library the grammar is built into. Defaults to TREE_SITTER_LIBRARY_PATH.
+    """
+    TREE_SITTER_LANGUAGE_LIBRARIES[language_name] = library_path
+
+
+def get_language(language_name: str) -> Language:
+    if (language := TREE_SITTER_LANGUAGES.get(language_name)) is not None:
+        return language
+
+    if language_name not in TREE_SITTER_LANGUAGE_LIBRARIES:
+        raise ValueError(f"No tree-sitter grammar is registered for {language_name}")
+
+    # Two threads may both load the grammar, in which case the first one stored is used by both
+    language = Language(TREE_SITTER_LANGUAGE_LIBRARIES[language_name], language_name)
+    return TREE_SITTER_LANGUAGES.setdefault(language_name, language)
+
+
+def get_parser(language_name: str) -> Parser:
+    """Gets the calling thread's parser for a registered tree-sitter grammar, creating it if the thread doesn't have one
+
+    Args:
+        language_name (str): The name of the grammar's language, e.g. "javascript"
+
+    Returns:
+        Parser: A parser which only the calling thread uses
+    """
+    parsers: dict[str, Parser] | None = getattr(THREAD_LOCAL_PARSERS, "parsers", None)
+    if parsers is None:
+        parsers = THREAD_LOCAL_PARSERS.parsers = {}
+
+    if (parser := parsers.get(language_name)) is None:
+        parser = parsers[language_name] = Parser()
+        parser.set_language(get_language(language_name))
+
+    return parser
+
+
+def parse(language_name: str, source: bytes) -> Tree:
+    return get_parser(language_name).parse(source)
+
+
+# The grammars built by analysers/tree-sitter/build.py
+for language_name in ["javascript", "typescript", "tsx", "python"]:
+    register_language(language_name)
@@ -0,0 +1,183 @@
+import json
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Iterator
+
+from env import TRACE_MAX_EVENTS, TRACE_PATH, TRACE_SAMPLE_RATE  # type: ignore
+from upload_state import write_file_atomically
+from utils import logger
+
+
+@dataclass
+class Span:
+    name: str
+    category: str
+    sampled: bool
+    attributes: dict[str, Any] = field(default_factory=dict)
+
+    def set_attribute(self, key: str, value: Any):
+        if self.sampled:
+            self.attributes[key] = value
+
+
+# The span everything beneath an unsampled span is given, so none of it is recorded
+UNSAMPLED_SPAN = Span("", "", False)
+
+# The span the code running is in, which new spans are children of. Context variables aren't inherited by other threads,
+# so spans started in them, e.g. by uploads, have to be given their parent.
+CURRENT_SPAN: ContextVar[Span | None] = ContextVar("CURRENT_SPAN", default=None)
+
+
+class Tracer:
+    """Records spans as Chrome trace events, which can be viewed in chrome://tracing, Perfetto or speedscope. Whether a
+    trace is recorded is decided when its root span starts, e.g. a repository's scan, so sampling never records part of
+    a trace. At most max_events spans are recorded, so a long scan can't exhaust memory.
+    """
+
+    def __init__(self, sample_rate: float = TRACE_SAMPLE_RATE, max_events: int = TRACE_MAX_EVENTS):
+        self.sample_rate = sample_rate
+        self.max_events = max_events
+        self.lock = threading.Lock()
+        self.events: list[dict] = []
+        self.events_dropped = 0
+
+    def should_sample(self) -> bool:
+        return random.random() < self.sample_rate
+
+    def add_event(
+        self,
+        span: Span,
+        start_time_us: int,
+        duration_us: int,
+        pid: int | None = None,
+        tid: int | None = None,
+    ):
+        event = {
+            "name": span.name,
+            "cat": span.category,
+            "ph": "X",
+            "ts": start_time_us,
+            "dur": duration_us,
+            "pid": pid if pid is not None else os.getpid(),
+            "tid": tid if tid is not None else threading.get_native_id(),
+            "args": span.attributes,
+        }
+        with self.lock:
+            if len(self.events) >= self.max_events:
+                self.events_dropped += 1
+                return
+            self.events.append(event)
+
+    def write(self, path: str):
+        with self.lock:
+            trace = {
+                "traceEvents": self.events,
+                "displayTimeUnit": "ms",
+                "otherData": {"events_dropped": self.events_dropped, "sample_rate": self.sample_rate},
+            }
+            trace_json = json.dumps(trace, default=str)
+        try:
+            write_file_atomically(path, trace_json)
+        except OSError as exception:
+            logger.warning(f"Failed to write trace to {path}, exception raised: {exception}")
+            return
+        logger.info(f"Wrote {len(trace['traceEvents'])} trace event(s) to {path}")
+
+
+# The tracer of the scan in progress, if tracing is enabled
+TRACER: Tracer | None = None
+
+
+def get_current_span() -> Span | None:
+    return CURRENT_SPAN.get()
+
+
+def set_span_attribute(key: str, value: Any):
+    """Sets an attribute of the current span, if it's being recorded"""
+    current_span = CURRENT_SPAN.get()
+    if current_span is not None:
+        current_span.set_attribute(key, value)
+
+
+@contextmanager
+def span(name: str, category: str = "scan", parent: Span | None = None, **attributes) -> Iterator[Span]:
+    """Records its body as a span, as a child of the current span, or of parent if it's given
+
+    Args:
+        name (str): The name of the span
+        category (str, optional): The category of the span, which trace viewers can filter by. Defaults to "scan".
+        parent (Span | None, optional): The parent of the span, e.g. when the span is started in another thread than
+        its parent. Defaults to None, in which case it's the current span.
+
+    Yields:
+        Iterator[Span]: The span, whose attributes can be set. If it isn't being recorded, setting them does nothing.
+    """
+    tracer = TRACER
+    if parent is None:
+        parent = CURRENT_SPAN.get()
+
+    # When tracing is disabled, or the trace isn't sampled, this is all a span costs
+    if tracer is None or (parent is not None and not parent.sampled):
+        yield UNSAMPLED_SPAN
+        return
+
+    if parent is None and not tracer.should_sample():
+        token = CURRENT_SPAN.set(UNSAMPLED_SPAN)
+        try:
+            yield UNSAMPLED_SPAN
+        finally:
+            CURRENT_SPAN.reset(token)
+        return
+
+    new_span = Span(name, category, True, attributes)
+    token = CURRENT_SPAN.set(new_span)
+    start_time_ns = time.time_ns()
+    try:
+        yield new_span
+    finally:
+        CURRENT_SPAN.reset(token)
+        tracer.add_event(new_span, start_time_ns // 1000, (time.time_ns() - start_time_ns) // 1000)
+
+
+def add_span(name: str, category: str, start_time: float, seconds: float, pid: int | None = None, **attributes):
+    """Records a span which has already completed, e.g. in an analyser worker process, as a child of the current span
+
+    Args:
+        name (str): The name of the span
+        category (str): The category of the span
+        start_time (float): When the span started, as a Unix timestamp
+        seconds (float): How long the span took
+        pid (int | None, optional): The process the span ran in. Defaults to None, in which case it's this process.
+    """
+    tracer = TRACER
+    current_span = CURRENT_SPAN.get()
+    if tracer is None or current_span is None or not current_span.sampled:
+        return
+    tracer.add_event(Span(name, category, True, attributes), int(start_time * 1_000_000), int(seconds * 1_000_000), pid)
+
+
+@contextmanager
+def tracing(path: str | None = TRACE_PATH, sample_rate: float = TRACE_SAMPLE_RATE) -> Iterator[None]:
+    """Traces the scans run in its body, writing the trace to a file once they've completed, if a path is given
+
+    Args:
+        path (str | None, optional): The file to write the trace to. Defaults to TRACE_PATH, or if None or empty
+        nothing is traced.
+        sample_rate (float, optional): The fraction of traces to record. Defaults to TRACE_SAMPLE_RATE.
+    """
+    global TRACER
+    if not path:
+        yield
+        return
+
+    TRACER = Tracer(sample_rate)
+    try:
+        yield
+    finally:
+        tracer, TRACER = TRACER, None
+        tracer.write(path)
@@ -0,0 +1,161 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+from openapi.canonical import get_canonical_json
+from utils import logger
+
+# Incremented whenever the structure of the record changes, so records written by older versions are discarded
+UPLOAD_STATE_FORMAT_VERSION = 1
+
+
+def write_file_atomically(path: str, contents: str):
+    # The contents are written to a temporary file which then replaces the file, so a scan which dies mid-write can't
+    # leave a corrupt file behind
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    file_descriptor, temporary_path = tempfile.mkstemp(dir=directory)
+    try:
+        with os.fdopen(file_descriptor, "w", encoding="utf-8") as temporary_file:
+            temporary_file.write(contents)
+        os.replace(temporary_path, path)
+    except OSError:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+        raise
+
+
+class UploadStateStore:
+    """A local record of the canonical hash of each OpenAPI spec last accepted by FireTail, by repository and source, so
+    specs which haven't changed since they were last uploaded can be skipped. The UUID of each repository's API is
+    recorded too: if FireTail gives a repository a different UUID, the API was recreated, and all of its specs are
+    uploaded again.
+
+    Large specs can be kept too, in a directory alongside the record, so the next version of them can be uploaded as a
+    patch against the last version FireTail accepted.
+    """
+
+    def __init__(self, path: str | None, ttl_seconds: float, keep_specs_min_bytes: int | None = None):
+        """
+        Args:
+            path (str | None): The JSON file the record is kept in. If None or empty, nothing is recorded, so every spec
+            is uploaded.
+            ttl_seconds (float): How long after it was last uploaded an unchanged spec is uploaded again anyway
+            keep_specs_min_bytes (int | None, optional): How large the canonical JSON of a spec has to be for it to be
+            kept. Defaults to None, in which case no specs are kept.
+        """
+        self.path = path if path else None
+        self.ttl_seconds = ttl_seconds
+        self.keep_specs_min_bytes = keep_specs_min_bytes
+        self.repositories: dict[str, dict] | None = None
+
+    def get_repositories(self) -> dict[str, dict]:
+        # The record is loaded the first time it's needed, so scans which discover no specs never read it
+        if self.repositories is not None:
+            return self.repositories
+
+        self.repositories = {}
+        if self.path is None or not os.path.exists(self.path):
+            return self.repositories
+
+        try:
+            with open(self.path, "r") as upload_state_file:
+                upload_state = json.load(upload_state_file)
+        except (OSError, ValueError) as exception:
+            logger.warning(f"Failed to load upload state from {self.path}, exception raised: {exception}")
+            return self.repositories
+
+        if type(upload_state) == dict and upload_state.get("version") == UPLOAD_STATE_FORMAT_VERSION:
+            self.repositories = upload_state.get("repositories", {})
+
+        return self.repositories
+
+    def get_api_uuid(self, repository_full_name: str) -> str | None:
+        return self.get_repositories().get(repository_full_name, {}).get("api_uuid")
+
+    def set_api_uuid(self, repository_full_name: str, api_uuid: str):
+        if self.path is None or self.get_api_uuid(repository_full_name) == api_uuid:
+            return
+        self.get_repositories()[repository_full_name] = {"api_uuid": api_uuid, "specs": {}}
+
+    def is_unchanged(self, repository_full_name: str, source: str, spec_hash: str) -> bool:
+        """Checks if a spec was accepted by FireTail with the same hash within the last ttl_seconds
+
+        Args:
+            repository_full_name (str): The full name of the repository the spec was discovered in
+            source (str): The source of the spec, e.g. its path
+            spec_hash (str): The canonical hash of the spec
+
+        Returns:
+            bool: True if the spec doesn't need to be uploaded again
+        """
+        spec_state = self.get_repositories().get(repository_full_name, {}).get("specs", {}).get(source)
+        if spec_state is None or spec_state["hash"] != spec_hash:
+            return False
+        return time.time() - spec_state["uploaded_at"] < self.ttl_seconds
+
+    def record_upload(self, repository_full_name: str, source: str, spec_hash: str, openapi_spec: dict | None = None):
+        """Records that FireTail accepted a spec, keeping the spec itself if it's at least keep_specs_min_bytes large
+
+        Args:
+            repository_full_name (str): The full name of the repository the spec was discovered in
+            source (str): The source of the spec
+            spec_hash (str): The canonical hash of the spec
+            openapi_spec (dict | None, optional): The spec, to be kept. Defaults to None.
+        """
+        if self.path is None or repository_full_name not in self.get_repositories():
+            return
+        self.get_repositories()[repository_full_name]["specs"][source] = {"hash": spec_hash, "uploaded_at": time.time()}
+
+        if openapi_spec is None or self.keep_specs_min_bytes is None:
+            return
+        canonical_spec_json = get_canonical_json(openapi_spec)
+        if len(canonical_spec_json) < self.keep_specs_min_bytes:
+            return
+        try:
+            write_file_atomically(self.get_spec_path(repository_full_name, source), canonical_spec_json)
+        except OSError as exception:
+            logger.warning(f"Failed to keep {source} from {repository_full_name}, exception raised: {exception}")
+
+    def get_spec_path(self, repository_full_name: str, source: str) -> str:
+        file_name = hashlib.sha256(f"{repository_full_name}\0{source}".encode("utf-8")).hexdigest()
+        return os.path.join(f"{os.path.splitext(self.path or '')[0]}-specs", f"{file_name}.json")
+
+    def get_last_uploaded_spec(self, repository_full_name: str, source: str) -> tuple[str, dict] | None:
+        """Gets the last version of a spec FireTail accepted, if it was kept
+
+        Args:
+            repository_full_name (str): The full name of the repository the spec was discovered in
+            source (str): The source of the spec
+
+        Returns:
+            tuple[str, dict] | None: The canonical hash of the spec and the spec, or None if it wasn't kept
+        """
+        spec_state = self.get_repositories().get(repository_full_name, {}).get("specs", {}).get(source)
+        if self.path is None or spec_state is None:
+            return None
+
+        try:
+            with open(self.get_spec_path(repository_full_name, source), "r", encoding="utf-8") as spec_file:
+                canonical_spec_json = spec_file.read()
+        except OSError:
+            return None
+
+        # A kept spec is only usable if it's the version FireTail last accepted
+        if hashlib.sha256(canonical_spec_json.encode("utf-8")).hexdigest() != spec_state["hash"]:
+            return None
+
+        return spec_state["hash"], json.loads(canonical_spec_json)
+
+    def save(self):
+        if self.path is None or self.repositories is None:
+            return
+
+        try:
+            write_file_atomically(
+                self.path, json.dumps({"version": UPLOAD_STATE_FORMAT_VERSION, "repositories": self.repositories})
+            )
+        except OSError as exception:
+            logger.warning(f"Failed to save upload state to {self.path}, exception raised: {exception}")
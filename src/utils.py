@@ -1,12 +1,17 @@
 import datetime
 import logging
+import signal
+import threading
 import time
-from typing import Callable, TypeVar
+from contextlib import contextmanager
+from types import FrameType
+from typing import Any, Callable, Iterator, TypeVar
 
 import github
 from github import Github as GithubClient
 
 from env import LOGGING_LEVEL
+from metrics import increment, observe_stage
 
 logger = logging.Logger(name="Firetail GitHub Scanner", level=LOGGING_LEVEL)
 logger_handler = logging.StreamHandler()
@@ -16,20 +21,92 @@ logger.addHandler(logger_handler)
 FuncReturnType = TypeVar("FuncReturnType")
 
 
-def get_datestamp() -> str:
-    return datetime.datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
-
-
 def respect_rate_limit(func: Callable[[], FuncReturnType], github_client: GithubClient) -> FuncReturnType:
     while True:
         try:
             return func()
 
         except github.RateLimitExceededException:
-            sleep_duration = (github_client.get_rate_limit().core.reset - datetime.datetime.utcnow()).seconds + 1
+            # The reset may already have passed, in which case the timedelta until it is negative, and its seconds would
+            # be most of a day
+            reset_at = github_client.get_rate_limit().core.reset
+            sleep_duration = max(0, int((reset_at - datetime.datetime.utcnow()).total_seconds())) + 1
             logger.warning(
                 f"Rate limited calling {func}, core rate limit resets at "
-                f"{github_client.get_rate_limit().core.reset.astimezone(datetime.timezone.utc).isoformat()}, "
+                f"{reset_at.astimezone(datetime.timezone.utc).isoformat()}, "
                 f"waiting {sleep_duration} second(s)..."
             )
-            time.sleep(sleep_duration)
+            increment("github_rate_limited")
+            # Waiting for the rate limit to reset shouldn't count towards the time limit of whatever's being scanned
+            with pause_time_limits():
+                time.sleep(sleep_duration)
+            observe_stage("rate_limit_sleep", sleep_duration)
+
+
+class TimeLimitExceeded(Exception):
+    pass
+
+
+class TimeLimit:
+    """A context manager which aborts its body if it takes longer than a time limit, by raising TimeLimitExceeded from
+    a SIGALRM handler. The exception is suppressed when it leaves the body, and whether the limit was exceeded is
+    recorded on the context manager, e.g:
+
+    with TimeLimit(30) as time_limit:
+        analyse(file)
+    if time_limit.exceeded:
+        logger.warning("Analysis timed out")
+
+    This means timeouts are still detected when the body catches all exceptions. Signals are only handled between
+    Python bytecodes, so calls into native code (e.g. the Golang analyser, tree-sitter or libyaml) can't be interrupted
+    until they return. SIGALRM can only be used in the main thread on Unix, so elsewhere the limit isn't enforced.
+    """
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.exceeded = False
+        self.active = False
+        self.previous_handler: Callable[[int, FrameType | None], Any] | int | None = None
+
+    def handle_alarm(self, signum, frame):
+        if self.active:
+            self.exceeded = True
+            raise TimeLimitExceeded(f"Exceeded time limit of {self.seconds} second(s)")
+
+    def __enter__(self) -> "TimeLimit":
+        if self.seconds > 0 and can_use_sigalrm():
+            self.active = True
+            self.previous_handler = signal.signal(signal.SIGALRM, self.handle_alarm)
+            signal.setitimer(signal.ITIMER_REAL, self.seconds)
+        return self
+
+    def __exit__(self, exception_type, exception, traceback) -> bool:
+        if self.active:
+            self.active = False
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            # The previous handler is None if it wasn't installed from Python, in which case the default is restored
+            signal.signal(
+                signal.SIGALRM, self.previous_handler if self.previous_handler is not None else signal.SIG_DFL
+            )
+        return exception_type is TimeLimitExceeded
+
+
+def can_use_sigalrm() -> bool:
+    return hasattr(signal, "SIGALRM") and threading.current_thread() is threading.main_thread()
+
+
+@contextmanager
+def pause_time_limits() -> Iterator[None]:
+    """Pauses any running TimeLimit for the duration of its body, e.g. so time spent fetching a file, or waiting for the
+    rate limit to reset, doesn't count towards the time limit for analysing it
+    """
+    if not can_use_sigalrm():
+        yield
+        return
+
+    remaining_seconds, _ = signal.setitimer(signal.ITIMER_REAL, 0)
+    try:
+        yield
+    finally:
+        if remaining_seconds > 0:
+            signal.setitimer(signal.ITIMER_REAL, remaining_seconds)
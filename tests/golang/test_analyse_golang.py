@@ -1,4 +1,12 @@
+import io
+import tarfile
+
 from static_analysis import analyse_golang
+from static_analysis.golang.analyse_golang import (
+    analyse_golang_archive,
+    analyse_golang_directory,
+    analyse_golang_files,
+)
 
 
 def test_analyse_net_http_hello_world():
@@ -30,3 +38,45 @@ def test_analyse_malformed_go_file():
 
     assert detected_frameworks == set()
     assert appspecs == {}
+
+
+def test_analyse_golang_files():
+    file_path = "tests/golang/example_apps/net_http_hello_world.go"
+    file_contents = open(file_path, "r").read()
+
+    detected_frameworks, appspecs = analyse_golang_files(
+        {
+            file_path: lambda: file_contents,
+            "tests/golang/example_apps/malformed.go": lambda: '{"Oh no": "This is\'nt golang, i\'s JSON!"}',
+            "tests/golang/example_apps/not_golang.py": lambda: "import flask",
+        }
+    )
+
+    assert detected_frameworks == {"net/http"}
+    assert list(appspecs.keys()) == ["static-analysis:net/http:tests/golang/example_apps/net_http_hello_world.go"]
+
+
+def test_analyse_golang_files_empty():
+    assert analyse_golang_files({}) == (set(), {})
+
+
+def test_analyse_golang_directory():
+    detected_frameworks, appspecs = analyse_golang_directory("tests/golang/example_apps")
+
+    assert detected_frameworks == {"net/http"}
+    assert list(appspecs.keys()) == ["static-analysis:net/http:net_http_hello_world.go"]
+
+
+def test_analyse_golang_archive():
+    archive = io.BytesIO()
+    with tarfile.open(fileobj=archive, mode="w:gz") as tar:
+        tar.add("tests/golang/example_apps", arcname="owner-repo-abc123")
+
+    detected_frameworks, appspecs = analyse_golang_archive(archive.getvalue(), strip_components=1)
+
+    assert detected_frameworks == {"net/http"}
+    assert list(appspecs.keys()) == ["static-analysis:net/http:net_http_hello_world.go"]
+
+
+def test_analyse_golang_archive_malformed():
+    assert analyse_golang_archive(b"Oh no, this isn't a tar archive!") == (set(), {})
@@ -1,4 +1,3 @@
-import datetime
 import pytest
 import yaml
 
@@ -9,16 +8,7 @@ from static_analysis.javascript.analyse_express import (
     get_paths_and_methods,
     get_router_identifiers,
 )
-from static_analysis.javascript.analyse_javascript import JS_PARSER
-
-
-@pytest.fixture(autouse=True)
-def patch_datetime_now(monkeypatch):
-    class PatchedDatetime(datetime.datetime):
-        def utcnow():
-            return datetime.datetime(2000, 1, 1)
-
-    monkeypatch.setattr(datetime, "datetime", PatchedDatetime)
+from static_analysis.tree_sitter_parsers import parse
 
 
 @pytest.mark.parametrize(
@@ -57,7 +47,7 @@ def patch_datetime_now(monkeypatch):
     ],
 )
 def test_get_express_identifiers(test_import, expected_identifiers):
-    parsed_module = JS_PARSER.parse(test_import.encode("utf-8"))
+    parsed_module = parse("javascript", test_import.encode("utf-8"))
 
     detected_identifiers = get_express_identifiers(parsed_module)
 
@@ -86,7 +76,7 @@ def test_get_express_identifiers(test_import, expected_identifiers):
     ],
 )
 def test_get_app_identifiers(test_app, express_identifiers, expected_app_identifiers):
-    parsed_module = JS_PARSER.parse(test_app.encode("utf-8"))
+    parsed_module = parse("javascript", test_app.encode("utf-8"))
 
     detected_app_identifiers = get_app_identifiers(parsed_module, express_identifiers)
 
@@ -115,7 +105,7 @@ def test_get_app_identifiers(test_app, express_identifiers, expected_app_identif
     ],
 )
 def test_get_router_identifiers(test_app, router_identifiers, expected_router_identifiers):
-    parsed_module = JS_PARSER.parse(test_app.encode("utf-8"))
+    parsed_module = parse("javascript", test_app.encode("utf-8"))
 
     detected_app_identifiers = get_router_identifiers(parsed_module, router_identifiers)
 
@@ -150,7 +140,7 @@ def test_get_paths_and_methods(test_app_filename, app_and_router_identifiers, ex
     file_contents = file.read()
     file.close()
 
-    parsed_module = JS_PARSER.parse(file_contents.encode("utf-8"))
+    parsed_module = parse("javascript", file_contents.encode("utf-8"))
 
     detected_paths = get_paths_and_methods(parsed_module, app_and_router_identifiers)
 
@@ -187,7 +177,7 @@ def test_analyse_express(test_app_filename, expected_appspec_filename):
     expected_appspec = yaml.load(file.read(), Loader=yaml.Loader)
     file.close()
 
-    parsed_module = JS_PARSER.parse(app_file_contents.encode("utf-8"))
+    parsed_module = parse("javascript", app_file_contents.encode("utf-8"))
 
     appspec = analyse_express(parsed_module)
 
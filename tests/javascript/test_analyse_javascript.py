@@ -1,22 +1,11 @@
-import datetime
-
 import pytest
 import yaml
 
 from static_analysis.javascript.analyse_javascript import (
-    JS_PARSER,
     analyse_javascript,
     get_imports,
 )
-
-
-@pytest.fixture(autouse=True)
-def patch_datetime_now(monkeypatch):
-    class PatchedDatetime(datetime.datetime):
-        def utcnow():
-            return datetime.datetime(2000, 1, 1)
-
-    monkeypatch.setattr(datetime, "datetime", PatchedDatetime)
+from static_analysis.tree_sitter_parsers import parse
 
 
 @pytest.mark.parametrize(
@@ -40,7 +29,7 @@ def patch_datetime_now(monkeypatch):
     ],
 )
 def test_get_imports(test_import, expected_imports):
-    parsed_module = JS_PARSER.parse(test_import.encode("utf-8"))
+    parsed_module = parse("javascript", test_import.encode("utf-8"))
 
     detected_identifiers = get_imports(parsed_module)
 
@@ -77,7 +66,7 @@ def test_get_imports(test_import, expected_imports):
     ],
 )
 def test_analyse_javascript(
-    test_app_filename, expected_detected_frameworks, expected_appspec_key, expected_appspec_filename, patch_datetime_now
+    test_app_filename, expected_detected_frameworks, expected_appspec_key, expected_appspec_filename
 ):
     file = open(test_app_filename, "r")
     test_app_file_contents = file.read()
@@ -0,0 +1,34 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from static_analysis.javascript.analyse_javascript import get_imports
+from static_analysis.tree_sitter_parsers import get_parser, parse
+
+
+def test_get_parser_per_thread():
+    parser = get_parser("javascript")
+    assert get_parser("javascript") is parser
+
+    other_thread_parsers = []
+    thread = threading.Thread(target=lambda: other_thread_parsers.append(get_parser("javascript")))
+    thread.start()
+    thread.join()
+
+    assert other_thread_parsers[0] is not parser
+    assert other_thread_parsers[0].parse(b"const foo = 1;").root_node.type == "program"
+
+
+def test_get_parser_unregistered_language():
+    with pytest.raises(ValueError):
+        get_parser("cobol")
+
+
+def test_parse_from_many_threads():
+    modules = [f"const module_{i} = require('module_{i}');\n" * 50 for i in range(64)]
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        imports = list(executor.map(lambda module: get_imports(parse("javascript", module.encode("utf-8"))), modules))
+
+    assert imports == [{f"module_{i}"} for i in range(64)]
@@ -0,0 +1,31 @@
+from openapi.canonical import get_canonical_hash, get_static_analysis_paths, get_static_analysis_version
+
+
+def test_canonical_hash_ignores_key_order():
+    assert get_canonical_hash({"openapi": "3.0.0", "paths": {"/a": {}, "/b": {}}}) == get_canonical_hash(
+        {"paths": {"/b": {}, "/a": {}}, "openapi": "3.0.0"}
+    )
+    assert get_canonical_hash({"paths": {"/a": {}}}) != get_canonical_hash({"paths": {"/b": {}}})
+
+
+def test_canonical_hash_of_mixed_key_types():
+    # Response codes parsed from YAML are ints, which JSON serialises the same as the equivalent strings
+    assert get_canonical_hash({"responses": {200: {}, "default": {}}}) == get_canonical_hash(
+        {"responses": {"default": {}, "200": {}}}
+    )
+
+
+def test_static_analysis_paths_are_ordered():
+    paths = get_static_analysis_paths({"/b": {"post", "get"}, "/a": ["put", "delete"]})
+
+    assert list(paths) == ["/a", "/b"]
+    assert list(paths["/a"]) == ["delete", "put"]
+    assert list(paths["/b"]) == ["get", "post"]
+
+
+def test_static_analysis_version():
+    version = get_static_analysis_version(get_static_analysis_paths({"/": {"get"}}))
+
+    assert len(version) == 12
+    assert version == get_static_analysis_version(get_static_analysis_paths({"/": ["get"]}))
+    assert version != get_static_analysis_version(get_static_analysis_paths({"/": {"get", "post"}}))
@@ -0,0 +1,59 @@
+import json
+import sys
+
+import pytest
+
+from openapi.json_patch import apply_json_patch, get_json_patch
+
+
+@pytest.mark.parametrize(
+    "source,target",
+    [
+        ({}, {}),
+        ({"a": 1}, {"a": 1}),
+        ({"a": 1}, {"a": 2}),
+        ({"a": 1}, {"b": 1}),
+        ({"a": {"b": {"c": [1, 2, 3]}}}, {"a": {"b": {"c": [1, 2]}}}),
+        ({"a": [1, 2]}, {"a": [1, 2, 3, 4]}),
+        ({"a": [{"b": 1}, {"c": 2}]}, {"a": [{"b": 2}, {"c": 2, "d": 3}]}),
+        ({"a": [1, 2, 3]}, {"a": {"0": 1}}),
+        ({"a": True}, {"a": 1}),
+        ({"a": None}, {"a": 0}),
+        ({"a/b": 1, "c~d": 2}, {"a/b": 2, "c~d": {"e": 3}}),
+        ({"paths": {"/notes": {"get": {}}}}, {"paths": {"/notes": {"get": {}, "post": {}}, "/notes/{id}": {}}}),
+        ([1, 2], {"a": 1}),
+        ("a", "b"),
+    ],
+)
+def test_json_patch_round_trip(source, target):
+    patch = get_json_patch(source, target)
+
+    assert apply_json_patch(source, patch) == target
+    assert (len(patch) == 0) == (json.dumps(source) == json.dumps(target))
+
+
+def test_json_patch_is_minimal_for_objects():
+    source = {"paths": {f"/path_{i}": {"get": {"summary": f"Path {i}"}} for i in range(1000)}}
+    target = {"paths": {**source["paths"], "/path_500": {"get": {"summary": "Changed"}}}}
+
+    assert get_json_patch(source, target) == [
+        {"op": "replace", "path": "/paths/~1path_500/get/summary", "value": "Changed"}
+    ]
+
+
+def test_json_patch_deep_document():
+    # Deeper than the recursion limit, so the documents can't be diffed recursively
+    source: dict = {}
+    target: dict = {}
+    source_node, target_node = source, target
+    for _ in range(sys.getrecursionlimit() + 1):
+        source_node["child"] = {}
+        target_node["child"] = {}
+        source_node, target_node = source_node["child"], target_node["child"]
+    target_node["leaf"] = True
+
+    patch = get_json_patch(source, target)
+
+    assert len(patch) == 1
+    assert patch[0]["op"] == "add"
+    assert patch[0]["path"].endswith("/child/leaf")
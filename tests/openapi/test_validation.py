@@ -0,0 +1,302 @@
+import json
+
+import pytest
+import yaml
+
+import openapi.validation
+from openapi.file_index import RepositoryFileIndex
+from openapi.validation import (
+    dereference_json_schema,
+    is_openapi_spec_candidate,
+    parse_resolve_and_validate_openapi_spec,
+    resolve_and_validate_openapi_spec,
+)
+
+MOCK_OPENAPI_SPEC = {
+    "openapi": "3.0.0",
+    "info": {"title": "Mock API", "version": "1.0.0"},
+    "paths": {
+        "/notes": {
+            "get": {
+                "responses": {
+                    "200": {
+                        "description": "Some notes",
+                        "content": {"application/json": {"schema": {"$ref": "#/components/schemas/Notes"}}},
+                    }
+                }
+            }
+        }
+    },
+    "components": {
+        "schemas": {
+            "Note": {"type": "string"},
+            "Notes": {"type": "array", "items": {"$ref": "#/components/schemas/Note"}},
+        }
+    },
+}
+
+MOCK_SWAGGER_SPEC = {
+    "swagger": "2.0",
+    "info": {"title": "Mock API", "version": "1.0.0"},
+    "paths": {"/notes": {"get": {"responses": {"200": {"description": "Some notes"}}}}},
+}
+
+MOCK_OPENAPI_31_SPEC = {
+    "openapi": "3.1.0",
+    "info": {"title": "Mock API", "version": "1.0.0"},
+    "paths": {"/notes": {"get": {"responses": {"200": {"description": "Some notes"}}}}},
+}
+
+
+@pytest.mark.parametrize("structure_only", [False, True])
+@pytest.mark.parametrize(
+    "file_path,file_contents",
+    [
+        ("openapi.json", json.dumps(MOCK_OPENAPI_SPEC)),
+        ("openapi.yaml", yaml.dump(MOCK_OPENAPI_SPEC)),
+        ("openapi.yml", yaml.dump(MOCK_OPENAPI_SPEC)),
+    ],
+)
+def test_parse_resolve_and_validate_openapi_spec(file_path, file_contents, structure_only):
+    openapi_spec = parse_resolve_and_validate_openapi_spec(file_path, lambda: file_contents, structure_only)
+
+    assert openapi_spec is not None
+    assert openapi_spec["paths"]["/notes"]["get"]["responses"]["200"]["content"]["application/json"]["schema"] == {
+        "type": "array",
+        "items": {"type": "string"},
+    }
+
+
+@pytest.mark.parametrize("structure_only", [False, True])
+@pytest.mark.parametrize("openapi_spec", [MOCK_SWAGGER_SPEC, MOCK_OPENAPI_31_SPEC])
+def test_resolve_and_validate_other_openapi_versions(openapi_spec, structure_only):
+    assert resolve_and_validate_openapi_spec(json.loads(json.dumps(openapi_spec)), structure_only) == openapi_spec
+
+
+def test_structure_only_validation_skips_semantic_checks():
+    openapi_spec = {
+        **MOCK_OPENAPI_SPEC,
+        "paths": {
+            "/notes/{note_id}": {"get": {"operationId": "getNote", "responses": {"200": {"description": "A note"}}}},
+            "/notes": {"get": {"operationId": "getNote", "responses": {"200": {"description": "Some notes"}}}},
+        },
+    }
+
+    assert resolve_and_validate_openapi_spec(json.loads(json.dumps(openapi_spec))) is None
+    assert resolve_and_validate_openapi_spec(json.loads(json.dumps(openapi_spec)), structure_only=True) is not None
+
+
+def test_validation_results_cached(monkeypatch):
+    validated_specs = []
+
+    def patched_validate_openapi_spec(openapi_spec, openapi_version, structure_only):
+        validated_specs.append(openapi_spec)
+        return True
+
+    monkeypatch.setattr(openapi.validation, "VALIDATION_RESULTS", type(openapi.validation.VALIDATION_RESULTS)())
+    monkeypatch.setattr(openapi.validation, "validate_openapi_spec", patched_validate_openapi_spec)
+
+    for _ in range(2):
+        assert resolve_and_validate_openapi_spec(json.loads(json.dumps(MOCK_OPENAPI_SPEC))) is not None
+    assert len(validated_specs) == 1
+
+    # Specs validated only against their JSON schema are cached separately
+    assert resolve_and_validate_openapi_spec(json.loads(json.dumps(MOCK_OPENAPI_SPEC)), structure_only=True) is not None
+    assert len(validated_specs) == 2
+
+
+def test_dereference_json_schema():
+    json_schema = {
+        "type": "object",
+        "properties": {"$ref": {"type": "string"}, "tree": {"$ref": "#/definitions/Tree"}},
+        "definitions": {
+            "Tree": {
+                "type": "object",
+                "properties": {"children": {"type": "array", "items": {"$ref": "#/definitions/Tree"}}},
+            },
+        },
+        "additionalProperties": {"$ref": "http://json-schema.org/draft-04/schema#"},
+    }
+
+    dereferenced_json_schema = dereference_json_schema(json_schema)
+
+    assert dereferenced_json_schema["properties"]["$ref"] == {"type": "string"}
+    tree = dereferenced_json_schema["properties"]["tree"]
+    assert tree["type"] == "object"
+    assert tree["properties"]["children"]["items"] is tree
+    assert dereferenced_json_schema["additionalProperties"] == {"$ref": "http://json-schema.org/draft-04/schema#"}
+    assert json_schema["properties"]["tree"] == {"$ref": "#/definitions/Tree"}
+
+
+@pytest.mark.parametrize("structure_only", [False, True])
+@pytest.mark.parametrize(
+    "file_path,file_contents",
+    [
+        ("openapi.txt", json.dumps(MOCK_OPENAPI_SPEC)),
+        ("openapi.json", "{Oh no, this isn't JSON!"),
+        ("openapi.yaml", "Oh: no: this isn't YAML!"),
+        ("package.json", json.dumps({"name": "not-an-openapi-spec"})),
+        ("openapi.json", json.dumps(["not", "a", "dict"])),
+        ("openapi.json", json.dumps({**MOCK_OPENAPI_SPEC, "openapi": "4.0.0"})),
+        ("openapi.json", json.dumps({**MOCK_OPENAPI_SPEC, "openapi": 3})),
+        ("openapi.json", json.dumps({**MOCK_OPENAPI_SPEC, "openapi": "3.2.0"})),
+        ("openapi.json", json.dumps({**MOCK_OPENAPI_SPEC, "info": {}})),
+        ("openapi.json", json.dumps({**MOCK_OPENAPI_SPEC, "components": {}})),
+    ],
+)
+def test_parse_resolve_and_validate_invalid_openapi_spec(file_path, file_contents, structure_only):
+    assert parse_resolve_and_validate_openapi_spec(file_path, lambda: file_contents, structure_only) is None
+
+
+@pytest.mark.parametrize(
+    "file_path,file_contents,expected_is_candidate",
+    [
+        ("openapi.json", json.dumps(MOCK_OPENAPI_SPEC), True),
+        ("openapi.json", "﻿\n  " + json.dumps(MOCK_OPENAPI_SPEC, indent=2), True),
+        ("openapi.json", json.dumps(MOCK_OPENAPI_SPEC, sort_keys=True), True),
+        ("openapi.json", json.dumps({"components": {"padding": "x" * 10_000}, "swagger": "2.0"}), True),
+        ("openapi.yaml", yaml.dump(MOCK_OPENAPI_SPEC), True),
+        ("openapi.yaml", "# A comment\n---\n'openapi': 3.0.0\n", True),
+        ("openapi.yaml", json.dumps(MOCK_OPENAPI_SPEC), True),
+        ("openapi.yml", yaml.dump({"components": {"padding": "x" * 10_000}, "swagger": "2.0"}), True),
+        ("package-lock.json", json.dumps({"name": "foo", "lockfileVersion": 3, "packages": {}}), False),
+        ("translations.json", json.dumps({"openapi": "An OpenAPI spec!"}) + "\n", True),
+        ("list.json", json.dumps([MOCK_OPENAPI_SPEC]), False),
+        ("deployment.yaml", "apiVersion: apps/v1\nkind: Deployment\nmetadata:\n  name: openapi\n", False),
+        ("workflow.yml", "on: push\njobs:\n  build:\n    openapi: 3.0.0\n", False),
+        ("list.yaml", "- openapi: 3.0.0\n", False),
+    ],
+)
+def test_is_openapi_spec_candidate(file_path, file_contents, expected_is_candidate):
+    assert is_openapi_spec_candidate(file_path, file_contents) == expected_is_candidate
+
+
+MOCK_MULTI_FILE_OPENAPI_SPEC_FILES = {
+    "api/openapi.yaml": yaml.dump(
+        {
+            "openapi": "3.0.0",
+            "info": {"title": "Mock API", "version": "1.0.0"},
+            "paths": {
+                "/notes": {"$ref": "paths/notes.yaml"},
+                "/notes/{note_id}": {"$ref": "./paths/note.yaml#/note"},
+            },
+        }
+    ),
+    "api/paths/notes.yaml": yaml.dump(
+        {
+            "get": {
+                "responses": {
+                    "200": {
+                        "description": "Some notes",
+                        "content": {"application/json": {"schema": {"$ref": "../components/schemas.json#/Notes"}}},
+                    }
+                }
+            }
+        }
+    ),
+    "api/paths/note.yaml": yaml.dump(
+        {
+            "note": {
+                "get": {
+                    "parameters": [{"name": "note_id", "in": "path", "required": True, "schema": {"type": "string"}}],
+                    "responses": {
+                        "200": {
+                            "description": "A note",
+                            "content": {"application/json": {"schema": {"$ref": "../components/schemas.json#/Note"}}},
+                        }
+                    },
+                }
+            }
+        }
+    ),
+    "api/components/schemas.json": json.dumps(
+        {"Note": {"type": "string"}, "Notes": {"type": "array", "items": {"$ref": "#/Note"}}}
+    ),
+}
+
+
+def test_resolve_multi_file_openapi_spec():
+    files_fetched = []
+
+    def fetch_file_contents(file_path):
+        files_fetched.append(file_path)
+        return MOCK_MULTI_FILE_OPENAPI_SPEC_FILES.get(file_path)
+
+    file_index = RepositoryFileIndex(fetch_file_contents)
+    get_file_contents = file_index.add_file(
+        "api/openapi.yaml", lambda: MOCK_MULTI_FILE_OPENAPI_SPEC_FILES["api/openapi.yaml"]
+    )
+
+    openapi_spec = parse_resolve_and_validate_openapi_spec("api/openapi.yaml", get_file_contents, file_index=file_index)
+
+    assert openapi_spec is not None
+    assert openapi_spec["paths"]["/notes"]["get"]["responses"]["200"]["content"]["application/json"]["schema"] == {
+        "type": "array",
+        "items": {"type": "string"},
+    }
+    assert openapi_spec["paths"]["/notes/{note_id}"]["get"]["responses"]["200"]["content"]["application/json"][
+        "schema"
+    ] == {"type": "string"}
+    # The schemas are referenced three times but should only be fetched & parsed once
+    assert sorted(files_fetched) == ["api/components/schemas.json", "api/paths/note.yaml", "api/paths/notes.yaml"]
+    assert sorted(file_index.parsed_files) == sorted(files_fetched)
+
+
+def test_resolve_multi_file_openapi_spec_from_added_files():
+    file_index = RepositoryFileIndex()
+    for file_path, file_contents in MOCK_MULTI_FILE_OPENAPI_SPEC_FILES.items():
+        file_index.add_file(file_path, lambda file_contents=file_contents: file_contents)
+
+    openapi_spec = parse_resolve_and_validate_openapi_spec(
+        "api/openapi.yaml", lambda: MOCK_MULTI_FILE_OPENAPI_SPEC_FILES["api/openapi.yaml"], file_index=file_index
+    )
+
+    assert openapi_spec is not None
+    assert set(openapi_spec["paths"]) == {"/notes", "/notes/{note_id}"}
+
+
+def test_repository_file_index_only_indexes_referenceable_files():
+    def get_source_file_contents():
+        return "import flask"
+
+    file_index = RepositoryFileIndex()
+
+    assert file_index.add_file("app.py", get_source_file_contents) is get_source_file_contents
+    assert file_index.add_file("openapi.yaml", lambda: "openapi: 3.0.0")() == "openapi: 3.0.0"
+    assert list(file_index.file_contents_getters) == ["openapi.yaml"]
+    assert list(file_index.file_contents) == ["openapi.yaml"]
+
+
+@pytest.mark.parametrize(
+    "reference",
+    ["paths/missing.yaml", "../../etc/passwd", "/etc/passwd", "file:///etc/passwd", "paths/invalid.yaml"],
+)
+def test_resolve_multi_file_openapi_spec_unresolvable_reference(reference):
+    file_index = RepositoryFileIndex()
+    file_index.add_file("paths/invalid.yaml", lambda: "Oh: no: this isn't YAML!")
+    file_contents = json.dumps({**MOCK_OPENAPI_SPEC, "paths": {"/notes": {"$ref": reference}}})
+
+    assert parse_resolve_and_validate_openapi_spec("openapi.json", lambda: file_contents, file_index=file_index) is None
+
+
+def test_resolve_multi_file_openapi_spec_without_file_index():
+    # Without a file index, references to other files aren't resolved so the spec is left incomplete and invalid
+    assert (
+        parse_resolve_and_validate_openapi_spec(
+            "api/openapi.yaml", lambda: MOCK_MULTI_FILE_OPENAPI_SPEC_FILES["api/openapi.yaml"]
+        )
+        is None
+    )
+
+
+@pytest.mark.parametrize(
+    "url_path,expected_file_path",
+    [
+        ("/__repository__/openapi.yaml", "openapi.yaml"),
+        ("/__repository__/api/paths/../components/schemas.yaml", "api/components/schemas.yaml"),
+        ("/__repository__/../etc/passwd", None),
+        ("/etc/passwd", None),
+    ],
+)
+def test_repository_file_index_get_file_path(url_path, expected_file_path):
+    assert RepositoryFileIndex.get_file_path(url_path) == expected_file_path
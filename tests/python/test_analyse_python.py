@@ -1,17 +1,9 @@
-import datetime
+import ast
 
 import pytest
 
 from static_analysis import analyse_python
-
-
-@pytest.fixture(autouse=True)
-def patch_datetime_now(monkeypatch):
-    class PatchedDatetime(datetime.datetime):
-        def utcnow():
-            return datetime.datetime(2000, 1, 1)
-
-    monkeypatch.setattr(datetime, "datetime", PatchedDatetime)
+from static_analysis.python.analyse_python import get_leading_imports
 
 
 @pytest.mark.parametrize(
@@ -60,7 +52,7 @@ def test_analyse_flask_hello_world(test_file_contents):
     assert appspecs == {
         "static-analysis:flask:tests/python/example_apps/flask_hello_world.py": {
             "openapi": "3.0.0",
-            "info": {"title": "Static Analysis - Flask", "version": "2000-01-01 00:00:00"},
+            "info": {"title": "Static Analysis - Flask", "version": "935b44325ee4"},
             "paths": {"/": {"get": {"responses": {"default": {"description": "Discovered via static analysis"}}}}},
         }
     }
@@ -76,7 +68,7 @@ def test_analyse_flask_notes_app():
     assert appspecs == {
         "static-analysis:flask:tests/python/example_apps/flask_notes_app.py": {
             "openapi": "3.0.0",
-            "info": {"title": "Static Analysis - Flask", "version": "2000-01-01 00:00:00"},
+            "info": {"title": "Static Analysis - Flask", "version": "8b79d11d8b71"},
             "paths": {
                 "/": {"get": {"responses": {"default": {"description": "Discovered via static analysis"}}}},
                 "/new": {
@@ -93,3 +85,184 @@ def test_analyse_flask_notes_app():
             },
         }
     }
+
+
+def test_analyse_flask_app_factory_and_blueprints():
+    file_path = "tests/python/example_apps/flask_app_factory.py"
+    file_contents = """import flask
+from flask import Blueprint
+
+api = Blueprint("api", __name__, url_prefix="/api")
+admin = Blueprint("admin", __name__, url_prefix="/admin")
+
+@api.route("/notes", methods=("GET", "POST"))
+def notes():
+    return []
+
+@api.delete("/notes/<int:note_id>")
+def delete_note(note_id):
+    return ""
+
+@admin.get("/")
+def admin_index():
+    return ""
+
+def create_app():
+    app = flask.Flask(__name__)
+
+    @app.route("/health")
+    def health():
+        return "OK"
+
+    if app.debug:
+        @app.post("/debug")
+        def debug():
+            return ""
+
+    app.register_blueprint(api)
+    app.register_blueprint(admin, url_prefix="/v1/admin")
+    return app
+"""
+
+    detected_frameworks, appspecs = analyse_python(file_path, lambda: file_contents)
+
+    assert detected_frameworks == {"flask"}
+    assert appspecs[f"static-analysis:flask:{file_path}"]["paths"] == {
+        "/health": {"get": {"responses": {"default": {"description": "Discovered via static analysis"}}}},
+        "/debug": {"post": {"responses": {"default": {"description": "Discovered via static analysis"}}}},
+        "/api/notes": {
+            "get": {"responses": {"default": {"description": "Discovered via static analysis"}}},
+            "post": {"responses": {"default": {"description": "Discovered via static analysis"}}},
+        },
+        "/api/notes/<int:note_id>": {
+            "delete": {"responses": {"default": {"description": "Discovered via static analysis"}}}
+        },
+        "/v1/admin/": {"get": {"responses": {"default": {"description": "Discovered via static analysis"}}}},
+    }
+
+
+def test_analyse_flask_no_app():
+    file_path = "tests/python/example_apps/flask_no_app.py"
+    file_contents = """from flask import Flask
+
+@app.route("/")
+def hello_world():
+    return "<p>Hello, World!</p>"
+"""
+
+    detected_frameworks, appspecs = analyse_python(file_path, lambda: file_contents)
+
+    assert detected_frameworks == {"flask"}
+    assert appspecs == {}
+
+
+@pytest.mark.parametrize(
+    "test_file_contents,expected_imports",
+    [
+        ("", set()),
+        ("import os", {"os"}),
+        (
+            '''#!/usr/bin/env python
+"""A docstring"""
+from __future__ import annotations
+
+__version__ = "1.0.0"
+
+import os, sys as system
+import foo.bar as baz
+from flask import (
+    Flask,
+    request,
+)
+from .views import index
+
+try:
+    import ujson as json
+except ImportError:
+    import json
+    json.loads = None
+
+if TYPE_CHECKING:
+    from fastapi import FastAPI
+
+app = Flask(__name__)
+''',
+            {"__future__", "os", "sys", "foo.bar", "flask", "ujson", "json", "fastapi"},
+        ),
+        ("import os; import flask\n", {"os", "flask"}),
+        ("if TYPE_CHECKING: import flask\nelse: from fastapi import FastAPI\n", {"flask", "fastapi"}),
+        ("if x[1:2] == {1: 2}: import flask\n", {"flask"}),
+        ("def foo(): import flask\n", {"flask"}),
+        ("if True:\n    def foo(): import flask\n", {"flask"}),
+        # Imports after the leading imports can only be found by parsing the file
+        ("app = Flask(__name__)\n\nimport django\n", None),
+        ("import os; app = Flask(__name__); import flask\n", None),
+        ("app = Flask(__name__)\n\n\ndef foo(): from flask import Flask\n", None),
+        ("def foo():\n    import flask\n", None),
+        ("import os\n\n\ndef create_app():\n    from flask import Flask\n", None),
+        ("import os\n\n\ndef foo():\n    return os.getcwd()\n", {"os"}),
+        ('"""Unterminated docstring', None),
+        ("if True:\n    import flask\n  import django\n", None),
+    ],
+)
+def test_get_leading_imports(test_file_contents, expected_imports):
+    assert get_leading_imports(test_file_contents) == expected_imports
+
+
+def test_analyse_flask_app_factory_imports():
+    file_path = "tests/python/example_apps/flask_app_factory_imports.py"
+    file_contents = """import os
+
+
+def create_app():
+    from flask import Flask
+
+    app = Flask(__name__)
+
+    @app.route("/health")
+    def health():
+        return os.getenv("STATUS", "OK")
+
+    return app
+"""
+
+    detected_frameworks, appspecs = analyse_python(file_path, lambda: file_contents)
+
+    assert detected_frameworks == {"flask"}
+    assert list(appspecs[f"static-analysis:flask:{file_path}"]["paths"]) == ["/health"]
+
+
+@pytest.mark.parametrize(
+    "flask_import",
+    ["import os; from flask import Flask", "if True: from flask import Flask"],
+)
+def test_analyse_flask_one_line_imports(flask_import):
+    file_path = "tests/python/example_apps/flask_one_line_imports.py"
+    file_contents = f"""{flask_import}
+
+app = Flask(__name__)
+
+
+@app.route("/health")
+def health():
+    return "OK"
+"""
+
+    detected_frameworks, appspecs = analyse_python(file_path, lambda: file_contents)
+
+    assert detected_frameworks == {"flask"}
+    assert list(appspecs[f"static-analysis:flask:{file_path}"]["paths"]) == ["/health"]
+
+
+def test_analyse_python_skips_parsing_non_framework_files(monkeypatch):
+    def patched_parse(*_):
+        raise AssertionError("ast.parse should not be called for files not importing a framework")
+
+    monkeypatch.setattr(ast, "parse", patched_parse)
+
+    detected_frameworks, appspecs = analyse_python(
+        "tests/python/example_apps/numpy_script.py", lambda: "import numpy as np\n\nprint(np.zeros(3))\n"
+    )
+
+    assert detected_frameworks == set()
+    assert appspecs == {}
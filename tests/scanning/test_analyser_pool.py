@@ -0,0 +1,128 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from analyser_pool import AnalyserPool, FileAnalysisResult, PooledFileAnalyser, analyse_file, analyse_files
+from static_analysis import get_language_analysers
+
+FLASK_APP = """from flask import Flask
+
+app = Flask(__name__)
+
+
+@app.route("/notes")
+def get_notes():
+    return []
+"""
+
+CRASHING_FILE_CONTENTS = "# Crashes any analyser worker which analyses it\n"
+
+
+def analyse_files_or_crash(languages, files, timeout_seconds):
+    # Like an analyser segfaulting on a pathological file, which kills the worker without raising an exception
+    if any(file_contents == CRASHING_FILE_CONTENTS for _, file_contents in files):
+        os._exit(1)
+    return analyse_files(languages, files, timeout_seconds)
+
+
+class CrashingAnalyserPool(AnalyserPool):
+    def submit(self, languages, files):
+        return self.get_executor().submit(analyse_files_or_crash, languages, files, self.timeout_seconds)
+
+
+def analyse_files_in_pool(analyser_pool: AnalyserPool, files: dict[str, str]) -> dict[str, FileAnalysisResult]:
+    results: dict[str, FileAnalysisResult] = {}
+    pooled_file_analyser = PooledFileAnalyser(
+        analyser_pool, ["Python"], lambda result: results.__setitem__(result.file_path, result)
+    )
+    for file_path, file_contents in files.items():
+        pooled_file_analyser.add_file(file_path, lambda file_contents=file_contents: file_contents)
+    pooled_file_analyser.finish()
+    return results
+
+
+def test_pooled_results_match_in_process_results():
+    files = {f"app_{i}.py": FLASK_APP for i in range(5)} | {"README.md": "# Notes"}
+    analyser_pool = AnalyserPool(workers=2, batch_size=2)
+    try:
+        results = analyse_files_in_pool(analyser_pool, files)
+    finally:
+        analyser_pool.shutdown()
+
+    assert results.keys() == files.keys()
+    assert results["README.md"] == FileAnalysisResult("README.md")
+    for file_path in files.keys() - {"README.md"}:
+        in_process_result = analyse_file(get_language_analysers(["Python"]), file_path, lambda: FLASK_APP)
+        assert results[file_path].skip_reason is None
+        assert results[file_path].frameworks_identified == in_process_result.frameworks_identified == {"flask"}
+        # The generated specs are deterministic, so they're identical wherever they were generated
+        assert results[file_path].openapi_specs == in_process_result.openapi_specs
+
+
+def test_crashing_file_is_quarantined():
+    files = {f"app_{i}.py": FLASK_APP for i in range(3)} | {"crash.py": CRASHING_FILE_CONTENTS}
+    analyser_pool = CrashingAnalyserPool(workers=1, batch_size=4)
+    try:
+        results = analyse_files_in_pool(analyser_pool, files)
+        assert analyser_pool.generation == 2
+        assert len(analyser_pool.quarantined_contents) == 1
+
+        # Identical contents aren't sent to a worker again, even from another path
+        results_after_quarantine = analyse_files_in_pool(analyser_pool, {"copy_of_crash.py": CRASHING_FILE_CONTENTS})
+        assert analyser_pool.generation == 2
+    finally:
+        analyser_pool.shutdown()
+
+    # The other files in the batch the crashing file broke are still analysed
+    for i in range(3):
+        assert results[f"app_{i}.py"].frameworks_identified == {"flask"}
+    assert results["crash.py"].skip_reason == "quarantined after it broke an analyser worker"
+    assert results_after_quarantine["copy_of_crash.py"].skip_reason == "quarantined after breaking an analyser worker"
+
+
+class BlockingThreadAnalyserPool(AnalyserPool):
+    # Threads can't be killed, so restarting the pool only cancels the batches still queued, whose files must still be
+    # analysed. The first batch blocks until it's released, so the rest are queued behind it when the pool restarts.
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.first_batch_released = threading.Event()
+        self.batches_submitted = 0
+
+    def get_executor(self):
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=self.workers)  # type: ignore
+        return self.executor
+
+    def submit(self, languages, files):
+        self.batches_submitted += 1
+        if self.batches_submitted == 1:
+            return self.get_executor().submit(self.analyse_files_when_released, languages, files)
+        return self.get_executor().submit(analyse_files, languages, files, self.timeout_seconds)
+
+    def analyse_files_when_released(self, languages, files):
+        self.first_batch_released.wait()
+        return analyse_files(languages, files, self.timeout_seconds)
+
+
+def test_batches_queued_when_pool_restarts_are_resubmitted():
+    files = {f"app_{i}.py": FLASK_APP for i in range(6)}
+    results: dict[str, FileAnalysisResult] = {}
+    analyser_pool = BlockingThreadAnalyserPool(workers=1, batch_size=1, timeout_seconds=0)
+    pooled_file_analyser = PooledFileAnalyser(
+        analyser_pool, ["Python"], lambda result: results.__setitem__(result.file_path, result)
+    )
+    pooled_file_analyser.max_pending_batches = len(files)
+    for file_path, file_contents in files.items():
+        pooled_file_analyser.add_file(file_path, lambda file_contents=file_contents: file_contents)
+
+    # There are more batches than workers, so all but the first are still queued when the pool restarts
+    analyser_pool.restart(analyser_pool.generation)
+    analyser_pool.first_batch_released.set()
+    pooled_file_analyser.finish()
+    analyser_pool.shutdown()
+
+    assert analyser_pool.batches_submitted == len(files) + len(files) - 1
+    assert results.keys() == files.keys()
+    for file_path in files:
+        assert results[file_path].skip_reason is None
+        assert results[file_path].frameworks_identified == {"flask"}
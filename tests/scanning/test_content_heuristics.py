@@ -0,0 +1,67 @@
+import base64
+import random
+
+import pytest
+
+from static_analysis.content_heuristics import classify_file_contents, is_content_heuristics_file
+
+RANDOM = random.Random(0)
+
+HAND_WRITTEN_PYTHON = (
+    """from flask import Flask
+
+app = Flask(__name__)
+
+
+@app.route("/notes")
+def get_notes():
+    return {"notes": []}
+"""
+    * 20
+)
+
+HAND_WRITTEN_JAVASCRIPT = (
+    """const express = require("express");
+const app = express();
+
+app.get("/notes", (req, res) => {
+  res.json({ notes: [] });
+});
+"""
+    * 20
+)
+
+
+@pytest.mark.parametrize(
+    "file_contents,expected_classification",
+    [
+        (HAND_WRITTEN_PYTHON, None),
+        (HAND_WRITTEN_JAVASCRIPT, None),
+        ("", None),
+        ("x" * 500, None),
+        ("# Generated by the protocol buffer compiler.  DO NOT EDIT!\n" + HAND_WRITTEN_PYTHON, "generated"),
+        ("// Code generated by protoc-gen-go. DO NOT EDIT.\n" + HAND_WRITTEN_JAVASCRIPT, "generated"),
+        ("/**\n * @generated\n */\n" + HAND_WRITTEN_JAVASCRIPT, "generated"),
+        ("/******/ (() => { // webpackBootstrap\n" + HAND_WRITTEN_JAVASCRIPT, "generated"),
+        # A generated header after the start of the file is just a comment
+        (HAND_WRITTEN_PYTHON + "# Code generated by hand. DO NOT EDIT.\n", None),
+        # As are mentions of generated things in hand written comments
+        ("# IDs are auto-generated by the DB\n" + HAND_WRITTEN_PYTHON, None),
+        ("// DO NOT EDIT without updating the docs\n" + HAND_WRITTEN_JAVASCRIPT, None),
+        ("x = 1  # Code generated by the tool. DO NOT EDIT.\n" + HAND_WRITTEN_PYTHON, None),
+        (HAND_WRITTEN_JAVASCRIPT.replace("\n", ""), "minified"),
+        ("\n".join(["var a=1;" * 40] * 20), "minified"),
+        (HAND_WRITTEN_JAVASCRIPT[:2000] + "const logo = '" + "A" * 6000 + "';\n", "minified"),
+        ("\n".join(base64.b64encode(RANDOM.randbytes(60)).decode() for _ in range(100)), "high_entropy"),
+    ],
+)
+def test_classify_file_contents(file_contents, expected_classification):
+    assert classify_file_contents(file_contents) == expected_classification
+
+
+@pytest.mark.parametrize(
+    "file_path,expected_is_content_heuristics_file",
+    [("main.py", True), ("app.js", True), ("app.mjs", True), ("main.go", False), ("openapi.yaml", False)],
+)
+def test_is_content_heuristics_file(file_path, expected_is_content_heuristics_file):
+    assert is_content_heuristics_file(file_path) == expected_is_content_heuristics_file
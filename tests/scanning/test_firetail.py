@@ -0,0 +1,207 @@
+import gzip
+import json
+
+import pytest
+import requests
+import responses
+
+import firetail
+from firetail import FiretailClient, SpecUploadResult, get_retry_after_seconds
+
+MOCK_FIRETAIL_API_URL = "https://MOCK_FIRETAIL_API_URL"
+MOCK_APPSPEC_URL = f"{MOCK_FIRETAIL_API_URL}/discovery/api-repository/MOCK_API_UUID/appspec"
+
+
+def make_client(**kwargs) -> FiretailClient:
+    return FiretailClient(MOCK_FIRETAIL_API_URL, "MOCK_APP_TOKEN", retry_backoff_seconds=0, **kwargs)
+
+
+@responses.activate
+def test_upload_api_spec_retries_5xx():
+    responses.add(method="POST", url=MOCK_APPSPEC_URL, status=503)
+    responses.add(method="POST", url=MOCK_APPSPEC_URL, status=502)
+    responses.add(method="POST", url=MOCK_APPSPEC_URL, status=304)
+
+    assert make_client().upload_api_spec("MOCK_API_UUID", "spec.yaml", {}) == SpecUploadResult(
+        "spec.yaml", True, 304, 3
+    )
+
+
+@responses.activate
+def test_upload_api_spec_retries_exhausted():
+    responses.add(method="POST", url=MOCK_APPSPEC_URL, status=500, body="MOCK_ERROR")
+
+    assert make_client(max_retries=2).upload_api_spec("MOCK_API_UUID", "spec.yaml", {}) == SpecUploadResult(
+        "spec.yaml", False, 500, 3, "MOCK_ERROR"
+    )
+
+
+@responses.activate
+def test_upload_api_spec_not_retried_on_4xx():
+    responses.add(method="POST", url=MOCK_APPSPEC_URL, status=400, body="MOCK_ERROR")
+
+    assert make_client().upload_api_spec("MOCK_API_UUID", "spec.yaml", {}) == SpecUploadResult(
+        "spec.yaml", False, 400, 1, "MOCK_ERROR"
+    )
+
+
+@responses.activate
+def test_upload_api_spec_retries_connection_errors():
+    responses.add(method="POST", url=MOCK_APPSPEC_URL, body=requests.ConnectionError("MOCK_CONNECTION_ERROR"))
+    responses.add(method="POST", url=MOCK_APPSPEC_URL, status=201)
+
+    assert make_client().upload_api_spec("MOCK_API_UUID", "spec.yaml", {}) == SpecUploadResult(
+        "spec.yaml", True, 201, 2
+    )
+
+    responses.add(method="POST", url=MOCK_APPSPEC_URL, body=requests.ConnectionError("MOCK_CONNECTION_ERROR"))
+    result = make_client(max_retries=0).upload_api_spec("MOCK_API_UUID", "spec.yaml", {})
+    assert not result.succeeded
+    assert result.status_code is None
+    assert result.error == "MOCK_CONNECTION_ERROR"
+
+
+@responses.activate
+def test_upload_api_spec_honours_retry_after(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(firetail.time, "sleep", sleeps.append)
+    responses.add(method="POST", url=MOCK_APPSPEC_URL, status=429, headers={"Retry-After": "2"})
+    responses.add(method="POST", url=MOCK_APPSPEC_URL, status=201)
+
+    assert make_client().upload_api_spec("MOCK_API_UUID", "spec.yaml", {}).succeeded
+    assert sleeps == [2]
+
+
+@responses.activate
+def test_upload_api_spec_gives_up_on_long_retry_after(monkeypatch):
+    monkeypatch.setattr(firetail.time, "sleep", lambda seconds: None)
+    responses.add(method="POST", url=MOCK_APPSPEC_URL, status=429, headers={"Retry-After": "3600"})
+
+    assert make_client(max_retry_backoff_seconds=30).upload_api_spec(
+        "MOCK_API_UUID", "spec.yaml", {}
+    ) == SpecUploadResult("spec.yaml", False, 429, 1, "")
+
+
+def test_retry_backoff_is_jittered_and_capped():
+    client = FiretailClient(
+        MOCK_FIRETAIL_API_URL, "MOCK_APP_TOKEN", retry_backoff_seconds=1, max_retry_backoff_seconds=5
+    )
+    for retry in range(10):
+        assert 0 <= client.get_retry_backoff_seconds(retry) <= min(5, 2**retry)
+
+
+def test_get_retry_after_seconds():
+    response = requests.Response()
+    assert get_retry_after_seconds(response) is None
+
+    response.headers["Retry-After"] = "120"
+    assert get_retry_after_seconds(response) == 120
+
+    response.headers["Retry-After"] = "Wed, 21 Oct 2015 07:28:00 GMT"
+    assert get_retry_after_seconds(response) == 0
+
+    response.headers["Retry-After"] = "MOCK_INVALID_RETRY_AFTER"
+    assert get_retry_after_seconds(response) is None
+
+
+MOCK_BASE_SPEC = {"openapi": "3.0.0", "paths": {"/notes": {"get": {}}}}
+MOCK_SPEC = {"openapi": "3.0.0", "paths": {"/notes": {"get": {}, "post": {}}}}
+
+
+@responses.activate
+def test_upload_api_spec_delta():
+    mock_patch_endpoint = responses.add(method="PATCH", url=MOCK_APPSPEC_URL, status=201)
+
+    assert make_client().upload_api_spec(
+        "MOCK_API_UUID", "spec.yaml", MOCK_SPEC, ("MOCK_BASE_HASH", MOCK_BASE_SPEC)
+    ) == SpecUploadResult("spec.yaml", True, 201, 1, delta=True)
+
+    request = mock_patch_endpoint.calls[0].request
+    assert request.headers["Content-Encoding"] == "gzip"
+    assert json.loads(gzip.decompress(request.body)) == {
+        "source": "spec.yaml",
+        "base_hash": "MOCK_BASE_HASH",
+        "patch": [{"op": "add", "path": "/paths/~1notes/post", "value": {}}],
+    }
+
+
+@responses.activate
+def test_upload_api_spec_delta_without_gzip():
+    responses.add(method="PATCH", url=MOCK_APPSPEC_URL, status=415)
+    mock_patch_endpoint = responses.add(method="PATCH", url=MOCK_APPSPEC_URL, status=201)
+
+    client = make_client()
+    assert client.upload_api_spec(
+        "MOCK_API_UUID", "spec.yaml", MOCK_SPEC, ("MOCK_BASE_HASH", MOCK_BASE_SPEC)
+    ) == SpecUploadResult("spec.yaml", True, 201, 1, delta=True)
+    assert not client.supports_gzip
+    assert client.supports_delta_uploads
+    assert "Content-Encoding" not in mock_patch_endpoint.calls[-1].request.headers
+    assert json.loads(mock_patch_endpoint.calls[-1].request.body)["base_hash"] == "MOCK_BASE_HASH"
+
+
+@pytest.mark.parametrize(
+    "patch_status_code,expected_supports_delta_uploads",
+    [(405, False), (404, False), (409, True), (400, True), (403, True), (422, True)],
+)
+@responses.activate
+def test_upload_api_spec_delta_falls_back_to_full_upload(patch_status_code, expected_supports_delta_uploads):
+    mock_patch_endpoint = responses.add(method="PATCH", url=MOCK_APPSPEC_URL, status=patch_status_code)
+    mock_appspec_endpoint = responses.add(method="POST", url=MOCK_APPSPEC_URL, status=201)
+
+    client = make_client()
+    for _ in range(2):
+        assert client.upload_api_spec(
+            "MOCK_API_UUID", "spec.yaml", MOCK_SPEC, ("MOCK_BASE_HASH", MOCK_BASE_SPEC)
+        ) == SpecUploadResult("spec.yaml", True, 201, 1)
+
+    assert client.supports_delta_uploads == expected_supports_delta_uploads
+    # Once FireTail has said it doesn't support patches, they aren't attempted again
+    assert mock_patch_endpoint.call_count == (2 if expected_supports_delta_uploads else 1)
+    assert mock_appspec_endpoint.call_count == 2
+    assert json.loads(mock_appspec_endpoint.calls[0].request.body) == {"source": "spec.yaml", "appspec": MOCK_SPEC}
+
+
+@responses.activate
+def test_upload_api_spec_delta_falls_back_to_failed_full_upload():
+    responses.add(method="PATCH", url=MOCK_APPSPEC_URL, body=requests.ConnectionError("MOCK_CONNECTION_ERROR"))
+    mock_appspec_endpoint = responses.add(method="POST", url=MOCK_APPSPEC_URL, status=400, body="MOCK_ERROR")
+
+    # Only the full upload's error is the result
+    assert make_client(max_retries=0).upload_api_spec(
+        "MOCK_API_UUID", "spec.yaml", MOCK_SPEC, ("MOCK_BASE_HASH", MOCK_BASE_SPEC)
+    ) == SpecUploadResult("spec.yaml", False, 400, 1, "MOCK_ERROR")
+    assert mock_appspec_endpoint.call_count == 1
+
+
+@responses.activate
+def test_upload_api_spec_request_exception():
+    responses.add(method="POST", url=MOCK_APPSPEC_URL, body=requests.TooManyRedirects("MOCK_REDIRECT_ERROR"))
+
+    # Exceptions other than connection errors and timeouts aren't retried
+    assert make_client().upload_api_spec("MOCK_API_UUID", "spec.yaml", {}) == SpecUploadResult(
+        "spec.yaml", False, None, 1, "MOCK_REDIRECT_ERROR"
+    )
+
+
+@pytest.mark.parametrize("response_body", ["not json", "[]", '{"api": {}}', '{"api": null}'])
+@responses.activate
+def test_create_api_repository_malformed_response(response_body):
+    responses.add(method="POST", url=f"{MOCK_FIRETAIL_API_URL}/discovery/api-repository", body=response_body)
+
+    assert make_client().create_api_repository("MOCK_OWNER/MOCK_REPOSITORY", 123456789) is None
+
+
+@responses.activate
+def test_upload_api_spec_with_duplicate_sources():
+    mock_appspec_endpoint = responses.add(method="POST", url=MOCK_APPSPEC_URL, status=201)
+
+    assert make_client().upload_api_spec(
+        "MOCK_API_UUID", "docs/openapi.yaml", MOCK_SPEC, sources=["docs/openapi.yaml", "dist/openapi.json"]
+    ) == SpecUploadResult("docs/openapi.yaml", True, 201, 1)
+
+    assert json.loads(mock_appspec_endpoint.calls[0].request.body) == {
+        "source": "docs/openapi.yaml",
+        "sources": ["docs/openapi.yaml", "dist/openapi.json"],
+        "appspec": MOCK_SPEC,
+    }
@@ -0,0 +1,123 @@
+import logging
+
+import pytest
+
+import metrics
+from github_requests import get_endpoint, get_outcome, install_github_request_recorder
+from prometheus import render_metrics
+
+
+def log_github_request(url: str, status: int, response_headers: dict):
+    logging.getLogger("github.Requester").debug(
+        "%s %s://%s%s %s %s ==> %i %s %s",
+        "GET",
+        "https",
+        "api.github.com",
+        url,
+        {},
+        None,
+        status,
+        response_headers,
+        "{}",
+    )
+
+
+@pytest.mark.parametrize(
+    "url,expected_endpoint",
+    [
+        ("/repos/MOCK_OWNER/MOCK_REPOSITORY", ("repos", "MOCK_OWNER/MOCK_REPOSITORY")),
+        (
+            "/repos/MOCK_OWNER/MOCK_REPOSITORY/contents/src/app.py?ref=main",
+            ("repos/contents", "MOCK_OWNER/MOCK_REPOSITORY"),
+        ),
+        ("/repos/MOCK_OWNER/MOCK_REPOSITORY/languages", ("repos/languages", "MOCK_OWNER/MOCK_REPOSITORY")),
+        ("/api/v3/repos/MOCK_OWNER/MOCK_REPOSITORY/git/trees/main", ("repos/git", "MOCK_OWNER/MOCK_REPOSITORY")),
+        ("/orgs/MOCK_ORG/repos?per_page=100", ("orgs/repos", None)),
+        ("/users/MOCK_USER", ("users", None)),
+        ("/user/repos", ("user/repos", None)),
+        ("/repositories/123", ("repositories", None)),
+        ("/rate_limit", ("rate_limit", None)),
+        ("/", ("root", None)),
+    ],
+)
+def test_get_endpoint(url, expected_endpoint):
+    assert get_endpoint(url) == expected_endpoint
+
+
+@pytest.mark.parametrize(
+    "status,response_headers,expected_outcome",
+    [
+        (200, {"x-ratelimit-remaining": "4999"}, "200"),
+        (304, {}, "304"),
+        (404, {"x-ratelimit-remaining": "0"}, "404"),
+        (403, {"x-ratelimit-remaining": "10"}, "403"),
+        (403, {"x-ratelimit-remaining": "0"}, "rate_limited"),
+        (429, {"retry-after": "60"}, "rate_limited"),
+    ],
+)
+def test_get_outcome(status, response_headers, expected_outcome):
+    assert get_outcome(status, response_headers) == expected_outcome
+
+
+def test_github_requests_report():
+    scan_metrics = metrics.reset_metrics()
+    install_github_request_recorder()
+
+    rate_limit_headers = {"x-ratelimit-limit": "5000", "x-ratelimit-remaining": "4990", "x-ratelimit-resource": "core"}
+    log_github_request("/orgs/MOCK_ORG/repos", 200, rate_limit_headers)
+    log_github_request("/rate_limit", 200, {"x-ratelimit-limit": "60", "x-ratelimit-remaining": "60"})
+    with metrics.repository_scope("MOCK_OWNER/MOCK_REPOSITORY_1"):
+        log_github_request("/repos/MOCK_OWNER/MOCK_REPOSITORY_1/contents/", 200, rate_limit_headers)
+        log_github_request("/repos/MOCK_OWNER/MOCK_REPOSITORY_1/contents/app.py", 404, rate_limit_headers)
+        log_github_request("/repos/MOCK_OWNER/MOCK_REPOSITORY_1/contents/api.yaml", 403, {"x-ratelimit-remaining": "0"})
+        # Requests which aren't about a repository are attributed to the repository being scanned
+        log_github_request("/repositories/123", 304, rate_limit_headers)
+    log_github_request("/repos/MOCK_OWNER/MOCK_REPOSITORY_2/languages", 200, rate_limit_headers)
+
+    github_requests_report = scan_metrics.get_report()["github_requests"]
+
+    assert github_requests_report["requests"] == 7
+    assert github_requests_report["by_outcome"] == {"200": 4, "304": 1, "404": 1, "rate_limited": 1}
+    assert github_requests_report["by_endpoint"]["repos/contents"] == {
+        "requests": 3,
+        "by_outcome": {"200": 1, "404": 1, "rate_limited": 1},
+    }
+    assert list(github_requests_report["by_repository"]) == [
+        "MOCK_OWNER/MOCK_REPOSITORY_1",
+        "MOCK_OWNER/MOCK_REPOSITORY_2",
+    ]
+    assert github_requests_report["by_repository"]["MOCK_OWNER/MOCK_REPOSITORY_1"] == {
+        "requests": 4,
+        "by_endpoint": {"repos/contents": 3, "repositories": 1},
+        "by_outcome": {"200": 1, "304": 1, "404": 1, "rate_limited": 1},
+    }
+    # Checking the rate limit doesn't count towards it, and its headers don't replace the core rate limit's
+    assert github_requests_report["next_scan_budget"] == {
+        "predicted_requests": 6,
+        "predicted_requests_per_repository": 3,
+        "rate_limit": 5000,
+        "rate_limit_remaining": 4990,
+        "predicted_rate_limit_hours": 6 / 5000,
+        "fits_in_rate_limit_remaining": True,
+    }
+
+    rendered_metrics = render_metrics(scan_metrics).splitlines()
+    assert (
+        'github_api_discovery_github_api_requests_total{endpoint="repos/contents",outcome="rate_limited"} 1'
+        in rendered_metrics
+    )
+    assert "github_api_discovery_github_api_predicted_requests 6" in rendered_metrics
+
+
+def test_github_requests_report_without_requests():
+    github_requests_report = metrics.reset_metrics().get_report()["github_requests"]
+
+    assert github_requests_report["requests"] == 0
+    assert github_requests_report["next_scan_budget"] == {
+        "predicted_requests": 0,
+        "predicted_requests_per_repository": None,
+        "rate_limit": None,
+        "rate_limit_remaining": None,
+        "predicted_rate_limit_hours": None,
+        "fits_in_rate_limit_remaining": None,
+    }
@@ -0,0 +1,98 @@
+import pytest
+from github.Repository import Repository as GithubRepository
+
+from config import Config, OrgConfig, UserConfig
+from ignore_paths import DEFAULT_IGNORE_PATHS, compile_ignore_paths
+
+
+@pytest.mark.parametrize(
+    "ignore_path,path,expected_is_ignored",
+    [
+        ("node_modules", "node_modules", True),
+        ("node_modules", "packages/app/node_modules", True),
+        ("node_modules", "packages/app/node_modules/express/index.js", True),
+        ("node_modules", "node_modules_docs", False),
+        ("node_modules/", "packages/app/node_modules", True),
+        ("*.min.js", "static/app.min.js", True),
+        ("*.min.js", "static/app.js", False),
+        ("docs/examples", "docs/examples", True),
+        ("docs/examples", "src/docs/examples", False),
+        ("/docs", "docs/openapi.yaml", True),
+        ("/docs", "src/docs", False),
+        ("docs/**/examples", "docs/examples", True),
+        ("docs/**/examples", "docs/api/v1/examples", True),
+        ("docs/*/examples", "docs/api/v1/examples", False),
+        ("test?", "tests", True),
+        ("test?", "test", False),
+        ("a+b", "a+b", True),
+        ("a+b", "aab", False),
+        ("regex:(^|/)generated_[^/]*$", "src/generated_client.py", True),
+        ("regex:(^|/)generated_[^/]*$", "src/client.py", False),
+        ("regex:\\.pb\\.go$", "api/service.pb.go", True),
+    ],
+)
+def test_compile_ignore_paths(ignore_path, path, expected_is_ignored):
+    compiled_ignore_paths = compile_ignore_paths((ignore_path,))
+    assert compiled_ignore_paths is not None
+    assert (compiled_ignore_paths.search(path) is not None) == expected_is_ignored
+
+
+def test_compile_no_ignore_paths():
+    assert compile_ignore_paths(()) is None
+
+
+def test_compile_invalid_regex_ignore_path():
+    compiled_ignore_paths = compile_ignore_paths(("regex:(unclosed", "vendor"))
+    assert compiled_ignore_paths is not None
+    assert compiled_ignore_paths.search("vendor") is not None
+    assert compiled_ignore_paths.search("(unclosed") is None
+
+
+def make_repository(full_name: str) -> GithubRepository:
+    return GithubRepository(
+        requester=None,  # type: ignore
+        headers={},
+        attributes={"full_name": full_name, "owner": {"login": full_name.split("/")[0]}},
+        completed=True,
+    )
+
+
+def test_get_ignore_paths():
+    config = Config(
+        organisations={"MOCK_ORGANISATION": OrgConfig(ignore_paths=["org_path"])},
+        users={"MOCK_USER": UserConfig(ignore_paths=["user_path"])},
+        ignore_paths=["global_path"],
+        repository_ignore_paths={"MOCK_ORGANISATION/MOCK_REPOSITORY": ["repository_path"]},
+    )
+
+    assert config.get_ignore_paths(make_repository("MOCK_ORGANISATION/MOCK_REPOSITORY")) == (
+        *DEFAULT_IGNORE_PATHS,
+        "global_path",
+        "org_path",
+        "repository_path",
+    )
+    assert config.get_ignore_paths(make_repository("MOCK_USER/MOCK_REPOSITORY")) == (
+        *DEFAULT_IGNORE_PATHS,
+        "global_path",
+        "user_path",
+    )
+    assert config.get_ignore_paths(make_repository("MOCK_STRANGER/MOCK_REPOSITORY")) == (
+        *DEFAULT_IGNORE_PATHS,
+        "global_path",
+    )
+
+
+def test_get_ignore_paths_without_defaults():
+    config = Config(use_default_ignore_paths=False)
+    assert config.get_ignore_paths(make_repository("MOCK_USER/MOCK_REPOSITORY")) == ()
+    assert compile_ignore_paths(config.get_ignore_paths(make_repository("MOCK_USER/MOCK_REPOSITORY"))) is None
+
+
+def test_default_ignore_paths():
+    repository = make_repository("MOCK_USER/MOCK_REPOSITORY")
+    compiled_ignore_paths = compile_ignore_paths(Config().get_ignore_paths(repository))
+    assert compiled_ignore_paths is not None
+    for path in ["node_modules", "web/node_modules", "vendor", ".git", "dist", "tests/fixtures", "pkg/testdata"]:
+        assert compiled_ignore_paths.search(path) is not None
+    for path in ["src", "openapi.yaml", "src/app.py", "docs/openapi.json", "building"]:
+        assert compiled_ignore_paths.search(path) is None
@@ -0,0 +1,58 @@
+import json
+import threading
+
+import metrics
+from metrics import ScanMetrics, repository_scope
+
+
+def test_histogram_buckets():
+    histogram = metrics.Histogram()
+    for value in [0.001, 0.002, 2, 1000]:
+        histogram.observe(value)
+
+    histogram_dict = histogram.to_dict()
+    assert histogram_dict["count"] == 4
+    assert histogram_dict["min"] == 0.001
+    assert histogram_dict["max"] == 1000
+    # Values equal to a bucket's upper bound are counted in it
+    assert histogram_dict["buckets"]["0.001"] == 1
+    assert histogram_dict["buckets"]["0.005"] == 1
+    assert histogram_dict["buckets"]["5"] == 1
+    assert histogram_dict["buckets"]["+Inf"] == 1
+
+
+def test_metrics_attributed_to_current_repository():
+    scan_metrics = ScanMetrics()
+    scan_metrics.increment("files_fetched")
+    with repository_scope("MOCK_OWNER/MOCK_REPOSITORY"):
+        scan_metrics.increment("files_fetched", 2)
+        scan_metrics.observe_stage("fetch_file", 0.5)
+        scan_metrics.observe_analyser("analyse_python", 0.25)
+
+        # Context variables aren't inherited by new threads, so metrics recorded in them need their repository given
+        thread = threading.Thread(target=lambda: scan_metrics.increment("specs_uploaded"))
+        thread.start()
+        thread.join()
+
+    report = scan_metrics.get_report()
+    assert report["counters"] == {"files_fetched": 3, "specs_uploaded": 1}
+    assert report["repositories"] == {
+        "MOCK_OWNER/MOCK_REPOSITORY": {
+            "stage_seconds": {"analyse_python": 0.25, "fetch_file": 0.5},
+            "counters": {"files_fetched": 2},
+        }
+    }
+    assert report["stages"]["fetch_file"]["total"] == 0.5
+    assert report["analysers"]["analyse_python"]["count"] == 1
+    json.dumps(report)
+
+
+def test_slowest_files():
+    scan_metrics = ScanMetrics(slowest_files_count=3)
+    for i in range(10):
+        scan_metrics.observe_file(f"file_{i}.py", "scan_file", i, "MOCK_OWNER/MOCK_REPOSITORY")
+
+    assert scan_metrics.get_report()["slowest_files"] == [
+        {"repository": "MOCK_OWNER/MOCK_REPOSITORY", "path": f"file_{i}.py", "stage": "scan_file", "seconds": i}
+        for i in [9, 8, 7]
+    ]
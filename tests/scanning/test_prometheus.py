@@ -0,0 +1,82 @@
+import logging
+import socket
+
+import requests
+
+import metrics
+from github_requests import install_github_request_recorder
+from prometheus import metrics_exporters, render_metrics
+
+
+def make_scan_metrics() -> metrics.ScanMetrics:
+    scan_metrics = metrics.reset_metrics()
+    scan_metrics.increment("files_fetched", 3)
+    scan_metrics.increment("validation_cache_hits", 1)
+    scan_metrics.increment("validation_cache_misses", 3)
+    scan_metrics.set_gauge("spec_uploads_in_flight", 2)
+    scan_metrics.observe_stage("upload_spec", 0.2)
+    scan_metrics.observe_stage("upload_spec", 2)
+    scan_metrics.observe_analyser("analyse_python", 0.003)
+    return scan_metrics
+
+
+def test_render_metrics():
+    rendered_metrics = render_metrics(make_scan_metrics()).splitlines()
+
+    assert "# TYPE github_api_discovery_files_fetched_total counter" in rendered_metrics
+    assert "github_api_discovery_files_fetched_total 3" in rendered_metrics
+    assert "github_api_discovery_spec_uploads_in_flight 2" in rendered_metrics
+    assert "github_api_discovery_validation_cache_hit_ratio 0.25" in rendered_metrics
+    # Buckets are cumulative
+    assert 'github_api_discovery_stage_duration_seconds_bucket{stage="upload_spec",le="0.1"} 0' in rendered_metrics
+    assert 'github_api_discovery_stage_duration_seconds_bucket{stage="upload_spec",le="0.5"} 1' in rendered_metrics
+    assert 'github_api_discovery_stage_duration_seconds_bucket{stage="upload_spec",le="+Inf"} 2' in rendered_metrics
+    assert 'github_api_discovery_stage_duration_seconds_sum{stage="upload_spec"} 2.2' in rendered_metrics
+    assert 'github_api_discovery_stage_duration_seconds_count{stage="upload_spec"} 2' in rendered_metrics
+    assert 'github_api_discovery_analyser_duration_seconds_count{analyser="analyse_python"} 1' in rendered_metrics
+
+
+def test_metrics_endpoint():
+    make_scan_metrics()
+    with socket.socket() as free_socket:
+        free_socket.bind(("", 0))
+        port = free_socket.getsockname()[1]
+
+    with metrics_exporters(port=port, textfile_path=None):
+        response = requests.get(f"http://localhost:{port}/metrics", timeout=5)
+        assert requests.get(f"http://localhost:{port}/", timeout=5).status_code == 404
+
+    assert response.status_code == 200
+    assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+    assert "github_api_discovery_files_fetched_total 3" in response.text
+
+
+def test_metrics_textfile(tmp_path):
+    make_scan_metrics()
+
+    with metrics_exporters(port=0, textfile_path=str(tmp_path / "metrics.prom"), textfile_interval_seconds=60):
+        metrics.increment("files_fetched")
+
+    # The final metrics are written when the scan completes, even if the interval hasn't elapsed
+    assert "github_api_discovery_files_fetched_total 4" in (tmp_path / "metrics.prom").read_text().splitlines()
+
+
+def test_github_request_recorder():
+    scan_metrics = metrics.reset_metrics()
+    install_github_request_recorder()
+
+    logging.getLogger("github.Requester").debug(
+        "%s %s://%s%s %s %s ==> %i %s %s",
+        "GET",
+        "https",
+        "api.github.com",
+        "/repos/MOCK_OWNER/MOCK_REPOSITORY",
+        {},
+        None,
+        200,
+        {"x-ratelimit-remaining": "4999"},
+        "{}",
+    )
+
+    assert scan_metrics.counters["github_requests"] == 1
+    assert scan_metrics.gauges["github_rate_limit_remaining"] == 4999
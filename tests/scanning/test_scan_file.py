@@ -0,0 +1,154 @@
+import base64
+import datetime
+import time
+from types import SimpleNamespace
+
+from _consts import MOCK_APPSPEC_JSON_B64
+from github import Github as GithubClient
+from github import RateLimitExceededException
+from github.ContentFile import ContentFile
+
+import scanning
+from scanning import RepositoryScanResults, scan_file
+from utils import TimeLimit, pause_time_limits, respect_rate_limit
+
+
+def make_file(path: str, size: int | None = None, content: str = str(MOCK_APPSPEC_JSON_B64)) -> ContentFile:
+    return ContentFile(
+        requester=None,  # type: ignore
+        headers={},
+        attributes={"type": "file", "path": path, "size": size, "content": content},
+        completed=True,
+    )
+
+
+def slow_analyser(file_path, get_file_contents):
+    # Like an analyser stuck on a pathological file, which catches all exceptions
+    try:
+        while True:
+            time.sleep(0.01)
+    except:  # noqa: E722
+        return set(), {}
+
+
+def test_scan_file():
+    scan_results = RepositoryScanResults()
+    scan_file(make_file("appspec.json", 1000), GithubClient(), [], scan_results)
+
+    assert scan_results.files_scanned == 1
+    assert list(scan_results.openapi_specs_discovered) == ["appspec.json"]
+    assert scan_results.files_skipped == {}
+
+
+def test_scan_file_too_large(monkeypatch):
+    monkeypatch.setattr(scanning, "MAX_FILE_SIZE_BYTES", 999)
+
+    def unfetchable_file_contents():
+        raise AssertionError("Files which are too large shouldn't be fetched")
+
+    file = make_file("appspec.json", 1000)
+    monkeypatch.setattr(ContentFile, "content", property(lambda self: unfetchable_file_contents()))
+    scan_results = RepositoryScanResults()
+    scan_file(file, GithubClient(), [], scan_results)
+
+    assert scan_results.files_scanned == 0
+    assert scan_results.openapi_specs_discovered == {}
+    assert scan_results.files_skipped == {"appspec.json": "1000 bytes is larger than 999 bytes"}
+
+
+def test_scan_file_timeout(monkeypatch):
+    monkeypatch.setattr(scanning, "FILE_ANALYSIS_TIMEOUT_SECONDS", 0.05)
+
+    start_time = time.time()
+    scan_results = RepositoryScanResults()
+    scan_file(make_file("appspec.json"), GithubClient(), [slow_analyser], scan_results)
+
+    assert time.time() - start_time < 1
+    assert scan_results.files_scanned == 0
+    # The spec was validated within the time limit before the analyser timed out
+    assert list(scan_results.openapi_specs_discovered) == ["appspec.json"]
+    assert scan_results.files_skipped == {"appspec.json": "slow_analyser took over 0.05s"}
+
+
+def test_scan_file_generated():
+    def unreachable_analyser(file_path, get_file_contents):
+        raise AssertionError("Generated files shouldn't be analysed")
+
+    scan_results = RepositoryScanResults()
+    file_contents = "# Generated by the protocol buffer compiler.  DO NOT EDIT!\nimport flask\n"
+    scan_file(
+        make_file("notes_pb2.py", content=base64.b64encode(file_contents.encode("utf-8")).decode("utf-8")),
+        GithubClient(),
+        [unreachable_analyser],
+        scan_results,
+        language_file_extensions=(".py",),
+    )
+
+    assert scan_results.files_scanned == 0
+    assert scan_results.files_skipped_by_content == {"generated": 1}
+
+
+def test_scan_file_not_classified_without_analyser(monkeypatch):
+    def unfetchable_file_contents():
+        raise AssertionError("Files none of the repository's analysers analyse shouldn't be fetched")
+
+    def python_analyser(file_path, get_file_contents):
+        # Like the Python analyser, which ignores files with other extensions without fetching them
+        return set(), {}
+
+    file = make_file("vendor/jquery.min.js", 1000)
+    monkeypatch.setattr(ContentFile, "content", property(lambda self: unfetchable_file_contents()))
+    scan_results = RepositoryScanResults()
+    scan_file(file, GithubClient(), [python_analyser], scan_results, language_file_extensions=(".py",))
+
+    assert scan_results.files_scanned == 1
+    assert scan_results.files_skipped_by_content == {}
+
+
+def test_time_limit_not_exceeded():
+    with TimeLimit(1) as time_limit:
+        pass
+
+    assert not time_limit.exceeded
+    # The alarm should have been cancelled
+    time.sleep(0.01)
+
+
+def test_time_limit_disabled():
+    with TimeLimit(0) as time_limit:
+        time.sleep(0.01)
+
+    assert not time_limit.exceeded
+
+
+def test_pause_time_limits():
+    with TimeLimit(0.05) as time_limit:
+        with pause_time_limits():
+            time.sleep(0.1)
+        # The remaining time limit should be resumed after the pause
+        slow_analyser("", lambda: "")
+
+    assert time_limit.exceeded
+
+
+def test_respect_rate_limit_pauses_time_limits():
+    class RateLimitedGithubClient:
+        def get_rate_limit(self):
+            # Resets straight away, so the rate limit is only waited for for a second
+            return SimpleNamespace(core=SimpleNamespace(reset=datetime.datetime.utcnow()))
+
+    calls = 0
+
+    def rate_limited_once():
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            raise RateLimitExceededException(403, {}, {})
+        return "MOCK_RESULT"
+
+    with TimeLimit(0.5) as time_limit:
+        result = respect_rate_limit(rate_limited_once, RateLimitedGithubClient())  # type: ignore
+
+    # The second the rate limit was waited for doesn't count towards the time limit
+    assert result == "MOCK_RESULT"
+    assert not time_limit.exceeded
@@ -6,11 +6,16 @@ from github import Github as GithubClient
 from github.ContentFile import ContentFile
 from github.Repository import Repository as GithubRepository
 
+import metrics
+import sinks
 from scanning import scan_repositories
 
 
 @responses.activate
-def test_scan_repositories():
+def test_scan_repositories(monkeypatch, tmp_path):
+    metrics.reset_metrics()
+    monkeypatch.setattr(sinks, "UPLOAD_STATE_PATH", str(tmp_path / "upload-state.json"))
+
     MOCK_FIRETAIL_API_URL = "https://MOCK_FIRETAIL_API_URL"
     MOCK_API_UUID = str(uuid.uuid4())
 
@@ -101,4 +106,37 @@ def test_scan_repositories():
 
     assert specs_discovered == 3
     assert mock_repo_endpoint.call_count == 1
-    assert mock_appspec_endpoint.call_count == 3
+
+    report = metrics.get_metrics().get_report()
+    # src/appspec.yaml and src/appspec.json are the same spec, so it's only uploaded once. If src/appspec.json was
+    # discovered after the upload was sent, it's attached to the spec with a follow-up.
+    assert report["counters"]["specs_uploaded"] == 2
+    assert report["counters"].get("spec_follow_up_failures", 0) == 0
+    appspec_requests = mock_appspec_endpoint.call_count
+    assert appspec_requests == 2 + report["counters"].get("spec_follow_ups_uploaded", 0)
+    assert report["counters"]["files_analysed"] == 4
+    assert {"list_directory", "fetch_file", "validate_openapi", "scan_file", "upload_spec"} <= set(report["stages"])
+    assert report["repositories"]["PATCHED_GITHUB_REPOSITORY"]["stage_seconds"]["scan_repository"] > 0
+
+    # None of the specs have changed, so the second scan shouldn't upload anything, nor update the API
+    specs_discovered = scan_repositories(
+        PatchedGithubClient(),
+        "",
+        MOCK_FIRETAIL_API_URL,
+        {
+            PatchedGithubRepository(
+                requester=None,  # type: ignore
+                headers={},
+                attributes={
+                    "full_name": "PATCHED_GITHUB_REPOSITORY",
+                    "url": "PATCHED_GITHUB_REPOSITORY_URL",
+                    "id": 123456789,
+                },
+                completed=True,
+            )
+        },  # type: ignore
+    )
+
+    assert specs_discovered == 3
+    assert mock_repo_endpoint.call_count == 1
+    assert mock_appspec_endpoint.call_count == appspec_requests
@@ -0,0 +1,171 @@
+import sys
+
+from _consts import MOCK_APPSPEC_JSON_B64
+from github import Github as GithubClient
+from github.ContentFile import ContentFile
+from github.Repository import Repository as GithubRepository
+
+import metrics
+import scanning
+from scanning import scan_repository_contents, walk_repository_files
+
+
+def test_scan_deep_repository_contents():
+    # Deeper than the recursion limit, so the tree can't be scanned recursively
+    depth = sys.getrecursionlimit() + 1
+    directory_paths = ["/".join(["dir"] * n) for n in range(depth + 1)]
+
+    class PatchedGithubRepository(GithubRepository):
+        def get_languages(self) -> dict[str, int]:
+            return {}
+
+        def get_contents(self, path):
+            depth = directory_paths.index(path)
+            contents = [
+                ContentFile(
+                    requester=None,  # type: ignore
+                    headers={},
+                    attributes={
+                        "type": "file",
+                        "path": f"{path}/appspec.json".lstrip("/"),
+                        "content": str(MOCK_APPSPEC_JSON_B64),
+                    },
+                    completed=True,
+                )
+            ]
+            if depth < len(directory_paths) - 1:
+                contents.append(
+                    ContentFile(
+                        requester=None,  # type: ignore
+                        headers={},
+                        attributes={"type": "dir", "path": directory_paths[depth + 1]},
+                        completed=True,
+                    )
+                )
+            return contents
+
+    scan_results = scan_repository_contents(
+        GithubClient(),
+        PatchedGithubRepository(
+            requester=None,  # type: ignore
+            headers={},
+            attributes={"full_name": "PATCHED_GITHUB_REPOSITORY"},
+            completed=True,
+        ),
+    )
+
+    assert scan_results.files_scanned == depth + 1
+    assert list(scan_results.openapi_specs_discovered) == [
+        f"{directory_path}/appspec.json".lstrip("/") for directory_path in directory_paths
+    ]
+    assert scan_results.frameworks_identified == set()
+
+
+class PatchedWideGithubRepository(GithubRepository):
+    listed_paths: list[str] = []
+
+    def get_languages(self) -> dict[str, int]:
+        return {}
+
+    def get_contents(self, path):
+        self.listed_paths.append(path)
+        if path.count("/") == 2:
+            return ContentFile(
+                requester=None,  # type: ignore
+                headers={},
+                attributes={"type": "file", "path": f"{path}/main.py"},
+                completed=True,
+            )
+        return [
+            ContentFile(
+                requester=None,  # type: ignore
+                headers={},
+                attributes={"type": "dir", "path": f"{path}/{name}".lstrip("/")},
+                completed=True,
+            )
+            for name in ["a", "b", "node_modules"]
+        ]
+
+
+def test_walk_repository_files():
+    repository = PatchedWideGithubRepository(
+        requester=None,  # type: ignore
+        headers={},
+        attributes={"full_name": "PATCHED_GITHUB_REPOSITORY"},
+        completed=True,
+    )
+    repository.listed_paths = []
+
+    files = list(
+        walk_repository_files(repository, GithubClient(), should_descend=lambda path: not path.endswith("node_modules"))
+    )
+
+    assert [file.path for file in files] == [
+        "a/a/a/main.py",
+        "a/a/b/main.py",
+        "a/b/a/main.py",
+        "a/b/b/main.py",
+        "b/a/a/main.py",
+        "b/a/b/main.py",
+        "b/b/a/main.py",
+        "b/b/b/main.py",
+    ]
+    # Pruned directories should never be listed
+    assert not any("node_modules" in path for path in repository.listed_paths)
+
+
+def test_scan_repository_contents_with_ignore_paths():
+    repository = PatchedWideGithubRepository(
+        requester=None,  # type: ignore
+        headers={},
+        attributes={"full_name": "PATCHED_GITHUB_REPOSITORY"},
+        completed=True,
+    )
+    repository.listed_paths = []
+
+    scan_results = scan_repository_contents(GithubClient(), repository, ignore_paths=("node_modules", "b/a/*/main.py"))
+
+    assert scan_results.files_scanned == 6
+    # node_modules is ignored in /, in /a and /b, and in each of their 4 subdirectories, then 2 files in /b/a are
+    assert scan_results.paths_ignored == 7 + 2
+    assert not any("node_modules" in path for path in repository.listed_paths)
+    assert "b/a" in repository.listed_paths
+
+
+def test_walk_repository_files_max_pending_directories(monkeypatch):
+    monkeypatch.setattr(scanning, "MAX_PENDING_DIRECTORIES", 4)
+    scan_metrics = metrics.reset_metrics()
+    repository = PatchedWideGithubRepository(
+        requester=None,  # type: ignore
+        headers={},
+        attributes={"full_name": "PATCHED_GITHUB_REPOSITORY"},
+        completed=True,
+    )
+    repository.listed_paths = []
+
+    files = list(walk_repository_files(repository, GithubClient()))
+
+    # Subdirectories which don't fit while there are already 4 directories pending are deferred, not skipped, so all
+    # 27 files are still walked, in the same order as without the cap
+    names = ["a", "b", "node_modules"]
+    assert [file.path for file in files] == [f"{a}/{b}/{c}/main.py" for a in names for b in names for c in names]
+    # Each directory is only walked once, but directories with deferred subdirectories are listed again
+    assert len(repository.listed_paths) == 1 + 3 + 9 + 27 + scan_metrics.counters["directories_deferred"]
+    assert scan_metrics.counters["directories_deferred"] > 0
+
+
+def test_scan_repository_contents_with_ignore_paths_and_max_pending_directories(monkeypatch):
+    monkeypatch.setattr(scanning, "MAX_PENDING_DIRECTORIES", 3)
+    repository = PatchedWideGithubRepository(
+        requester=None,  # type: ignore
+        headers={},
+        attributes={"full_name": "PATCHED_GITHUB_REPOSITORY"},
+        completed=True,
+    )
+    repository.listed_paths = []
+
+    scan_results = scan_repository_contents(GithubClient(), repository, ignore_paths=("node_modules", "b/a/*/main.py"))
+
+    # Directories listed again for their deferred subdirectories don't check the ones already walked again
+    assert scan_results.files_scanned == 6
+    assert scan_results.paths_ignored == 7 + 2
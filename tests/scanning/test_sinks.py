@@ -0,0 +1,274 @@
+import json
+import os
+import threading
+
+import pytest
+import responses
+
+from firetail import FiretailClient, SpecUploadResult
+from openapi.canonical import get_canonical_hash
+from sinks import FiretailSink, NdjsonSink, NullSink, RepositorySpecUploader, get_output_sink
+from upload_state import UploadStateStore
+
+MOCK_FIRETAIL_API_URL = "https://MOCK_FIRETAIL_API_URL"
+MOCK_REPOSITORY_URL = f"{MOCK_FIRETAIL_API_URL}/discovery/api-repository"
+MOCK_APPSPEC_URL = f"{MOCK_FIRETAIL_API_URL}/discovery/api-repository/MOCK_API_UUID/appspec"
+
+
+def make_uploader(upload_state: UploadStateStore, **kwargs) -> RepositorySpecUploader:
+    return RepositorySpecUploader(
+        "MOCK_OWNER/MOCK_REPOSITORY",
+        123456789,
+        FiretailClient(MOCK_FIRETAIL_API_URL, "MOCK_APP_TOKEN", upload_concurrency=4, retry_backoff_seconds=0),
+        upload_state,
+        **kwargs,
+    )
+
+
+@responses.activate
+def test_upload_specs_as_discovered(tmp_path):
+    mock_repo_endpoint = responses.add(
+        method="POST", url=MOCK_REPOSITORY_URL, json={"api": {"UUID": "MOCK_API_UUID"}}, status=200
+    )
+    mock_appspec_endpoint = responses.add(method="POST", url=MOCK_APPSPEC_URL, status=201)
+
+    upload_state = UploadStateStore(str(tmp_path / "upload-state.json"), 60)
+    spec_uploader = make_uploader(upload_state)
+    for i in range(10):
+        spec_uploader.add_openapi_spec(f"spec_{i}.yaml", {"openapi": "3.0.0", "info": {"title": str(i)}})
+    spec_uploader.finish()
+
+    assert sorted(spec_uploader.spec_upload_results, key=lambda result: result.source) == sorted(
+        [SpecUploadResult(f"spec_{i}.yaml", True, 201, 1) for i in range(10)], key=lambda result: result.source
+    )
+    assert mock_repo_endpoint.call_count == 1
+    assert mock_appspec_endpoint.call_count == 10
+    assert all(call.request.headers["x-ft-app-key"] == "MOCK_APP_TOKEN" for call in responses.calls)
+    assert UploadStateStore(str(tmp_path / "upload-state.json"), 60).is_unchanged(
+        "MOCK_OWNER/MOCK_REPOSITORY", "spec_0.yaml", get_canonical_hash({"openapi": "3.0.0", "info": {"title": "0"}})
+    )
+
+
+@responses.activate
+def test_api_not_created_for_unchanged_specs(tmp_path):
+    mock_repo_endpoint = responses.add(
+        method="POST", url=MOCK_REPOSITORY_URL, json={"api": {"UUID": "MOCK_API_UUID"}}, status=200
+    )
+
+    upload_state = UploadStateStore(str(tmp_path / "upload-state.json"), 60)
+    upload_state.set_api_uuid("MOCK_OWNER/MOCK_REPOSITORY", "MOCK_API_UUID")
+    upload_state.record_upload("MOCK_OWNER/MOCK_REPOSITORY", "spec.yaml", get_canonical_hash({"openapi": "3.0.0"}))
+
+    spec_uploader = make_uploader(upload_state)
+    spec_uploader.add_openapi_spec("spec.yaml", {"openapi": "3.0.0"})
+
+    spec_uploader.finish()
+
+    assert spec_uploader.spec_upload_results == []
+    assert spec_uploader.specs_unchanged == 1
+    assert mock_repo_endpoint.call_count == 0
+
+
+@responses.activate
+def test_api_creation_failure(tmp_path):
+    mock_repo_endpoint = responses.add(method="POST", url=MOCK_REPOSITORY_URL, status=400)
+
+    spec_uploader = make_uploader(UploadStateStore(str(tmp_path / "upload-state.json"), 60))
+    spec_uploader.add_openapi_spec("spec_0.yaml", {"openapi": "3.0.0"})
+    spec_uploader.add_openapi_spec("spec_1.yaml", {"openapi": "3.0.0"})
+
+    spec_uploader.finish()
+
+    assert spec_uploader.spec_upload_results == []
+    assert spec_uploader.specs_not_uploaded == 2
+    # The API isn't attempted to be created again for every spec
+    assert mock_repo_endpoint.call_count == 1
+
+
+@responses.activate
+def test_upload_exception(tmp_path, monkeypatch):
+    responses.add(method="POST", url=MOCK_REPOSITORY_URL, json={"api": {"UUID": "MOCK_API_UUID"}}, status=200)
+    responses.add(method="POST", url=MOCK_APPSPEC_URL, status=201)
+
+    def upload_api_spec(self, api_uuid, source, *args, **kwargs):
+        if source == "spec_0.yaml":
+            raise RuntimeError("MOCK_ERROR")
+        return SpecUploadResult(source, True, 201, 1)
+
+    monkeypatch.setattr(FiretailClient, "upload_api_spec", upload_api_spec)
+
+    spec_uploader = make_uploader(UploadStateStore(str(tmp_path / "upload-state.json"), 60))
+    for i in range(2):
+        spec_uploader.add_openapi_spec(f"spec_{i}.yaml", {"openapi": "3.0.0", "info": {"title": str(i)}})
+    spec_uploader.finish()
+
+    # One upload raising only fails that spec's upload
+    assert sorted(spec_uploader.spec_upload_results, key=lambda result: result.source) == [
+        SpecUploadResult("spec_0.yaml", False, error="RuntimeError('MOCK_ERROR')"),
+        SpecUploadResult("spec_1.yaml", True, 201, 1),
+    ]
+
+
+@responses.activate
+def test_uploads_in_flight_are_bounded(tmp_path):
+    responses.add(method="POST", url=MOCK_REPOSITORY_URL, json={"api": {"UUID": "MOCK_API_UUID"}}, status=200)
+
+    uploads_in_flight = 0
+    max_uploads_in_flight = 0
+    lock = threading.Lock()
+
+    def appspec_callback(request):
+        nonlocal uploads_in_flight, max_uploads_in_flight
+        with lock:
+            uploads_in_flight += 1
+            max_uploads_in_flight = max(max_uploads_in_flight, uploads_in_flight)
+        threading.Event().wait(0.01)
+        with lock:
+            uploads_in_flight -= 1
+        return (201, {}, "")
+
+    responses.add_callback(method="POST", url=MOCK_APPSPEC_URL, callback=appspec_callback)
+
+    spec_uploader = make_uploader(UploadStateStore("", 60), max_uploads_in_flight=2)
+    for i in range(8):
+        spec_uploader.add_openapi_spec(f"spec_{i}.yaml", {"openapi": "3.0.0", "info": {"title": str(i)}})
+        assert len(spec_uploader.pending_uploads) <= 2
+
+    spec_uploader.finish()
+
+    assert len(spec_uploader.spec_upload_results) == 8
+    assert max_uploads_in_flight <= 2
+
+
+def test_ndjson_sink_single_file(tmp_path):
+    ndjson_sink = NdjsonSink(str(tmp_path / "specs.ndjson"))
+    for i in range(2):
+        repository_output = ndjson_sink.open_repository(f"MOCK_OWNER/MOCK_REPOSITORY_{i}", i)
+        repository_output.add_openapi_spec("spec.yaml", {"openapi": "3.0.0"})
+        repository_output.finish()
+    ndjson_sink.close()
+
+    lines = [json.loads(line) for line in (tmp_path / "specs.ndjson").read_text().splitlines()]
+    assert lines == [
+        {
+            "repository": f"MOCK_OWNER/MOCK_REPOSITORY_{i}",
+            "repository_id": f"github:{i}",
+            "source": "spec.yaml",
+            "hash": get_canonical_hash({"openapi": "3.0.0"}),
+            "appspec": {"openapi": "3.0.0"},
+        }
+        for i in range(2)
+    ]
+
+
+def test_ndjson_sink_directory(tmp_path):
+    ndjson_sink = NdjsonSink(f"{tmp_path / 'specs'}/")
+    repository_output = ndjson_sink.open_repository("MOCK_OWNER/MOCK_REPOSITORY", 123456789)
+    repository_output.add_openapi_spec("spec_0.yaml", {"openapi": "3.0.0"})
+    repository_output.add_openapi_spec("spec_1.yaml", {"openapi": "3.1.0"})
+    repository_output.finish()
+    # Repositories with no specs don't get a file
+    ndjson_sink.open_repository("MOCK_OWNER/MOCK_EMPTY_REPOSITORY", 987654321).finish()
+    ndjson_sink.close()
+
+    assert os.listdir(tmp_path / "specs") == ["MOCK_OWNER__MOCK_REPOSITORY.ndjson"]
+    lines = (tmp_path / "specs" / "MOCK_OWNER__MOCK_REPOSITORY.ndjson").read_text().splitlines()
+    assert [json.loads(line)["source"] for line in lines] == ["spec_0.yaml", "spec_1.yaml"]
+
+
+def test_null_sink():
+    null_sink = NullSink()
+    repository_output = null_sink.open_repository("MOCK_OWNER/MOCK_REPOSITORY", 123456789)
+    repository_output.add_openapi_spec("spec.yaml", {"openapi": "3.0.0"})
+    repository_output.finish()
+    null_sink.close()
+
+    assert null_sink.specs_discarded == 1
+
+
+@pytest.mark.parametrize(
+    "sink_name,firetail_api_url,output_path,expected_sink_type",
+    [
+        ("firetail", MOCK_FIRETAIL_API_URL, None, FiretailSink),
+        ("firetail", None, None, None),
+        ("ndjson", None, "specs.ndjson", NdjsonSink),
+        ("ndjson", MOCK_FIRETAIL_API_URL, None, None),
+        ("null", None, None, NullSink),
+        ("MOCK_UNKNOWN_SINK", MOCK_FIRETAIL_API_URL, "specs.ndjson", None),
+    ],
+)
+def test_get_output_sink(sink_name, firetail_api_url, output_path, expected_sink_type):
+    output_sink = get_output_sink(sink_name, firetail_api_url, "MOCK_APP_TOKEN", output_path)
+
+    if expected_sink_type is None:
+        assert output_sink is None
+    else:
+        assert type(output_sink) == expected_sink_type
+
+
+@responses.activate
+def test_identical_specs_uploaded_once(tmp_path):
+    responses.add(method="POST", url=MOCK_REPOSITORY_URL, json={"api": {"UUID": "MOCK_API_UUID"}}, status=200)
+
+    appspec_requests = []
+    upload_sent = threading.Event()
+    upload_released = threading.Event()
+
+    def appspec_callback(request):
+        appspec_requests.append(json.loads(request.body))
+        upload_sent.set()
+        upload_released.wait(5)
+        return (201, {}, "")
+
+    responses.add_callback(method="POST", url=MOCK_APPSPEC_URL, callback=appspec_callback)
+
+    upload_state = UploadStateStore(str(tmp_path / "upload-state.json"), 60)
+    spec_uploader = make_uploader(upload_state)
+    sources = ["docs/openapi.yaml", "dist/openapi.json", "examples/openapi.yaml"]
+    spec_uploader.add_openapi_spec(sources[0], {"openapi": "3.0.0", "paths": {}})
+    # The other copies are discovered after the first copy's upload has been sent, so they're sent with a follow-up
+    upload_sent.wait(5)
+    for source in sources[1:]:
+        # Identical specs are recognised whatever order their keys are in
+        spec_uploader.add_openapi_spec(source, {"paths": {}, "openapi": "3.0.0"})
+    spec_uploader.add_openapi_spec("other/openapi.yaml", {"openapi": "3.1.0"})
+    upload_released.set()
+    spec_uploader.finish()
+    # A copy discovered after the spec's uploads have completed is sent with another follow-up
+    spec_uploader.add_openapi_spec("late/openapi.yaml", {"openapi": "3.0.0", "paths": {}})
+    spec_uploader.finish()
+
+    assert [
+        (appspec_request["source"], appspec_request.get("sources"))
+        for appspec_request in appspec_requests
+        if appspec_request["source"] != "other/openapi.yaml"
+    ] == [
+        ("docs/openapi.yaml", None),
+        ("docs/openapi.yaml", sources),
+        ("docs/openapi.yaml", [*sources, "late/openapi.yaml"]),
+    ]
+    assert len(spec_uploader.spec_upload_results) == 2
+    assert spec_uploader.specs_duplicated == 3
+    spec_hash = get_canonical_hash({"openapi": "3.0.0", "paths": {}})
+    for source in [*sources, "late/openapi.yaml"]:
+        assert upload_state.is_unchanged("MOCK_OWNER/MOCK_REPOSITORY", source, spec_hash)
+
+
+@responses.activate
+def test_identical_copy_of_unchanged_spec_uploaded(tmp_path):
+    responses.add(method="POST", url=MOCK_REPOSITORY_URL, json={"api": {"UUID": "MOCK_API_UUID"}}, status=200)
+    responses.add(method="POST", url=MOCK_APPSPEC_URL, status=201)
+
+    upload_state = UploadStateStore(str(tmp_path / "upload-state.json"), 60)
+    upload_state.set_api_uuid("MOCK_OWNER/MOCK_REPOSITORY", "MOCK_API_UUID")
+    spec_hash = get_canonical_hash({"openapi": "3.0.0"})
+    upload_state.record_upload("MOCK_OWNER/MOCK_REPOSITORY", "docs/openapi.yaml", spec_hash)
+
+    spec_uploader = make_uploader(upload_state)
+    spec_uploader.add_openapi_spec("docs/openapi.yaml", {"openapi": "3.0.0"})
+    # FireTail doesn't have this copy yet, so it's uploaded rather than recorded as a copy of the unchanged spec
+    spec_uploader.add_openapi_spec("examples/openapi.yaml", {"openapi": "3.0.0"})
+    spec_uploader.finish()
+
+    assert spec_uploader.specs_unchanged == 1
+    assert spec_uploader.spec_upload_results == [SpecUploadResult("examples/openapi.yaml", True, 201, 1)]
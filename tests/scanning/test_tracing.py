@@ -0,0 +1,135 @@
+import json
+import threading
+
+from _consts import MOCK_APPSPEC_JSON_B64, MOCK_FLASK_MAIN_PY_B64
+from github import Github as GithubClient
+from github.ContentFile import ContentFile
+from github.Repository import Repository as GithubRepository
+
+import tracing
+from scanning import scan_repository
+from sinks import NullSink
+from tracing import add_span, get_current_span, set_span_attribute, span
+
+
+def read_trace_events(trace_path) -> list[dict]:
+    return json.loads(trace_path.read_text())["traceEvents"]
+
+
+def test_spans(tmp_path):
+    with tracing.tracing(str(tmp_path / "trace.json")):
+        with span("parent", path="parent.py") as parent_span:
+            with span("child"):
+                set_span_attribute("cache_hit", True)
+            add_span("worker", "analyser", 1700000000.5, 0.25, pid=1234)
+
+            # Spans started in other threads are given their parent
+            def start_thread_span():
+                with span("thread", parent=parent_span) as thread_span:
+                    thread_span.set_attribute("thread", True)
+
+            thread = threading.Thread(target=start_thread_span)
+            thread.start()
+            thread.join()
+
+    events = {event["name"]: event for event in read_trace_events(tmp_path / "trace.json")}
+    assert set(events) == {"parent", "child", "worker", "thread"}
+    assert events["thread"]["args"] == {"thread": True}
+    assert events["thread"]["tid"] != events["parent"]["tid"]
+    assert events["parent"]["args"] == {"path": "parent.py"}
+    assert events["child"]["args"] == {"cache_hit": True}
+    assert events["parent"]["ts"] <= events["child"]["ts"]
+    assert events["child"]["ts"] + events["child"]["dur"] <= events["parent"]["ts"] + events["parent"]["dur"]
+    assert events["worker"]["ts"] == 1700000000500000
+    assert events["worker"]["dur"] == 250000
+    assert events["worker"]["pid"] == 1234
+    assert all(event["ph"] == "X" for event in events.values())
+
+
+def test_unsampled_traces_record_nothing(tmp_path):
+    with tracing.tracing(str(tmp_path / "trace.json"), sample_rate=0):
+        with span("parent"):
+            # Everything under an unsampled span is unsampled too
+            assert get_current_span() is tracing.UNSAMPLED_SPAN
+            with span("child") as child_span:
+                child_span.set_attribute("cache_hit", True)
+                add_span("worker", "analyser", 1700000000, 0.25)
+
+    assert read_trace_events(tmp_path / "trace.json") == []
+
+
+def test_spans_without_tracing():
+    with span("parent") as parent_span:
+        assert not parent_span.sampled
+        assert get_current_span() is None
+
+
+def test_max_trace_events(monkeypatch):
+    tracer = tracing.Tracer(max_events=2)
+    monkeypatch.setattr(tracing, "TRACER", tracer)
+
+    for _ in range(5):
+        with span("span"):
+            pass
+
+    assert len(tracer.events) == 2
+    assert tracer.events_dropped == 3
+
+
+def test_trace_scan_repository(tmp_path):
+    class PatchedGithubRepository(GithubRepository):
+        def get_languages(self) -> dict[str, int]:
+            return {"Python": 1}
+
+        def get_contents(self, path):
+            return [
+                ContentFile(
+                    requester=None,  # type: ignore
+                    headers={},
+                    attributes={
+                        "type": "file",
+                        "path": "appspec.json",
+                        "sha": "MOCK_SHA",
+                        "size": 100,
+                        "content": str(MOCK_APPSPEC_JSON_B64),
+                    },
+                    completed=True,
+                ),
+                ContentFile(
+                    requester=None,  # type: ignore
+                    headers={},
+                    attributes={"type": "file", "path": "main.py", "content": str(MOCK_FLASK_MAIN_PY_B64)},
+                    completed=True,
+                ),
+            ]
+
+    with tracing.tracing(str(tmp_path / "trace.json")):
+        scan_repository(
+            GithubClient(),
+            PatchedGithubRepository(
+                requester=None,  # type: ignore
+                headers={},
+                attributes={"full_name": "PATCHED_GITHUB_REPOSITORY", "html_url": "", "id": 123456789},
+                completed=True,
+            ),
+            "",
+            "",
+            output_sink=NullSink(),
+        )
+
+    events = read_trace_events(tmp_path / "trace.json")
+    assert [event["name"] for event in events if event["name"] != "analyse_python"] == [
+        "list_directory",
+        "scan_file",
+        "scan_file",
+        "scan_repository",
+    ]
+    assert [event["args"]["path"] for event in events if event["name"] == "analyse_python"] == [
+        "appspec.json",
+        "main.py",
+    ]
+    scan_file_args = [event["args"] for event in events if event["name"] == "scan_file"]
+    assert scan_file_args[0]["sha"] == "MOCK_SHA"
+    assert scan_file_args[0]["validation_cache_hit"] in {True, False}
+    assert scan_file_args[0]["bytes_fetched"] > 0
+    assert events[-1]["args"] == {"repository": "PATCHED_GITHUB_REPOSITORY", "files_scanned": 2, "openapi_specs": 2}
@@ -0,0 +1,86 @@
+import time
+
+from openapi.canonical import get_canonical_hash
+from upload_state import UploadStateStore
+
+
+def test_upload_state_round_trip(tmp_path):
+    upload_state = UploadStateStore(str(tmp_path / "state" / "upload-state.json"), 60)
+    assert not upload_state.is_unchanged("MOCK_OWNER/MOCK_REPOSITORY", "spec.yaml", "MOCK_HASH")
+
+    upload_state.set_api_uuid("MOCK_OWNER/MOCK_REPOSITORY", "MOCK_API_UUID")
+    upload_state.record_upload("MOCK_OWNER/MOCK_REPOSITORY", "spec.yaml", "MOCK_HASH")
+    upload_state.save()
+
+    loaded_upload_state = UploadStateStore(str(tmp_path / "state" / "upload-state.json"), 60)
+    assert loaded_upload_state.get_api_uuid("MOCK_OWNER/MOCK_REPOSITORY") == "MOCK_API_UUID"
+    assert loaded_upload_state.is_unchanged("MOCK_OWNER/MOCK_REPOSITORY", "spec.yaml", "MOCK_HASH")
+    assert not loaded_upload_state.is_unchanged("MOCK_OWNER/MOCK_REPOSITORY", "spec.yaml", "MOCK_CHANGED_HASH")
+    assert not loaded_upload_state.is_unchanged("MOCK_OWNER/MOCK_REPOSITORY", "other_spec.yaml", "MOCK_HASH")
+
+
+def test_upload_state_expires(tmp_path, monkeypatch):
+    upload_state = UploadStateStore(str(tmp_path / "upload-state.json"), 60)
+    upload_state.set_api_uuid("MOCK_OWNER/MOCK_REPOSITORY", "MOCK_API_UUID")
+    upload_state.record_upload("MOCK_OWNER/MOCK_REPOSITORY", "spec.yaml", "MOCK_HASH")
+
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 61)
+    assert not upload_state.is_unchanged("MOCK_OWNER/MOCK_REPOSITORY", "spec.yaml", "MOCK_HASH")
+
+
+def test_upload_state_reset_by_new_api_uuid(tmp_path):
+    upload_state = UploadStateStore(str(tmp_path / "upload-state.json"), 60)
+    upload_state.set_api_uuid("MOCK_OWNER/MOCK_REPOSITORY", "MOCK_API_UUID")
+    upload_state.record_upload("MOCK_OWNER/MOCK_REPOSITORY", "spec.yaml", "MOCK_HASH")
+
+    upload_state.set_api_uuid("MOCK_OWNER/MOCK_REPOSITORY", "MOCK_API_UUID")
+    assert upload_state.is_unchanged("MOCK_OWNER/MOCK_REPOSITORY", "spec.yaml", "MOCK_HASH")
+
+    upload_state.set_api_uuid("MOCK_OWNER/MOCK_REPOSITORY", "MOCK_RECREATED_API_UUID")
+    assert not upload_state.is_unchanged("MOCK_OWNER/MOCK_REPOSITORY", "spec.yaml", "MOCK_HASH")
+
+
+def test_upload_state_disabled():
+    upload_state = UploadStateStore("", 60)
+    upload_state.set_api_uuid("MOCK_OWNER/MOCK_REPOSITORY", "MOCK_API_UUID")
+    upload_state.record_upload("MOCK_OWNER/MOCK_REPOSITORY", "spec.yaml", "MOCK_HASH")
+    upload_state.save()
+
+    assert not upload_state.is_unchanged("MOCK_OWNER/MOCK_REPOSITORY", "spec.yaml", "MOCK_HASH")
+
+
+def test_upload_state_corrupt(tmp_path):
+    (tmp_path / "upload-state.json").write_text("{not json")
+    upload_state = UploadStateStore(str(tmp_path / "upload-state.json"), 60)
+    assert not upload_state.is_unchanged("MOCK_OWNER/MOCK_REPOSITORY", "spec.yaml", "MOCK_HASH")
+
+    upload_state.set_api_uuid("MOCK_OWNER/MOCK_REPOSITORY", "MOCK_API_UUID")
+    upload_state.record_upload("MOCK_OWNER/MOCK_REPOSITORY", "spec.yaml", "MOCK_HASH")
+    upload_state.save()
+    assert UploadStateStore(str(tmp_path / "upload-state.json"), 60).is_unchanged(
+        "MOCK_OWNER/MOCK_REPOSITORY", "spec.yaml", "MOCK_HASH"
+    )
+
+
+def test_upload_state_keeps_large_specs(tmp_path):
+    small_spec = {"openapi": "3.0.0", "paths": {}}
+    large_spec = {"openapi": "3.0.0", "paths": {f"/path_{i}": {} for i in range(100)}}
+
+    upload_state = UploadStateStore(str(tmp_path / "upload-state.json"), 60, keep_specs_min_bytes=1000)
+    upload_state.set_api_uuid("MOCK_OWNER/MOCK_REPOSITORY", "MOCK_API_UUID")
+    upload_state.record_upload("MOCK_OWNER/MOCK_REPOSITORY", "small.yaml", get_canonical_hash(small_spec), small_spec)
+    upload_state.record_upload("MOCK_OWNER/MOCK_REPOSITORY", "large.yaml", get_canonical_hash(large_spec), large_spec)
+    upload_state.save()
+
+    loaded_upload_state = UploadStateStore(str(tmp_path / "upload-state.json"), 60)
+    assert loaded_upload_state.get_last_uploaded_spec("MOCK_OWNER/MOCK_REPOSITORY", "small.yaml") is None
+    assert loaded_upload_state.get_last_uploaded_spec("MOCK_OWNER/MOCK_REPOSITORY", "large.yaml") == (
+        get_canonical_hash(large_spec),
+        large_spec,
+    )
+
+    # A kept spec which isn't the version last accepted isn't used
+    changed_spec = {**large_spec, "info": {"title": "Changed"}}
+    loaded_upload_state.record_upload("MOCK_OWNER/MOCK_REPOSITORY", "large.yaml", get_canonical_hash(changed_spec))
+    assert loaded_upload_state.get_last_uploaded_spec("MOCK_OWNER/MOCK_REPOSITORY", "large.yaml") is None